@@ -8,8 +8,7 @@ load_dotenv()  # Load .env before anything else needs GOOGLE_API_KEY
 import streamlit as st
 from src.graph.workflow import RagAgent
 from src.ingestion.directory_scanner import DirectoryScanner
-from src.database.vector_store import VectorStore
-from src.database.metadata_store import MetadataStore
+from src.llm_clients import clients
 from src.config import settings
 
 # ---- Page Config ----
@@ -40,6 +39,7 @@ st.markdown("""
     .tier-local-gemini { background: #1a2a3a; color: #60a5fa; }
     .tier-gemini { background: #2a1a3a; color: #c084fc; }
     .tier-powerful { background: #3a2a1a; color: #fbbf24; }
+    .tier-table { background: #1a3a3a; color: #2dd4bf; }
 
     /* Sidebar styling */
     .file-item {
@@ -69,12 +69,13 @@ if "messages" not in st.session_state:
 if "agent" not in st.session_state:
     with st.spinner("🔄 Initializing RAG Agent..."):
         st.session_state.agent = RagAgent()
+        clients.warm_up()
 
 if "vector_store" not in st.session_state:
     st.session_state.vector_store = st.session_state.agent.vector_store
 
 if "metadata_store" not in st.session_state:
-    st.session_state.metadata_store = MetadataStore()
+    st.session_state.metadata_store = st.session_state.agent.metadata_store
 
 
 # ---- Sidebar ----
@@ -88,6 +89,7 @@ with st.sidebar:
             scanner = DirectoryScanner(
                 st.session_state.vector_store,
                 st.session_state.metadata_store,
+                table_store=st.session_state.agent.table_store,
             )
             stats = scanner.scan(settings.watch_directory, user_id="default_user")
 
@@ -95,7 +97,10 @@ with st.sidebar:
             f'<div class="scan-stats">'
             f'✅ 摄入: <b>{stats["ingested"]}</b> &nbsp;|&nbsp; '
             f'⏩ 跳过: <b>{stats["skipped"]}</b> &nbsp;|&nbsp; '
-            f'❌ 错误: <b>{stats["errors"]}</b>'
+            f'🗑️ 移除: <b>{stats["removed"]}</b> &nbsp;|&nbsp; '
+            f'❌ 错误: <b>{stats["errors"]}</b><br>'
+            f'🧠 嵌入缓存: 命中 <b>{stats["cache_hits"]}</b> / '
+            f'未命中 <b>{stats["cache_misses"]}</b>'
             f'</div>',
             unsafe_allow_html=True,
         )
@@ -134,6 +139,7 @@ for msg in st.session_state.messages:
                 "local+gemini": ("🏠+☁️ Local+Gemini", "tier-local-gemini"),
                 "powerful": ("💪 Powerful", "tier-powerful"),
                 "gemini": ("☁️ Gemini", "tier-gemini"),
+                "table": ("📊 Table", "tier-table"),
             }
             label, css_class = tier_map.get(tier, (f"❓ {tier}", "tier-local"))
             st.markdown(
@@ -154,8 +160,25 @@ if prompt := st.chat_input("问点什么？"):
 
     # Get AI response
     with st.chat_message("assistant"):
-        with st.spinner("思考中..."):
-            result = st.session_state.agent.run(prompt, user_id="default_user")
+        progress = st.empty()
+        answer = st.empty()
+        progress.caption("思考中...")
+        streamed = ""
+        result = {}
+        for event in st.session_state.agent.stream(prompt, user_id="default_user"):
+            if event["type"] == "node":
+                progress.caption(f"思考中... ({event['node']})")
+            elif event["type"] == "token":
+                streamed += event["text"]
+                answer.markdown(streamed + "▌")
+            elif event["type"] == "retract" and event["retrying"]:
+                streamed = ""
+                answer.empty()
+                progress.caption("↩️ 回答未通过验证，正在重新生成...")
+            elif event["type"] == "final":
+                result = event["result"]
+        progress.empty()
+        answer.empty()
 
         generation = result.get("generation", "抱歉，我无法生成回答。")
         tier = result.get("generation_tier", "unknown")
@@ -165,6 +188,7 @@ if prompt := st.chat_input("问点什么？"):
             "local+gemini": ("🏠+☁️ Local+Gemini", "tier-local-gemini"),
             "powerful": ("💪 Powerful", "tier-powerful"),
             "gemini": ("☁️ Gemini", "tier-gemini"),
+            "table": ("📊 Table", "tier-table"),
         }
         label, css_class = tier_map.get(tier, (f"❓ {tier}", "tier-local"))
         st.markdown(
@@ -172,6 +196,8 @@ if prompt := st.chat_input("问点什么？"):
             unsafe_allow_html=True,
         )
         st.markdown(generation)
+        if result.get("cached"):
+            st.caption("💾 Answered from cache")
 
         # Show source citations
         sources = result.get("sources", [])
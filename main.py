@@ -1,24 +1,76 @@
 import os
 import sys
+import re
 from dotenv import load_dotenv
-from src.database.vector_store import VectorStore
-from src.database.metadata_store import MetadataStore
 from src.ingestion.directory_scanner import DirectoryScanner
+from src.ingestion.watcher import DirectoryWatcher
 from src.graph.workflow import RagAgent
+from src.llm_clients import clients
 from src.config import settings
 
 # Load environment variables
 load_dotenv()
 
 
+def parse_scan_args(user_input: str):
+    """Parse '/scan [path] [--workers N] [--paranoid]' into (directory, options).
+
+    Only the flags are extracted; the rest of the line is taken verbatim as
+    the path, so quotes, apostrophes and backslashes survive.
+    """
+    parts = user_input.split(maxsplit=1)
+    rest = parts[1] if len(parts) > 1 else ""
+    options = {"workers": None, "paranoid": False}
+
+    match = re.search(r"(?:^|\s)--workers\s+(\S+)(?=\s|$)", rest)
+    if match:
+        options["workers"] = int(match.group(1))
+        rest = rest[:match.start()] + rest[match.end():]
+
+    match = re.search(r"(?:^|\s)--paranoid(?=\s|$)", rest)
+    if match:
+        options["paranoid"] = True
+        rest = rest[:match.start()] + rest[match.end():]
+
+    scan_dir = rest.strip() or settings.watch_directory
+    return scan_dir, options
+
+
+def stream_answer(agent: RagAgent, question: str, user_id: str) -> dict:
+    """Print node progress and the answer as it streams in; return the final result."""
+    result = {}
+    streamed = False
+    for event in agent.stream(question, user_id):
+        if event["type"] == "node" and not streamed:
+            print(f"  · {event['node']}")
+        elif event["type"] == "token":
+            if not streamed:
+                print("\nAssistant: ", end="")
+                streamed = True
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "retract" and event["retrying"] and streamed:
+            print("\n  ↩️  Answer failed verification — regenerating...")
+            streamed = False
+        elif event["type"] == "final":
+            result = event["result"]
+    if streamed:
+        print()
+    elif result.get("generation"):
+        # Table and cached answers arrive whole
+        print(f"\nAssistant: {result['generation']}")
+    return result
+
+
 def main():
     print("🤖 Initializing Personal Assistant RAG Agent...")
 
     # Initialize components
-    v_store = VectorStore()
-    m_store = MetadataStore()
-    scanner = DirectoryScanner(v_store, m_store)
     agent = RagAgent()
+    # Load the models while the user types their first question
+    clients.warm_up()
+    # Shared, so ingestion and retrieval use one vector store and connection pool
+    m_store = agent.metadata_store
+    scanner = DirectoryScanner(agent.vector_store, m_store, table_store=agent.table_store)
 
     # Hardcoded user for demo
     USER_ID = "demo_user"
@@ -30,7 +82,11 @@ def main():
     print("Commands:")
     print("  /scan                  - Scan default data directory")
     print("  /scan <path>           - Scan a specific directory")
+    print("  /scan ... --workers N  - Scan with N parallel workers")
+    print("  /scan ... --paranoid   - Rehash every file instead of trusting stat()")
+    print("  /watch [path]          - Watch a directory and ingest changes (Ctrl+C stops)")
     print("  /files                 - List ingested files")
+    print("  /stats                 - Show cache and speculation statistics")
     print("  /exit                  - Quit")
     print("  <any text>             - Chat with your data")
 
@@ -47,43 +103,87 @@ def main():
 
             # --- /scan command ---
             if user_input.lower().startswith("/scan"):
-                parts = user_input.split(maxsplit=1)
-                scan_dir = parts[1].strip() if len(parts) > 1 else settings.watch_directory
+                try:
+                    scan_dir, options = parse_scan_args(user_input)
+                except ValueError as e:
+                    print(f"Error: {e}")
+                    continue
 
                 if not os.path.isdir(os.path.expanduser(scan_dir)):
                     print(f"Error: Directory '{scan_dir}' not found.")
                     continue
 
                 print(f"📂 Scanning directory: {scan_dir}")
-                stats = scanner.scan(scan_dir, USER_ID)
+                stats = scanner.scan(
+                    scan_dir, USER_ID,
+                    workers=options["workers"], paranoid=options["paranoid"],
+                )
                 print(f"\n📊 Scan complete — "
                       f"Ingested: {stats['ingested']} | "
                       f"Skipped: {stats['skipped']} | "
+                      f"Removed: {stats['removed']} | "
                       f"Errors: {stats['errors']}")
+                print(f"   Embedding cache — "
+                      f"Hits: {stats['cache_hits']} | "
+                      f"Misses: {stats['cache_misses']}")
+                continue
+
+            # --- /watch command ---
+            if user_input.lower().startswith("/watch"):
+                parts = user_input.split(maxsplit=1)
+                watch_dir = parts[1].strip() if len(parts) > 1 else settings.watch_directory
+                if not os.path.isdir(os.path.expanduser(watch_dir)):
+                    print(f"Error: Directory '{watch_dir}' not found.")
+                    continue
+                try:
+                    DirectoryWatcher(scanner, watch_dir, USER_ID).run()
+                except KeyboardInterrupt:
+                    print("\n⏹️  Stopped watching.")
                 continue
 
             # --- /files command ---
             if user_input.lower() == "/files":
-                files = m_store.get_user_files(USER_ID)
+                files = m_store.get_file_stats(USER_ID)
                 if files:
                     print("📁 Ingested files:")
                     for f in files:
-                        print(f"  • {f}")
+                        print(f"  • {f['filename']} — {f['chunks']} chunks, "
+                              f"~{f['tokens']} tokens")
                 else:
                     print("No files ingested yet. Use /scan to ingest data.")
                 continue
 
+            # --- /stats command ---
+            if user_input.lower() == "/stats":
+                q = agent.vector_store.query_cache_stats()
+                a = agent.answer_cache.stats()
+                print(f"🧮 Query embedding cache — "
+                      f"Hits: {q['hits']} | Misses: {q['misses']} | "
+                      f"Expired: {q['expired']} | Evicted: {q['evictions']} | "
+                      f"Size: {q['size']}")
+                print(f"💾 Answer cache — "
+                      f"Hits: {a['hits']} | Misses: {a['misses']} | "
+                      f"Invalidated: {a['invalidations']} | Size: {a['size']}")
+                if agent.speculative_node:
+                    sp = agent.speculative_node.stats()
+                    print(f"🎲 Speculative drafts — "
+                          f"Started: {sp['speculated']} | Used: {sp['used']} | "
+                          f"Discarded: {sp['discarded']} | "
+                          f"Wasted: {sp['wasted_seconds']:.1f}s")
+                continue
+
             # --- Chat ---
             print("🔍 Thinking...")
-            result = agent.run(user_input, USER_ID)
+            result = stream_answer(agent, user_input, USER_ID)
 
             # Parse result
             if "generation" in result and result["generation"]:
                 tier = result.get("generation_tier", "unknown")
-                tier_labels = {"local": "🏠 Local", "local+gemini": "🏠+☁️ Local+Gemini", "powerful": "💪 Powerful", "gemini": "☁️  Gemini"}
+                tier_labels = {"local": "🏠 Local", "local+gemini": "🏠+☁️ Local+Gemini", "powerful": "💪 Powerful", "gemini": "☁️  Gemini", "table": "📊 Table"}
                 tier_label = tier_labels.get(tier, f"❓ {tier}")
 
-                print(f"\nAssistant: {result['generation']}")
+                if result.get("cached"):
+                    print("  💾 Answered from cache")
 
                 if result.get("hallucination_status"):
                     print(f"  ✅ Verified grounded ({tier_label})")
@@ -3,7 +3,9 @@ Centralized configuration for the Personal Assistant RAG Chatbot.
 Loaded from environment variables / .env file.
 """
 from pydantic_settings import BaseSettings
-from pydantic import Field
+import os
+from typing import Literal, Optional
+from pydantic import Field, model_validator
 
 
 class Settings(BaseSettings):
@@ -32,12 +34,29 @@ class Settings(BaseSettings):
         default="http://localhost:11434",
         description="Base URL for the Ollama server.",
     )
+    ollama_keep_alive_seconds: int = Field(
+        default=1800,
+        description="Seconds Ollama keeps a model loaded after its last request.",
+    )
+    ollama_max_concurrency: int = Field(
+        default=4,
+        description="Chat requests in flight to the Ollama server at once, across all "
+                    "nodes; match OLLAMA_NUM_PARALLEL.",
+    )
+    warm_up_models: bool = Field(
+        default=True,
+        description="Load the Ollama chat and embedding models at startup, concurrently.",
+    )
 
     # --- Google Gemini (Online LLM Fallback) ---
     google_api_key: str = Field(
         default="",
         description="Google API key for Gemini online fallback.",
     )
+    gemini_max_concurrency: int = Field(
+        default=8,
+        description="Gemini requests in flight at once, across all nodes.",
+    )
 
     # --- ChromaDB ---
     chroma_db_path: str = Field(
@@ -54,6 +73,243 @@ class Settings(BaseSettings):
         default="./file_metadata.db",
         description="Path to the SQLite metadata database file.",
     )
+    table_db_path: str = Field(
+        default="",
+        description="Path to the SQLite database holding ingested CSV tables. "
+                    "Defaults to tables.db next to the metadata DB.",
+    )
+    table_query_max_steps: int = Field(
+        default=50_000_000,
+        description="SQLite VM instructions a generated table query may run "
+                    "before it is interrupted.",
+    )
+    embedding_cache_path: str = Field(
+        default="",
+        description="Path to the SQLite chunk-embedding cache. "
+                    "Defaults to embedding_cache.db next to the metadata DB.",
+    )
+    embedding_cache_max_entries: int = Field(
+        default=200_000,
+        description="Maximum cached chunk embeddings before LRU eviction.",
+    )
+    text_cache_path: str = Field(
+        default="",
+        description="Path to the SQLite cache of text extracted from PDFs. "
+                    "Defaults to extracted_text_cache.db next to the metadata DB.",
+    )
+    text_cache_max_entries: int = Field(
+        default=10_000,
+        description="Maximum cached PDF extractions before LRU eviction.",
+    )
+
+    # --- Ingestion ---
+    ingest_workers: int = Field(
+        default=1,
+        description="Worker processes for hashing/parsing during a scan. "
+                    "1 keeps the sequential scanner; >1 enables the parallel pipeline.",
+    )
+    ingest_queue_size: int = Field(
+        default=32,
+        description="Maximum number of files buffered between pipeline stages.",
+    )
+    embed_batch_size: int = Field(
+        default=64,
+        description="Number of chunks sent to the embedding model per request.",
+    )
+    embed_batch_bytes: int = Field(
+        default=256_000,
+        description="Maximum UTF-8 bytes of chunk text per embedding request.",
+    )
+    embed_concurrency: int = Field(
+        default=4,
+        description="Concurrent embedding requests sent to Ollama.",
+    )
+    pdf_workers: int = Field(
+        default=4,
+        description="Worker processes extracting pages of one large PDF. "
+                    "Only used outside the pipeline's own worker processes.",
+    )
+    pdf_pages_per_task: int = Field(
+        default=25,
+        description="PDF pages extracted per worker task.",
+    )
+
+    # --- Retrieval ---
+    retrieval_k: int = Field(
+        default=4,
+        description="Documents handed to grading after fusion.",
+    )
+    retrieval_candidates: int = Field(
+        default=8,
+        description="Candidates fetched from each of the vector and lexical indexes.",
+    )
+    hybrid_retrieval: bool = Field(
+        default=True,
+        description="Fuse BM25 keyword search with vector search (reciprocal rank fusion).",
+    )
+    rrf_k: int = Field(
+        default=60,
+        description="Reciprocal rank fusion constant; larger values flatten rank differences.",
+    )
+    query_cache_max_entries: int = Field(
+        default=1024,
+        description="Question embeddings kept in memory before LRU eviction.",
+    )
+    query_cache_ttl_seconds: float = Field(
+        default=3600.0,
+        description="Seconds a cached question embedding stays valid (0 disables expiry).",
+    )
+
+    local_context_tokens: int = Field(
+        default=1500,
+        description="Token budget for retrieved context in prompts to the local model; "
+                    "keep it well below the model's num_ctx.",
+    )
+    gemini_context_tokens: int = Field(
+        default=8000,
+        description="Token budget for retrieved context in prompts to Gemini.",
+    )
+
+    grading_mode: Literal["separate", "listwise"] = Field(
+        default="separate",
+        description="'separate' grades each chunk, then checks sufficiency (k+1 calls); "
+                    "'listwise' judges every chunk and sufficiency in one call.",
+    )
+    grade_concurrency: int = Field(
+        default=4,
+        description="Documents graded in parallel; match Ollama's OLLAMA_NUM_PARALLEL.",
+    )
+
+    grade_fast_path: bool = Field(
+        default=True,
+        description="Accept/reject chunks by retrieval score without an LLM call "
+                    "when the score is outside the ambiguous band.",
+    )
+    grade_accept_score: Optional[float] = Field(
+        default=None,
+        description="Relevance score at or above which chunks are accepted unseen. "
+                    "Unset: calibrated from the grade log.",
+    )
+    grade_reject_score: Optional[float] = Field(
+        default=None,
+        description="Relevance score at or below which chunks are rejected unseen. "
+                    "Unset: calibrated from the grade log.",
+    )
+    grade_calibration_min_samples: int = Field(
+        default=200,
+        description="Logged LLM verdicts needed before thresholds are calibrated.",
+    )
+    grade_calibration_precision: float = Field(
+        default=0.98,
+        description="Fraction of logged verdicts a calibrated threshold must agree with.",
+    )
+    grade_calibration_interval: int = Field(
+        default=50,
+        description="New LLM verdicts logged between recalibrations.",
+    )
+    grade_audit_rate: float = Field(
+        default=0.05,
+        description="Fraction of calibrated fast-path decisions still graded by the LLM "
+                    "and logged, so recalibration sees the whole score range.",
+    )
+    grade_log_path: str = Field(
+        default="",
+        description="Path to the SQLite log of grading outcomes. "
+                    "Defaults to grade_log.db next to the metadata DB.",
+    )
+    grade_log_max_entries: int = Field(
+        default=20_000,
+        description="Newest grading outcomes kept per grader model.",
+    )
+
+    verdict_cache_enabled: bool = Field(
+        default=True,
+        description="Reuse earlier relevance/sufficiency verdicts for the same question and chunks.",
+    )
+    verdict_cache_max_entries: int = Field(
+        default=100_000,
+        description="Memoized grading verdicts kept before LRU eviction.",
+    )
+
+    speculative_generation: bool = Field(
+        default=False,
+        description="Draft the local answer while the sufficiency check runs; "
+                    "the draft is discarded when documents are insufficient.",
+    )
+
+    hallucination_mode: Literal["combined", "sequential"] = Field(
+        default="sequential",
+        description="'sequential' makes one call per verdict; 'combined' judges "
+                    "groundedness, question resolution and unsupported claims in one call.",
+    )
+
+    # --- Answer cache ---
+    answer_cache_enabled: bool = Field(
+        default=True,
+        description="Answer repeated questions from cache until the user's files change.",
+    )
+    answer_cache_threshold: float = Field(
+        default=0.95,
+        description="Minimum cosine similarity between question embeddings for a cache hit.",
+    )
+    answer_cache_max_entries: int = Field(
+        default=256,
+        description="Cached answers kept per user before LRU eviction.",
+    )
+    answer_cache_ttl_seconds: float = Field(
+        default=86_400.0,
+        description="Seconds a cached answer stays valid (0 disables expiry).",
+    )
+
+    # --- HTTP serving (python -m src.server) ---
+    serve_host: str = Field(
+        default="127.0.0.1",
+        description="Interface the HTTP server listens on.",
+    )
+    serve_port: int = Field(
+        default=8000,
+        description="Port the HTTP server listens on.",
+    )
+    serve_max_concurrency: int = Field(
+        default=8,
+        description="Questions answered at the same time across all users.",
+    )
+    serve_max_per_user: int = Field(
+        default=2,
+        description="Questions answered at the same time for one user.",
+    )
+    serve_max_pending: int = Field(
+        default=64,
+        description="Questions admitted (running or waiting) before new ones get 503.",
+    )
+    serve_max_pending_per_user: int = Field(
+        default=8,
+        description="Questions one user may have admitted before new ones get 429.",
+    )
+
+    # --- Watch mode ---
+    watch_debounce_seconds: float = Field(
+        default=1.0,
+        description="Quiet period after the last filesystem event before ingesting.",
+    )
+    watch_poll_interval: float = Field(
+        default=2.0,
+        description="Seconds between stat() snapshots when native events are unavailable.",
+    )
+
+    @model_validator(mode="after")
+    def _derive_paths(self):
+        """Place the caches and tables next to the metadata DB unless set explicitly."""
+        data_dir = os.path.dirname(self.metadata_db_path) or "."
+        if not self.table_db_path:
+            self.table_db_path = os.path.join(data_dir, "tables.db")
+        if not self.embedding_cache_path:
+            self.embedding_cache_path = os.path.join(data_dir, "embedding_cache.db")
+        if not self.text_cache_path:
+            self.text_cache_path = os.path.join(data_dir, "extracted_text_cache.db")
+        if not self.grade_log_path:
+            self.grade_log_path = os.path.join(data_dir, "grade_log.db")
+        return self
 
     model_config = {
         "env_file": ".env",
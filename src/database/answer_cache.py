@@ -0,0 +1,102 @@
+"""
+Answer Cache — in-memory store of finished agent answers per user.
+
+A question is answered from the cache when its embedding's cosine
+similarity to an earlier question of the same user is at least
+answer_cache_threshold. Every entry records the user's corpus version at
+the time it was answered; once a scan ingests or removes files the
+version changes and the user's older entries are dropped. Each user
+keeps at most answer_cache_max_entries answers (least recently used are
+evicted first), and entries expire after answer_cache_ttl_seconds.
+"""
+import math
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config import settings
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    unit_vector: List[float]
+    corpus_version: int
+    result: Dict[str, Any]
+    stored_at: float
+
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+class AnswerCache:
+    def __init__(self, threshold: Optional[float] = None,
+                 max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold if threshold is not None else settings.answer_cache_threshold
+        self.max_entries = max_entries or settings.answer_cache_max_entries
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.answer_cache_ttl_seconds
+        self._clock = clock
+        # user_id -> entries, most recently used last
+        self._entries: Dict[str, "OrderedDict[int, CachedAnswer]"] = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def lookup(self, user_id: str, embedding: List[float],
+               corpus_version: int) -> Optional[Dict[str, Any]]:
+        """Return the cached result of the most similar earlier question, or None."""
+        query = _unit(embedding)
+        with self._lock:
+            entries = self._entries.get(user_id)
+            if entries and next(iter(entries.values())).corpus_version != corpus_version:
+                # The corpus changed since these answers were produced
+                self.invalidations += len(entries)
+                entries.clear()
+            best_key, best_score = None, self.threshold
+            now = self._clock()
+            for key, entry in list((entries or {}).items()):
+                if self.ttl_seconds > 0 and now - entry.stored_at > self.ttl_seconds:
+                    del entries[key]
+                    continue
+                score = sum(a * b for a, b in zip(query, entry.unit_vector))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(best_key)
+            self.hits += 1
+            return dict(entries[best_key].result)
+
+    def store(self, user_id: str, question: str, embedding: List[float],
+              corpus_version: int, result: Dict[str, Any]):
+        """Remember a result, dropping the user's answers from older corpus versions."""
+        with self._lock:
+            entries = self._entries.setdefault(user_id, OrderedDict())
+            if entries and next(iter(entries.values())).corpus_version != corpus_version:
+                self.invalidations += len(entries)
+                entries.clear()
+            entries[self._next_key] = CachedAnswer(
+                question, _unit(embedding), corpus_version, dict(result), self._clock(),
+            )
+            self._next_key += 1
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/invalidation counters and the number of cached answers."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "size": sum(len(entries) for entries in self._entries.values()),
+            }
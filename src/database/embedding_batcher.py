@@ -0,0 +1,182 @@
+"""
+Embedding Batcher — collects chunks across files and embeds them in
+large, concurrent requests before upserting them into Chroma.
+
+A batch is closed when it reaches either the chunk limit or the byte
+budget, whichever comes first, so a few huge chunks cannot blow past the
+embedding model's request size. With an EmbeddingCache attached, only
+chunks missing from the cache are sent to the model.
+"""
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.config import settings
+from src.database.embedding_cache import EmbeddingCache
+
+
+# Chroma's default per-call limit; VectorStore passes the client's real one
+DEFAULT_MAX_WRITE_BATCH = 5000
+
+
+def write_slices(count: int, max_batch: int) -> Iterator[slice]:
+    """Slices splitting `count` items into Chroma-sized write batches."""
+    for start in range(0, count, max_batch):
+        yield slice(start, start + max_batch)
+
+
+def upsert_in_batches(collection, max_batch: int, ids: List[str],
+                      embeddings: List[List[float]], documents: List[str],
+                      metadatas: List[Dict[str, Any]]):
+    """Upsert without exceeding the client's maximum batch size."""
+    for part in write_slices(len(ids), max_batch):
+        collection.upsert(
+            ids=ids[part], embeddings=embeddings[part],
+            documents=documents[part], metadatas=metadatas[part],
+        )
+
+
+def update_in_batches(collection, max_batch: int, ids: List[str],
+                      metadatas: List[Dict[str, Any]]):
+    """Update metadata by ID without exceeding the client's maximum batch size."""
+    for part in write_slices(len(ids), max_batch):
+        collection.update(ids=ids[part], metadatas=metadatas[part])
+
+
+def delete_in_batches(collection, max_batch: int, ids: List[str]):
+    """Delete by ID without exceeding the client's maximum batch size."""
+    for part in write_slices(len(ids), max_batch):
+        collection.delete(ids=ids[part])
+
+
+class EmbeddingBatcher:
+    def __init__(
+        self,
+        embedding_function,
+        collection,
+        batch_size: Optional[int] = None,
+        max_batch_bytes: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        cache: Optional[EmbeddingCache] = None,
+        model_name: str = "",
+        max_write_batch: int = DEFAULT_MAX_WRITE_BATCH,
+    ):
+        self.embedding_function = embedding_function
+        self.collection = collection
+        self.cache = cache
+        self.model_name = model_name
+        self.max_write_batch = max_write_batch
+        self.batch_size = batch_size or settings.embed_batch_size
+        self.max_batch_bytes = max_batch_bytes or settings.embed_batch_bytes
+        self.concurrency = max(1, concurrency or settings.embed_concurrency)
+
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._update_ids: List[str] = []
+        self._update_metadatas: List[Dict[str, Any]] = []
+        self._delete_ids: List[str] = []
+        self._pending_bytes = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered chunks not yet written to Chroma."""
+        return len(self._texts)
+
+    def is_full(self) -> bool:
+        """True once the buffer holds enough work to keep every worker busy."""
+        return (
+            self.pending >= self.batch_size * self.concurrency
+            or self._pending_bytes >= self.max_batch_bytes * self.concurrency
+        )
+
+    def add(self, texts: List[str], metadatas: List[Dict[str, Any]],
+            ids: Optional[List[str]] = None):
+        """Buffer chunks for the next flush."""
+        self._ids.extend(ids or [str(uuid.uuid4()) for _ in texts])
+        self._texts.extend(texts)
+        self._metadatas.extend(metadatas)
+        self._pending_bytes += sum(len(t.encode("utf-8")) for t in texts)
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Buffer metadata updates for chunks that are already embedded."""
+        self._update_ids.extend(ids)
+        self._update_metadatas.extend(metadatas)
+
+    def delete(self, ids: List[str]):
+        """Buffer vector IDs to remove once the pending chunks are written."""
+        self._delete_ids.extend(ids)
+
+    def flush(self) -> int:
+        """Embed and upsert everything buffered. Returns the number of chunks written.
+
+        Deletions run after the upsert, so a failed embedding never leaves a
+        file with its old chunks removed and no new ones. The buffer is
+        cleared even if embedding fails, so one bad batch does not poison
+        the next flush.
+        """
+        ids, texts, metadatas = self._ids, self._texts, self._metadatas
+        update_ids, update_metadatas = self._update_ids, self._update_metadatas
+        delete_ids = self._delete_ids
+        self._ids, self._texts, self._metadatas = [], [], []
+        self._update_ids, self._update_metadatas = [], []
+        self._delete_ids = []
+        self._pending_bytes = 0
+
+        if texts:
+            embeddings = self.embed(texts)
+            upsert_in_batches(
+                self.collection, self.max_write_batch, ids, embeddings, texts, metadatas
+            )
+        if update_ids:
+            update_in_batches(
+                self.collection, self.max_write_batch, update_ids, update_metadatas
+            )
+        if delete_ids:
+            delete_in_batches(self.collection, self.max_write_batch, delete_ids)
+        return len(texts)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, consulting the cache first when one is attached."""
+        if self.cache is None:
+            return self._embed_uncached(texts)
+
+        vectors = self.cache.get_many(self.model_name, texts)
+        misses = [i for i, v in enumerate(vectors) if v is None]
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            fresh = self._embed_uncached(miss_texts)
+            self.cache.put_many(self.model_name, miss_texts, fresh)
+            for i, vector in zip(misses, fresh):
+                vectors[i] = vector
+        return vectors
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in size/byte-bounded batches, several requests at a time."""
+        if not texts:
+            return []
+        batches = self._split(texts)
+        if len(batches) == 1 or self.concurrency == 1:
+            results = [self.embedding_function.embed_documents(b) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+                results = list(pool.map(self.embedding_function.embed_documents, batches))
+        return [vector for batch in results for vector in batch]
+
+    def _split(self, texts: List[str]) -> List[List[str]]:
+        batches: List[List[str]] = []
+        current: List[str] = []
+        current_bytes = 0
+        for text in texts:
+            size = len(text.encode("utf-8"))
+            if current and (
+                len(current) >= self.batch_size
+                or current_bytes + size > self.max_batch_bytes
+            ):
+                batches.append(current)
+                current, current_bytes = [], 0
+            current.append(text)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
@@ -0,0 +1,110 @@
+"""
+Embedding Cache — persistent, content-addressed store of chunk embeddings.
+
+Entries are keyed by (embed model, SHA-256 of chunk text), so an unchanged
+chunk of an edited file is never sent to Ollama twice. The table is
+bounded by embedding_cache_max_entries; the least recently used entries
+are evicted first.
+"""
+import time
+import array
+import sqlite3
+import hashlib
+from typing import Dict, List, Optional
+
+from src.config import settings
+
+
+class EmbeddingCache:
+    def __init__(self, db_path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.db_path = db_path or settings.embedding_cache_path
+        self.max_entries = max_entries or settings.embedding_cache_max_entries
+        self.hits = 0
+        self.misses = 0
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the SQLite database schema."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Compute the SHA-256 hash of a chunk's text."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return the cached vector for each text, or None on a miss."""
+        hashes = [self.text_hash(t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        unique = list(dict.fromkeys(hashes))
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            part = unique[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            cursor.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND text_hash IN ({placeholders})",
+                (model, *part),
+            )
+            for text_hash, blob in cursor.fetchall():
+                found[text_hash] = array.array("f", blob).tolist()
+        if found:
+            now = time.time()
+            cursor.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model, h) for h in found],
+            )
+            conn.commit()
+        conn.close()
+
+        vectors = [found.get(h) for h in hashes]
+        hit_count = sum(v is not None for v in vectors)
+        self.hits += hit_count
+        self.misses += len(vectors) - hit_count
+        return vectors
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """Store vectors for texts, then evict the least recently used overflow."""
+        now = time.time()
+        rows = [
+            (model, self.text_hash(t), array.array("f", v).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) "
+            "VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        cursor.execute("SELECT COUNT(*) FROM embeddings")
+        overflow = cursor.fetchone()[0] - self.max_entries
+        if overflow > 0:
+            cursor.execute(
+                "DELETE FROM embeddings WHERE rowid IN ("
+                "SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+        conn.commit()
+        conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters accumulated since this cache was created."""
+        return {"hits": self.hits, "misses": self.misses}
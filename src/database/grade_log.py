@@ -0,0 +1,117 @@
+"""
+Grade Log — persistent record of LLM relevance verdicts and the retrieval
+score of each graded chunk.
+
+The log calibrates GradeNode's fast path: the lowest score above which
+chunks were (almost) always relevant becomes the auto-accept threshold,
+and the highest score below which they were (almost) never relevant
+becomes the auto-reject floor. The table keeps the newest
+grade_log_max_entries outcomes per grader model.
+"""
+import time
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+from src.config import settings
+
+# Fewest outcomes on the confident side of a threshold before it is trusted
+MIN_BUCKET = 10
+
+
+def _threshold(samples: Sequence[Tuple[float, bool]], precision: float) -> Optional[float]:
+    """Walk samples from the most confident end; return the farthest score
+    boundary whose prefix is still correct at least `precision` of the time."""
+    best = None
+    correct = 0
+    for i, (score, is_correct) in enumerate(samples):
+        correct += is_correct
+        at_boundary = i + 1 == len(samples) or samples[i + 1][0] != score
+        if at_boundary and i + 1 >= MIN_BUCKET and correct / (i + 1) >= precision:
+            best = score
+    return best
+
+
+class GradeLog:
+    def __init__(self, db_path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.db_path = db_path or settings.grade_log_path
+        self.max_entries = max_entries or settings.grade_log_max_entries
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """Initialize the SQLite database schema."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS grade_outcomes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                model TEXT NOT NULL,
+                score REAL NOT NULL,
+                relevant INTEGER NOT NULL,
+                logged_at REAL NOT NULL
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_grade_outcomes_model ON grade_outcomes (model, id)"
+        )
+        conn.commit()
+        conn.close()
+
+    def record(self, model: str, outcomes: List[Tuple[float, bool]]):
+        """Log (retrieval score, LLM verdict) pairs, keeping the newest max_entries."""
+        if not outcomes:
+            return
+        now = time.time()
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO grade_outcomes (model, score, relevant, logged_at) VALUES (?, ?, ?, ?)",
+            [(model, score, int(relevant), now) for score, relevant in outcomes],
+        )
+        cursor.execute(
+            "DELETE FROM grade_outcomes WHERE model = ? AND id NOT IN ("
+            "SELECT id FROM grade_outcomes WHERE model = ? ORDER BY id DESC LIMIT ?)",
+            (model, model, self.max_entries),
+        )
+        conn.commit()
+        conn.close()
+
+    def count(self, model: str) -> int:
+        """Return the number of logged outcomes for a grader model."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT COUNT(*) FROM grade_outcomes WHERE model = ?", (model,),
+        ).fetchone()
+        conn.close()
+        return row[0]
+
+    def calibrate(self, model: str, min_samples: int,
+                  precision: float) -> Tuple[Optional[float], Optional[float]]:
+        """Return (accept_score, reject_score) learned from the log.
+
+        Chunks scoring >= accept_score were relevant, and chunks scoring
+        <= reject_score irrelevant, at least `precision` of the time. Either
+        is None when the log is too small or shows no such region.
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT score, relevant FROM grade_outcomes WHERE model = ?", (model,),
+        ).fetchall()
+        conn.close()
+        if len(rows) < min_samples:
+            return None, None
+
+        accept = _threshold(
+            sorted(((score, bool(relevant)) for score, relevant in rows), reverse=True),
+            precision,
+        )
+        reject = _threshold(
+            sorted((score, not relevant) for score, relevant in rows),
+            precision,
+        )
+        if accept is not None and reject is not None and reject >= accept:
+            # Overlapping regions: the log is not decisive yet
+            return None, None
+        return accept, reject
@@ -1,74 +1,642 @@
+import os
+import re
+import time
+import queue
 import sqlite3
 import hashlib
-from typing import List, Optional
+import threading
+import unicodedata
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 from src.config import settings
 
+# Files modified this recently may still be written within the same mtime
+# tick, so their stat signature is not trusted for change detection.
+RACY_WINDOW_NS = 2_000_000_000
+
+# Connections kept open for reuse across calls and threads
+MAX_POOLED_CONNECTIONS = 4
+
+# Stay well under SQLite's bound-parameter limit in IN (...) lookups
+LOOKUP_BATCH = 500
+
+# (size, mtime_ns, inode, file_hash) recorded for a path
+FileState = Tuple[int, int, int, str]
+
+
+def _add_tombstones(cursor: sqlite3.Cursor):
+    # Tombstone column for files that vanished from disk; databases created
+    # before migrations were versioned may already have it.
+    cursor.execute("PRAGMA table_info(uploads)")
+    if "deleted_at" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE uploads ADD COLUMN deleted_at DATETIME")
+
+
+def _add_file_state(cursor: sqlite3.Cursor):
+    # Stat signature → content hash, so unchanged files skip rehashing
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS file_state (
+            file_path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            file_hash TEXT NOT NULL
+        )
+    """)
+
+
+def _add_indexes(cursor: sqlite3.Cursor):
+    # Older versions appended a row per ingestion; keep only the latest
+    cursor.execute("""
+        DELETE FROM uploads WHERE file_path != '' AND id NOT IN (
+            SELECT MAX(id) FROM uploads WHERE file_path != '' GROUP BY user_id, file_path
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_uploads_user_path ON uploads (user_id, file_path)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_uploads_path_time "
+        "ON uploads (file_path, upload_timestamp)"
+    )
+
+
+def _add_chunks(cursor: sqlite3.Cursor):
+    # Which vectors belong to which upload, so file-scoped operations are
+    # indexed lookups instead of metadata scans over the Chroma collection
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chunks (
+            vector_id TEXT PRIMARY KEY,
+            file_id INTEGER NOT NULL REFERENCES uploads (id),
+            chunk_index INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            start_byte INTEGER,
+            end_byte INTEGER,
+            token_count INTEGER NOT NULL
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks (file_id, chunk_index)"
+    )
+
+
+def _add_lexical_index(cursor: sqlite3.Cursor):
+    # BM25 full-text index over chunk text; rowid matches chunks.rowid.
+    # Chunks recorded before this migration are indexed on re-ingestion.
+    cursor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+        "text, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+
+
+def _add_corpus_versions(cursor: sqlite3.Cursor):
+    # Bumped whenever a user's ingested files change, so caches of answers
+    # derived from the corpus can tell they are stale
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS corpus_versions (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+
+
+def _add_grade_verdicts(cursor: sqlite3.Cursor):
+    # Memoized LLM verdicts. chunks_key is a chunk's content hash for
+    # relevance grades, or a digest of the sorted content hashes for
+    # sufficiency; verdict_chunks lists the hashes behind each key so
+    # verdicts are dropped when their chunks leave the registry.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS grade_verdicts (
+            kind TEXT NOT NULL,
+            model TEXT NOT NULL,
+            question TEXT NOT NULL,
+            chunks_key TEXT NOT NULL,
+            verdict INTEGER NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (kind, model, question, chunks_key)
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_grade_verdicts_key ON grade_verdicts (chunks_key)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_grade_verdicts_last_used ON grade_verdicts (last_used)"
+    )
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS verdict_chunks (
+            chunks_key TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            PRIMARY KEY (content_hash, chunks_key)
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chunks_content_hash ON chunks (content_hash)"
+    )
+
+
+def _offsets_as_chars(cursor: sqlite3.Cursor):
+    # Chunk offsets are character positions in the extracted text, not file
+    # bytes. The byte positions recorded before are dropped (their chunks
+    # merge by overlapping text) and re-recorded on re-ingestion.
+    cursor.execute("ALTER TABLE chunks RENAME COLUMN start_byte TO start_char")
+    cursor.execute("ALTER TABLE chunks RENAME COLUMN end_byte TO end_char")
+    cursor.execute("UPDATE chunks SET start_char = NULL, end_char = NULL")
+
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _add_tombstones, _add_file_state, _add_indexes, _add_chunks, _add_lexical_index,
+    _add_corpus_versions, _add_grade_verdicts, _offsets_as_chars,
+]
+
+# Query terms passed to the full-text index
+MAX_QUERY_TERMS = 32
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form of a question for verdict lookups: NFC, case-folded,
+    whitespace collapsed and trailing punctuation dropped."""
+    text = " ".join(unicodedata.normalize("NFC", question).casefold().split())
+    return text.rstrip("?!.。？！ ")
+
+
+def verdict_key(content_hashes: List[str]) -> str:
+    """Key for a verdict over chunks: the hash itself for one chunk, else a
+    digest of the sorted hashes (order-insensitive)."""
+    if len(content_hashes) == 1:
+        return content_hashes[0]
+    joined = "\0".join(sorted(content_hashes)).encode("utf-8")
+    return hashlib.sha256(joined).hexdigest()
+
+
+@dataclass
+class ChunkRecord:
+    """One stored vector of a file, as recorded in the chunk registry."""
+    vector_id: str
+    chunk_index: int
+    content_hash: str
+    # Character offsets into the text the chunk was split from (see text_processor)
+    start_char: Optional[int]
+    end_char: Optional[int]
+    token_count: int
+    text: str = ""  # Indexed for lexical search, not stored in the chunks table
+
 
 class MetadataStore:
-    def __init__(self):
-        self.db_path = settings.metadata_db_path
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or settings.metadata_db_path
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._pool_lock = threading.Lock()
+        self._opened = 0
         self._init_db()
 
+    # ---- Connection pool ----
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        # Safe under WAL: a crash can only lose the last commits, never corrupt
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection; commits on success, rolls back on error."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                can_open = self._opened < MAX_POOLED_CONNECTIONS
+                if can_open:
+                    self._opened += 1
+            conn = self._open() if can_open else self._pool.get()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        """Close every idle pooled connection."""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            with self._pool_lock:
+                self._opened -= 1
+
     def _init_db(self):
-        """Initialize the SQLite database schema."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS uploads (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                filename TEXT NOT NULL,
-                file_path TEXT,
-                file_hash TEXT,
-                source_type TEXT DEFAULT 'unknown',
-                upload_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
-        conn.close()
+        """Initialize the SQLite database schema and apply pending migrations."""
+        with self._connection() as conn:
+            # WAL lets scans write while the UI and chat sessions read
+            conn.execute("PRAGMA journal_mode=WAL")
+            cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    file_path TEXT,
+                    file_hash TEXT,
+                    source_type TEXT DEFAULT 'unknown',
+                    upload_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for migration in MIGRATIONS[version:]:
+                migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+
+    # ---- Uploads ----
 
     def add_file(self, user_id: str, filename: str, file_path: str = "",
                  file_hash: str = "", source_type: str = "unknown"):
-        """Record a new file upload."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO uploads (user_id, filename, file_path, file_hash, source_type) "
-            "VALUES (?, ?, ?, ?, ?)",
-            (user_id, filename, file_path, file_hash, source_type),
+        """Record a file upload, replacing any earlier record of the same path."""
+        self.add_files(user_id, [(filename, file_path, file_hash, source_type)])
+
+    def add_files(self, user_id: str, files: List[Tuple[str, str, str, str]],
+                  chunks: Optional[Dict[str, List[ChunkRecord]]] = None):
+        """Record many (filename, file_path, file_hash, source_type) uploads at once.
+
+        A file already recorded for the user keeps its row (and id) and is
+        updated in place. Files listed in chunks get their chunk registry
+        replaced, in the same transaction.
+        """
+        if not files:
+            return
+        chunks = chunks or {}
+        with self._connection() as conn:
+            for filename, file_path, file_hash, source_type in files:
+                cursor = conn.execute(
+                    "UPDATE uploads SET filename = ?, file_hash = ?, source_type = ?, "
+                    "upload_timestamp = CURRENT_TIMESTAMP, deleted_at = NULL "
+                    "WHERE user_id = ? AND file_path = ? AND file_path != ''",
+                    (filename, file_hash, source_type, user_id, file_path),
+                )
+                if cursor.rowcount:
+                    file_id = conn.execute(
+                        "SELECT id FROM uploads WHERE user_id = ? AND file_path = ?",
+                        (user_id, file_path),
+                    ).fetchone()[0]
+                else:
+                    file_id = conn.execute(
+                        "INSERT INTO uploads (user_id, filename, file_path, file_hash, source_type) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (user_id, filename, file_path, file_hash, source_type),
+                    ).lastrowid
+                if file_path in chunks:
+                    self._replace_chunks(conn, file_id, chunks[file_path])
+            self._bump_corpus_version(conn, user_id)
+
+    @staticmethod
+    def _replace_chunks(conn: sqlite3.Connection, file_id: int, records: List[ChunkRecord]):
+        """Swap a file's registered chunks (and their full-text rows) for records.
+
+        Memoized verdicts about chunks that no longer exist are dropped.
+        """
+        old_hashes = [row[0] for row in conn.execute(
+            "SELECT DISTINCT content_hash FROM chunks WHERE file_id = ?", (file_id,),
+        )]
+        conn.execute(
+            "DELETE FROM chunks_fts WHERE rowid IN (SELECT rowid FROM chunks WHERE file_id = ?)",
+            (file_id,),
         )
-        conn.commit()
-        conn.close()
+        conn.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+        for c in records:
+            rowid = conn.execute(
+                "INSERT INTO chunks (vector_id, file_id, chunk_index, "
+                "content_hash, start_char, end_char, token_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (c.vector_id, file_id, c.chunk_index, c.content_hash,
+                 c.start_char, c.end_char, c.token_count),
+            ).lastrowid
+            conn.execute("INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)", (rowid, c.text))
+        MetadataStore._drop_orphaned_verdicts(conn, old_hashes)
 
     def get_user_files(self, user_id: str) -> List[str]:
         """Get list of filenames uploaded by a user."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT filename FROM uploads WHERE user_id = ?", (user_id,)
-        )
-        files = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return files
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT filename FROM uploads WHERE user_id = ? AND deleted_at IS NULL",
+                (user_id,),
+            ).fetchall()
+        return [row[0] for row in rows]
 
     def get_file_hash(self, file_path: str) -> Optional[str]:
         """Get the stored hash for a file path. Returns None if not found."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT file_hash FROM uploads WHERE file_path = ? "
-            "ORDER BY upload_timestamp DESC LIMIT 1",
-            (file_path,),
-        )
-        row = cursor.fetchone()
-        conn.close()
-        return row[0] if row else None
+        return self.get_hashes([file_path]).get(file_path)
+
+    def get_hashes(self, file_paths: List[str]) -> Dict[str, str]:
+        """Return {file_path: stored hash} for every recorded, non-deleted path."""
+        hashes: Dict[str, str] = {}
+        unique = list(dict.fromkeys(file_paths))
+        with self._connection() as conn:
+            for start in range(0, len(unique), LOOKUP_BATCH):
+                part = unique[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(part))
+                # Oldest first, so the latest record of a path wins
+                rows = conn.execute(
+                    f"SELECT file_path, file_hash FROM uploads "
+                    f"WHERE file_path IN ({placeholders}) AND deleted_at IS NULL "
+                    f"ORDER BY upload_timestamp, id",
+                    part,
+                ).fetchall()
+                hashes.update(rows)
+        return hashes
 
     def check_file_changed(self, file_path: str, current_hash: str) -> bool:
         """Return True if the file is new or has changed since last ingestion."""
         stored_hash = self.get_file_hash(file_path)
         return stored_hash != current_hash
 
+    def get_live_paths(self, user_id: str, directory: str) -> List[str]:
+        """Return every non-tombstoned file path recorded for a user under a directory."""
+        prefix = os.path.join(directory, "")
+        with self._connection() as conn:
+            # substr rather than LIKE: LIKE is case-insensitive and treats _ and % specially
+            rows = conn.execute(
+                "SELECT DISTINCT file_path FROM uploads "
+                "WHERE user_id = ? AND deleted_at IS NULL AND substr(file_path, 1, ?) = ?",
+                (user_id, len(prefix), prefix),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def tombstone_files(self, user_id: str, file_paths: List[str]):
+        """Mark files as deleted from disk and forget their chunks and stat signatures."""
+        with self._connection() as conn:
+            conn.executemany(
+                "DELETE FROM chunks_fts WHERE rowid IN (SELECT c.rowid FROM chunks c "
+                "JOIN uploads u ON u.id = c.file_id WHERE u.user_id = ? AND u.file_path = ?)",
+                [(user_id, path) for path in file_paths],
+            )
+            old_hashes = []
+            for path in file_paths:
+                old_hashes.extend(row[0] for row in conn.execute(
+                    "SELECT DISTINCT c.content_hash FROM chunks c "
+                    "JOIN uploads u ON u.id = c.file_id WHERE u.user_id = ? AND u.file_path = ?",
+                    (user_id, path),
+                ))
+            conn.executemany(
+                "DELETE FROM chunks WHERE file_id IN ("
+                "SELECT id FROM uploads WHERE user_id = ? AND file_path = ?)",
+                [(user_id, path) for path in file_paths],
+            )
+            self._drop_orphaned_verdicts(conn, old_hashes)
+            conn.executemany(
+                "UPDATE uploads SET deleted_at = CURRENT_TIMESTAMP "
+                "WHERE user_id = ? AND file_path = ? AND deleted_at IS NULL",
+                [(user_id, path) for path in file_paths],
+            )
+            conn.executemany(
+                "DELETE FROM file_state WHERE file_path = ?",
+                [(path,) for path in file_paths],
+            )
+            if file_paths:
+                self._bump_corpus_version(conn, user_id)
+
+    # ---- Corpus version ----
+
+    @staticmethod
+    def _bump_corpus_version(conn: sqlite3.Connection, user_id: str):
+        conn.execute(
+            "INSERT INTO corpus_versions (user_id, version) VALUES (?, 1) "
+            "ON CONFLICT (user_id) DO UPDATE SET version = version + 1",
+            (user_id,),
+        )
+
+    def get_corpus_version(self, user_id: str) -> int:
+        """Return a counter that changes whenever the user's files are ingested or removed."""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT version FROM corpus_versions WHERE user_id = ?", (user_id,),
+            ).fetchone()
+        return row[0] if row else 0
+
+    # ---- Grade verdicts ----
+
+    @staticmethod
+    def _drop_orphaned_verdicts(conn: sqlite3.Connection, content_hashes: List[str]):
+        """Forget verdicts involving any of these hashes no longer in the registry."""
+        unique = list(dict.fromkeys(content_hashes))
+        for start in range(0, len(unique), LOOKUP_BATCH):
+            part = unique[start:start + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(part))
+            gone = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT chunks_key FROM verdict_chunks "
+                f"WHERE content_hash IN ({placeholders}) "
+                f"AND content_hash NOT IN (SELECT content_hash FROM chunks)",
+                part,
+            )]
+            conn.executemany("DELETE FROM grade_verdicts WHERE chunks_key = ?",
+                             [(key,) for key in gone])
+            conn.executemany("DELETE FROM verdict_chunks WHERE chunks_key = ?",
+                             [(key,) for key in gone])
+
+    def get_verdicts(self, kind: str, model: str, question: str,
+                     chunks_keys: List[str]) -> Dict[str, bool]:
+        """Return {chunks_key: verdict} memoized for a question (see verdict_key)."""
+        question = normalize_question(question)
+        found: Dict[str, bool] = {}
+        unique = list(dict.fromkeys(chunks_keys))
+        with self._connection() as conn:
+            for start in range(0, len(unique), LOOKUP_BATCH):
+                part = unique[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(part))
+                rows = conn.execute(
+                    f"SELECT chunks_key, verdict FROM grade_verdicts "
+                    f"WHERE kind = ? AND model = ? AND question = ? "
+                    f"AND chunks_key IN ({placeholders})",
+                    (kind, model, question, *part),
+                ).fetchall()
+                found.update((key, bool(verdict)) for key, verdict in rows)
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE grade_verdicts SET last_used = ? "
+                    "WHERE kind = ? AND model = ? AND question = ? AND chunks_key = ?",
+                    [(now, kind, model, question, key) for key in found],
+                )
+        return found
+
+    def put_verdicts(self, kind: str, model: str, question: str,
+                     verdicts: List[Tuple[List[str], bool]]):
+        """Memoize (content hashes, verdict) pairs, evicting least recently used overflow."""
+        if not verdicts:
+            return
+        question = normalize_question(question)
+        now = time.time()
+        with self._connection() as conn:
+            for content_hashes, verdict in verdicts:
+                key = verdict_key(content_hashes)
+                conn.execute(
+                    "INSERT OR REPLACE INTO grade_verdicts "
+                    "(kind, model, question, chunks_key, verdict, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, model, question, key, int(verdict), now),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO verdict_chunks (chunks_key, content_hash) VALUES (?, ?)",
+                    [(key, h) for h in set(content_hashes)],
+                )
+            overflow = conn.execute("SELECT COUNT(*) FROM grade_verdicts").fetchone()[0] \
+                - settings.verdict_cache_max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM grade_verdicts WHERE rowid IN ("
+                    "SELECT rowid FROM grade_verdicts ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+                conn.execute(
+                    "DELETE FROM verdict_chunks WHERE chunks_key NOT IN "
+                    "(SELECT chunks_key FROM grade_verdicts)"
+                )
+
+    # ---- Chunk registry ----
+
+    def get_chunk_ids(self, user_id: str, file_paths: List[str]) -> Dict[str, Set[str]]:
+        """Return {file_path: vector IDs} for the user's files that have registered chunks."""
+        ids: Dict[str, Set[str]] = {}
+        unique = list(dict.fromkeys(file_paths))
+        with self._connection() as conn:
+            for start in range(0, len(unique), LOOKUP_BATCH):
+                part = unique[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(part))
+                rows = conn.execute(
+                    f"SELECT u.file_path, c.vector_id FROM uploads u "
+                    f"JOIN chunks c ON c.file_id = u.id "
+                    f"WHERE u.user_id = ? AND u.deleted_at IS NULL "
+                    f"AND u.file_path IN ({placeholders})",
+                    (user_id, *part),
+                ).fetchall()
+                for file_path, vector_id in rows:
+                    ids.setdefault(file_path, set()).add(vector_id)
+        return ids
+
+    def search_chunks(self, user_id: str, query: str, limit: int) -> List[Dict[str, Any]]:
+        """BM25 search over the user's chunk text. Best match first.
+
+        Returns [{"vector_id", "text", "source", "start_char", "end_char"}].
+        The query is reduced to its word tokens OR-ed together, so
+        punctuation and FTS operators in a question cannot break the MATCH
+        expression.
+        """
+        terms = list(dict.fromkeys(re.findall(r"\w+", query.lower())))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT c.vector_id, chunks_fts.text, u.filename, c.start_char, c.end_char "
+                "FROM chunks_fts "
+                "JOIN chunks c ON c.rowid = chunks_fts.rowid "
+                "JOIN uploads u ON u.id = c.file_id "
+                "WHERE chunks_fts MATCH ? AND u.user_id = ? AND u.deleted_at IS NULL "
+                "ORDER BY chunks_fts.rank LIMIT ?",
+                (match, user_id, limit),
+            ).fetchall()
+        return [
+            {"vector_id": vector_id, "text": text, "source": source,
+             "start_char": start_char, "end_char": end_char}
+            for vector_id, text, source, start_char, end_char in rows
+        ]
+
+    def get_file_stats(self, user_id: str) -> List[Dict[str, Any]]:
+        """Per-file chunk and token totals for a user's live files."""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT u.filename, u.file_path, u.source_type, "
+                "COUNT(c.vector_id), COALESCE(SUM(c.token_count), 0) "
+                "FROM uploads u LEFT JOIN chunks c ON c.file_id = u.id "
+                "WHERE u.user_id = ? AND u.deleted_at IS NULL "
+                "GROUP BY u.id ORDER BY u.filename",
+                (user_id,),
+            ).fetchall()
+        return [
+            {
+                "filename": filename,
+                "file_path": file_path,
+                "source_type": source_type,
+                "chunks": chunk_count,
+                "tokens": tokens,
+            }
+            for filename, file_path, source_type, chunk_count, tokens in rows
+        ]
+
+    # ---- Stat signatures ----
+
+    def get_cached_hash(self, file_path: str, stat: os.stat_result) -> Optional[str]:
+        """Return the recorded hash if the file's (size, mtime_ns, inode) is unchanged.
+
+        Returns None when the file was never recorded or its stat signature differs.
+        """
+        return self.hash_for_stat(self.get_file_states([file_path]).get(file_path), stat)
+
+    def get_file_states(self, file_paths: List[str]) -> Dict[str, FileState]:
+        """Return {file_path: (size, mtime_ns, inode, file_hash)} for recorded paths."""
+        states: Dict[str, FileState] = {}
+        unique = list(dict.fromkeys(file_paths))
+        with self._connection() as conn:
+            for start in range(0, len(unique), LOOKUP_BATCH):
+                part = unique[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(part))
+                rows = conn.execute(
+                    f"SELECT file_path, size, mtime_ns, inode, file_hash FROM file_state "
+                    f"WHERE file_path IN ({placeholders})",
+                    part,
+                ).fetchall()
+                states.update((row[0], tuple(row[1:])) for row in rows)
+        return states
+
+    @staticmethod
+    def hash_for_stat(state: Optional[FileState], stat: os.stat_result) -> Optional[str]:
+        """Return a recorded state's hash if it matches the file's current stat."""
+        if state is None or tuple(state[:3]) != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return None
+        return state[3]
+
+    def record_file_state(self, file_path: str, stat: os.stat_result, file_hash: str):
+        """Remember the hash computed for the file's current stat signature."""
+        self.record_file_states([(file_path, stat, file_hash)])
+
+    def record_file_states(self, entries: List[Tuple[str, os.stat_result, str]]):
+        """Record many (file_path, stat, file_hash) signatures in one transaction.
+
+        Files still inside the racy mtime window are left out.
+        """
+        now = time.time_ns()
+        rows = [
+            (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, file_hash)
+            for path, stat, file_hash in entries
+            if now - stat.st_mtime_ns >= RACY_WINDOW_NS
+        ]
+        if not rows:
+            return
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO file_state "
+                "(file_path, size, mtime_ns, inode, file_hash) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def resolve_file_hash(self, file_path: str, paranoid: bool = False) -> str:
+        """Return the file's SHA-256, reading it only if its stat signature changed.
+
+        With paranoid=True the file is always rehashed.
+        """
+        stat = os.stat(file_path)
+        if not paranoid:
+            cached = self.get_cached_hash(file_path, stat)
+            if cached is not None:
+                return cached
+        file_hash = self.compute_file_hash(file_path)
+        self.record_file_state(file_path, stat, file_hash)
+        return file_hash
+
     @staticmethod
     def compute_file_hash(file_path: str) -> str:
         """Compute the SHA-256 hash of a file."""
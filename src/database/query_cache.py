@@ -0,0 +1,84 @@
+"""
+Query Embedding Cache — in-memory store of question embeddings.
+
+Entries are keyed by (embed model, normalized question text), so repeated
+questions, Streamlit reruns and the same question from different users
+skip the Ollama round-trip. The cache is bounded by
+query_cache_max_entries (least recently used entries are evicted first)
+and entries expire after query_cache_ttl_seconds.
+"""
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.config import settings
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries or settings.query_cache_max_entries
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.query_cache_ttl_seconds
+        self._clock = clock
+        # key -> (stored_at, vector); most recently used last
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Canonical form of a question: NFC, with runs of whitespace collapsed."""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Return the cached vector for a question, or None on a miss."""
+        key = (model, self.normalize(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds > 0 \
+                    and self._clock() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, model: str, text: str, vector: List[float]):
+        """Store a question's vector, evicting the least recently used overflow."""
+        key = (model, self.normalize(text))
+        with self._lock:
+            self._entries[key] = (self._clock(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_embed(self, model: str, text: str,
+                     embed: Callable[[str], List[float]]) -> List[float]:
+        """Return the cached vector, or embed the question and cache the result."""
+        vector = self.get(model, text)
+        if vector is None:
+            vector = embed(text)
+            self.put(model, text, vector)
+        return vector
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/expiry/eviction counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,197 @@
+"""
+Table Store — SQLite registry of ingested CSV tables.
+
+Each CSV is loaded into its own SQLite table alongside the vector store,
+so aggregate questions can be answered with a query instead of asking an
+LLM to add up numbers from serialized rows. Queries run on a read-only
+connection whose authorizer only lets them read the asking user's tables.
+"""
+import json
+import sqlite3
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.config import settings
+
+
+# Rows read from disk per pandas chunk while loading a CSV
+LOAD_CHUNK_ROWS = 50_000
+
+# Upper bound on rows a query may return to the caller
+MAX_RESULT_ROWS = 200
+
+# SQLite VM instructions between progress-handler calls
+PROGRESS_INTERVAL = 10_000
+
+
+class TableStore:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or settings.table_db_path
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the registry table."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS csv_tables (
+                table_name TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                columns TEXT NOT NULL,
+                row_count INTEGER NOT NULL
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_csv_tables_user ON csv_tables (user_id)"
+        )
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def table_name(user_id: str, file_path: str) -> str:
+        """Deterministic SQL-safe table name for a user's CSV file."""
+        digest = hashlib.sha256(f"{user_id}\0{file_path}".encode("utf-8")).hexdigest()
+        return f"csv_{digest[:16]}"
+
+    def load_csv(self, user_id: str, file_path: str) -> int:
+        """(Re)load a CSV file into its table. Returns the number of rows loaded.
+
+        Rows are staged in a scratch table that replaces the live one in a
+        single transaction, so a failed load leaves the previous table (and
+        its registry entry) untouched and queries never see a half-loaded
+        table.
+        """
+        name = self.table_name(user_id, file_path)
+        staging = f"{name}_loading"
+        filename = file_path.split("/")[-1]
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+            columns: List[Tuple[str, str]] = []
+            row_count = 0
+            for df in pd.read_csv(file_path, chunksize=LOAD_CHUNK_ROWS):
+                if not columns:
+                    columns = [(str(c), str(t)) for c, t in df.dtypes.items()]
+                df.to_sql(staging, conn, if_exists="append", index=False)
+                row_count += len(df)
+            conn.commit()
+
+            conn.execute("BEGIN")
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+            if columns:
+                conn.execute(f'ALTER TABLE "{staging}" RENAME TO "{name}"')
+                conn.execute(
+                    "INSERT OR REPLACE INTO csv_tables "
+                    "(table_name, user_id, file_path, filename, columns, row_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, user_id, file_path, filename, json.dumps(columns), row_count),
+                )
+            else:
+                conn.execute("DELETE FROM csv_tables WHERE table_name = ?", (name,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+            conn.commit()
+            raise
+        finally:
+            conn.close()
+        return row_count
+
+    def has_table(self, user_id: str, file_path: str) -> bool:
+        """True if the file's table is registered (i.e. its last load succeeded)."""
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            "SELECT 1 FROM csv_tables WHERE table_name = ?",
+            (self.table_name(user_id, file_path),),
+        ).fetchone()
+        conn.close()
+        return row is not None
+
+    def drop_tables(self, user_id: str, file_paths: List[str]):
+        """Forget the tables loaded from the given files."""
+        conn = sqlite3.connect(self.db_path)
+        for file_path in file_paths:
+            name = self.table_name(user_id, file_path)
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+            conn.execute("DELETE FROM csv_tables WHERE table_name = ?", (name,))
+        conn.commit()
+        conn.close()
+
+    def list_tables(self, user_id: str) -> List[Dict[str, Any]]:
+        """Return the registry entries for a user's tables."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT table_name, filename, columns, row_count FROM csv_tables "
+            "WHERE user_id = ? ORDER BY filename",
+            (user_id,),
+        )
+        tables = [
+            {
+                "table_name": name,
+                "filename": filename,
+                "columns": json.loads(columns),
+                "row_count": row_count,
+            }
+            for name, filename, columns, row_count in cursor.fetchall()
+        ]
+        conn.close()
+        return tables
+
+    def describe(self, user_id: str, sample_rows: int = 3) -> str:
+        """Render a user's table schemas plus a few sample rows for an LLM prompt."""
+        tables = self.list_tables(user_id)
+        if not tables:
+            return ""
+        conn = sqlite3.connect(self.db_path)
+        blocks = []
+        for table in tables:
+            cols = ", ".join(f'"{c}" ({t})' for c, t in table["columns"])
+            rows = conn.execute(
+                f'SELECT * FROM "{table["table_name"]}" LIMIT ?', (sample_rows,)
+            ).fetchall()
+            sample = "\n".join(f"  {row}" for row in rows)
+            blocks.append(
+                f'Table "{table["table_name"]}" (from {table["filename"]}, '
+                f'{table["row_count"]} rows)\nColumns: {cols}\nSample rows:\n{sample}'
+            )
+        conn.close()
+        return "\n\n".join(blocks)
+
+    def query(self, user_id: str, sql: str) -> Tuple[List[str], List[Tuple]]:
+        """Run a read-only query over the user's tables. Returns (columns, rows).
+
+        Raises sqlite3.DatabaseError if the statement writes, or touches a
+        table that does not belong to the user, and sqlite3.OperationalError
+        if it runs longer than settings.table_query_max_steps.
+        """
+        allowed = {t["table_name"] for t in self.list_tables(user_id)}
+        budget = [max(1, settings.table_query_max_steps // PROGRESS_INTERVAL)]
+
+        def progress():
+            # A non-zero return interrupts the running statement
+            budget[0] -= 1
+            return budget[0] < 0
+
+        def authorizer(action, arg1, _arg2, _db, _trigger):
+            if action == sqlite3.SQLITE_SELECT or action == sqlite3.SQLITE_FUNCTION:
+                return sqlite3.SQLITE_OK
+            if action == sqlite3.SQLITE_READ:
+                return sqlite3.SQLITE_OK if arg1 in allowed else sqlite3.SQLITE_DENY
+            return sqlite3.SQLITE_DENY
+
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            conn.set_authorizer(authorizer)
+            conn.set_progress_handler(progress, PROGRESS_INTERVAL)
+            cursor = conn.execute(sql)
+            columns = [d[0] for d in cursor.description or []]
+            rows = cursor.fetchmany(MAX_RESULT_ROWS)
+        finally:
+            conn.close()
+        return columns, rows
@@ -0,0 +1,88 @@
+"""
+Extracted Text Cache — persistent store of per-page text pulled out of PDFs.
+
+Entries are keyed by the file's SHA-256, so re-chunking (a different
+CHUNK_SIZE / CHUNK_OVERLAP) or re-ingesting an unchanged PDF never parses
+it again. The table is bounded by text_cache_max_entries; the least
+recently used entries are evicted first.
+"""
+import json
+import time
+import zlib
+import sqlite3
+from typing import List, Optional
+
+from src.config import settings
+
+
+class ExtractedTextCache:
+    def __init__(self, db_path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.db_path = db_path or settings.text_cache_path
+        self.max_entries = max_entries or settings.text_cache_max_entries
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Parse workers in several processes may write at the same time
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """Initialize the SQLite database schema."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS extracted_text (
+                file_hash TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                pages BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (file_hash, extractor)
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_extracted_text_last_used "
+            "ON extracted_text (last_used)"
+        )
+        conn.commit()
+        conn.close()
+
+    def get(self, file_hash: str, extractor: str) -> Optional[List[str]]:
+        """Return the cached page texts for a file, or None on a miss."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT pages FROM extracted_text WHERE file_hash = ? AND extractor = ?",
+            (file_hash, extractor),
+        )
+        row = cursor.fetchone()
+        if row is not None:
+            cursor.execute(
+                "UPDATE extracted_text SET last_used = ? "
+                "WHERE file_hash = ? AND extractor = ?",
+                (time.time(), file_hash, extractor),
+            )
+            conn.commit()
+        conn.close()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, file_hash: str, extractor: str, pages: List[str]):
+        """Store a file's page texts, then evict the least recently used overflow."""
+        blob = zlib.compress(json.dumps(pages).encode("utf-8"))
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO extracted_text (file_hash, extractor, pages, last_used) "
+            "VALUES (?, ?, ?, ?)",
+            (file_hash, extractor, blob, time.time()),
+        )
+        cursor.execute("SELECT COUNT(*) FROM extracted_text")
+        overflow = cursor.fetchone()[0] - self.max_entries
+        if overflow > 0:
+            cursor.execute(
+                "DELETE FROM extracted_text WHERE rowid IN ("
+                "SELECT rowid FROM extracted_text ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+        conn.commit()
+        conn.close()
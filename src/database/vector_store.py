@@ -1,18 +1,75 @@
+import uuid
+import hashlib
 import chromadb
+from dataclasses import dataclass, field
 from langchain_community.vectorstores import Chroma
-from langchain_ollama import OllamaEmbeddings
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime
 from src.config import settings
+from src.llm_clients import clients
+from src.tokens import estimate_tokens
+from src.database.metadata_store import ChunkRecord
+from src.database.embedding_batcher import (
+    EmbeddingBatcher, upsert_in_batches, update_in_batches, delete_in_batches,
+)
+from src.database.embedding_cache import EmbeddingCache
+from src.database.query_cache import QueryEmbeddingCache
+
+
+def chunk_ids(user_id: str, file_path: str, texts: List[str]) -> List[str]:
+    """Deterministic vector IDs derived from the owner, file path and chunk content.
+
+    Repeated identical chunks within one file get distinct IDs via their
+    occurrence number, so a file never collides with itself.
+    """
+    seen: Dict[str, int] = {}
+    ids = []
+    for text in texts:
+        occurrence = seen.get(text, 0)
+        seen[text] = occurrence + 1
+        key = f"{user_id}\0{file_path}\0{occurrence}\0{text}".encode("utf-8")
+        ids.append(hashlib.sha256(key).hexdigest())
+    return ids
+
+
+def chunk_records(user_id: str, file_path: str, texts: List[str],
+                  metadatas: List[Dict[str, Any]]) -> List[ChunkRecord]:
+    """Chunk-registry rows describing a file's full, current set of chunks."""
+    return [
+        ChunkRecord(
+            vector_id=chunk_id,
+            chunk_index=meta.get("chunk_index", i),
+            content_hash=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            start_char=meta.get("start_char"),
+            end_char=meta.get("end_char"),
+            token_count=estimate_tokens(text),
+            text=text,
+        )
+        for i, (chunk_id, text, meta)
+        in enumerate(zip(chunk_ids(user_id, file_path, texts), texts, metadatas))
+    ]
+
+
+@dataclass
+class ChunkDiff:
+    """How a file's freshly parsed chunks differ from what Chroma holds."""
+    new_ids: List[str] = field(default_factory=list)
+    new_texts: List[str] = field(default_factory=list)
+    new_metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    kept_ids: List[str] = field(default_factory=list)
+    kept_metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    stale_ids: List[str] = field(default_factory=list)
+
+    @property
+    def kept(self) -> int:
+        return len(self.kept_ids)
 
 
 class VectorStore:
     def __init__(self):
         self.client = chromadb.PersistentClient(path=settings.chroma_db_path)
-        self.embedding_function = OllamaEmbeddings(
-            model=settings.ollama_embed_model,
-            base_url=settings.ollama_base_url,
-        )
+        # Shares the Ollama connection pool with the chat models
+        self.embedding_function = clients.embeddings()
         self.collection_name = settings.chroma_collection_name
 
         # Initialize LangChain Chroma wrapper
@@ -21,17 +78,193 @@ class VectorStore:
             collection_name=self.collection_name,
             embedding_function=self.embedding_function,
         )
+        # Raw collection handle for writing pre-computed embeddings
+        self.collection = self.client.get_or_create_collection(name=self.collection_name)
+        # Buffers chunks across files for batched, concurrent embedding
+        self.embedding_cache = EmbeddingCache()
+        self.batcher = EmbeddingBatcher(
+            self.embedding_function,
+            self.collection,
+            cache=self.embedding_cache,
+            model_name=settings.ollama_embed_model,
+            max_write_batch=self.client.get_max_batch_size(),
+        )
+        # Question embeddings, so hot questions skip the Ollama round-trip
+        self.query_cache = QueryEmbeddingCache()
 
-    def add_documents(self, texts: List[str], metadatas: List[Dict[str, Any]]):
+    def add_documents(self, texts: List[str], metadatas: List[Dict[str, Any]],
+                      flush: bool = True,
+                      existing: Optional[Dict[str, Set[str]]] = None):
         """Add texts + metadata to the vector store.
 
-        Automatically enriches metadata with ingestion timestamp.
+        Automatically enriches metadata with ingestion timestamp. Chunks
+        carrying a "file_path" are diffed against that user's stored chunks
+        for the file: only new ones are embedded, unchanged ones only get
+        their metadata refreshed, and the ones no longer present are
+        deleted. existing maps file paths to their vector IDs from the
+        chunk registry; files missing from it are looked up in Chroma.
+        With flush=False the changes are only buffered; call flush() to
+        write them.
         """
+        existing = existing or {}
         now = datetime.now().isoformat()
         for meta in metadatas:
             meta.setdefault("ingested_at", now)
 
-        self.vectorstore.add_texts(texts=texts, metadatas=metadatas)
+        by_file: Dict[Tuple[str, str], List[int]] = {}
+        for i, meta in enumerate(metadatas):
+            file_path = meta.get("file_path")
+            if file_path:
+                by_file.setdefault((meta.get("user_id", ""), file_path), []).append(i)
+            else:
+                self.batcher.add([texts[i]], [meta], [str(uuid.uuid4())])
+
+        for (user_id, file_path), indices in by_file.items():
+            diff = self.diff_chunks(
+                user_id,
+                file_path,
+                [texts[i] for i in indices],
+                [metadatas[i] for i in indices],
+                existing=existing.get(file_path),
+            )
+            self.batcher.add(diff.new_texts, diff.new_metadatas, diff.new_ids)
+            self.batcher.update(diff.kept_ids, diff.kept_metadatas)
+            self.batcher.delete(diff.stale_ids)
+
+        if flush:
+            self.batcher.flush()
+
+    def clear_file(self, user_id: str, file_path: str, flush: bool = True,
+                   existing: Optional[Set[str]] = None) -> int:
+        """Delete every vector of a file that no longer yields any chunks.
+
+        The diff against an empty chunk set: existing is the file's vector
+        IDs from the chunk registry, looked up in Chroma when None. With
+        flush=False the deletions are only buffered, like add_documents.
+        Returns the number of vectors removed.
+        """
+        diff = self.diff_chunks(user_id, file_path, [], [], existing=existing)
+        self.batcher.delete(diff.stale_ids)
+        if flush:
+            self.batcher.flush()
+        return len(diff.stale_ids)
+
+    def get_chunk_ids(self, user_id: str, file_path: str) -> Set[str]:
+        """Return the IDs of every vector currently stored for a user's file."""
+        result = self.collection.get(
+            where={"$and": [{"user_id": user_id}, {"file_path": file_path}]},
+            include=[],
+        )
+        return set(result["ids"])
+
+    def delete_ids(self, ids: List[str]):
+        """Delete vectors by ID (e.g. as listed in the chunk registry)."""
+        if ids:
+            delete_in_batches(self.collection, self.batcher.max_write_batch, list(ids))
+
+    def delete_files(self, user_id: str, file_paths: List[str]):
+        """Delete every vector a user holds for the given files in one call."""
+        if file_paths:
+            self.collection.delete(where={"$and": [
+                {"user_id": user_id},
+                {"file_path": {"$in": list(file_paths)}},
+            ]})
+
+    def diff_chunks(self, user_id: str, file_path: str, texts: List[str],
+                    metadatas: List[Dict[str, Any]],
+                    existing: Optional[Set[str]] = None) -> ChunkDiff:
+        """Compare a file's parsed chunks with the vectors already stored for it.
+
+        existing, when given, is the file's vector IDs from the chunk
+        registry; otherwise they are looked up with a Chroma metadata filter.
+        """
+        ids = chunk_ids(user_id, file_path, texts)
+        if existing is None:
+            existing = self.get_chunk_ids(user_id, file_path)
+        diff = ChunkDiff()
+        for chunk_id, text, meta in zip(ids, texts, metadatas):
+            if chunk_id in existing:
+                # Positional fields (chunk_index, row ranges) may have moved;
+                # the original ingestion time is kept.
+                diff.kept_ids.append(chunk_id)
+                diff.kept_metadatas.append(
+                    {k: v for k, v in meta.items() if k != "ingested_at"}
+                )
+                continue
+            diff.new_ids.append(chunk_id)
+            diff.new_texts.append(text)
+            diff.new_metadatas.append(meta)
+        diff.stale_ids = sorted(existing - set(ids))
+        return diff
+
+    @staticmethod
+    def chunk_records(user_id: str, file_path: str, texts: List[str],
+                      metadatas: List[Dict[str, Any]]) -> List[ChunkRecord]:
+        """See chunk_records(); exposed here so callers need not import Chroma."""
+        return chunk_records(user_id, file_path, texts, metadatas)
+
+    def flush(self) -> int:
+        """Embed and write all buffered chunks. Returns the number written."""
+        return self.batcher.flush()
+
+    def batch_ready(self) -> bool:
+        """True when enough chunks are buffered to make a full flush worthwhile."""
+        return self.batcher.is_full()
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Return embedding-cache hit/miss counters."""
+        return self.embedding_cache.stats()
+
+    def query_cache_stats(self) -> Dict[str, int]:
+        """Return question-embedding cache counters."""
+        return self.query_cache.stats()
+
+    def embed_query(self, question: str) -> List[float]:
+        """Embed a question, reusing a cached vector when one is fresh."""
+        return self.query_cache.get_or_embed(
+            settings.ollama_embed_model, question, self.embedding_function.embed_query,
+        )
+
+    def search_by_vector(self, user_id: str, embedding: List[float], k: int):
+        """Return the user's k nearest chunks to an embedding as (Document, relevance).
+
+        Relevance is in [0, 1], higher meaning closer, as mapped from the
+        collection's distance metric by LangChain.
+        """
+        to_relevance = self.vectorstore._select_relevance_score_fn()
+        return [
+            (doc, to_relevance(distance))
+            for doc, distance in self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k, filter={"user_id": user_id},
+            )
+        ]
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the configured Ollama embedding model.
+
+        Large inputs are split into batches and embedded concurrently.
+        """
+        return self.batcher.embed(texts)
+
+    def write_chunk_diff(self, diff: ChunkDiff, embeddings: List[List[float]]):
+        """Apply a ChunkDiff whose new chunks were already embedded (see embed_texts).
+
+        Automatically enriches metadata with ingestion timestamp.
+        """
+        now = datetime.now().isoformat()
+        for meta in diff.new_metadatas:
+            meta.setdefault("ingested_at", now)
+
+        max_batch = self.batcher.max_write_batch
+        if diff.new_ids:
+            upsert_in_batches(
+                self.collection, max_batch, diff.new_ids, embeddings,
+                diff.new_texts, diff.new_metadatas,
+            )
+        if diff.kept_ids:
+            update_in_batches(self.collection, max_batch, diff.kept_ids, diff.kept_metadatas)
+        if diff.stale_ids:
+            delete_in_batches(self.collection, max_batch, diff.stale_ids)
 
     def as_retriever(self, user_id: str, **kwargs):
         """Return a retriever scoped to the specific user."""
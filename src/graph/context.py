@@ -0,0 +1,142 @@
+"""
+Context builder — assembles retrieved chunks into a prompt's context block.
+
+Chunks of the same file that are adjacent or overlap (the splitter repeats
+up to CHUNK_OVERLAP characters between neighbours) are merged into one
+passage by their character offsets, with the repeated text removed, and a
+passage contained in another is dropped. Passages are then packed in
+rank order into a token budget (estimate_tokens), so a prompt never
+outgrows the model's context window.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from src.tokens import CHARS_PER_TOKEN, estimate_tokens
+from src.ingestion.text_processor import CHUNK_OVERLAP
+
+SEPARATOR = "\n\n"
+SEPARATOR_TOKENS = estimate_tokens(SEPARATOR)
+
+# Shorter suffix/prefix matches are coincidence, not a chunk seam
+MIN_OVERLAP = 16
+
+# Characters between neighbouring chunks (whitespace the splitter strips)
+ADJACENT_GAP = 4
+
+# (source filename, start_char, end_char) of a chunk's text, offsets into
+# the file's extracted text; None for chunks ingested before they were recorded
+ChunkSpan = Tuple[str, Optional[int], Optional[int]]
+
+
+@dataclass
+class _Passage:
+    text: str
+    source: Optional[str]
+    start: Optional[int]
+    end: Optional[int]
+
+
+def build_context(documents: List[str], budget_tokens: int,
+                  spans: Optional[Dict[str, ChunkSpan]] = None) -> str:
+    """Merge, de-duplicate and pack documents (best first) into one context block.
+
+    spans maps chunk text to where it came from; only chunks of the same
+    file are merged. Chunks without a span are merged on repeated overlap.
+    """
+    passages = merge_passages(documents, spans)
+    packed = pack(passages, budget_tokens)
+    if len(packed) < len(documents):
+        print(f"    Context: {len(documents)} chunks → {len(packed)} passages "
+              f"(~{sum(estimate_tokens(p) for p in packed)} of {budget_tokens} tokens)")
+    return SEPARATOR.join(packed)
+
+
+def merge_passages(documents: List[str],
+                   spans: Optional[Dict[str, ChunkSpan]] = None) -> List[str]:
+    """Join adjacent or overlapping chunks of the same file and drop contained ones.
+
+    A merged passage takes the rank of its best-ranked chunk.
+    """
+    passages: List[Optional[_Passage]] = []
+    for document in documents:
+        source, start, end = (spans or {}).get(document, (None, None, None))
+        current, slot = _Passage(document, source, start, end), None
+        joined_any = True
+        # A chunk can bridge two passages, so rescan until nothing joins
+        while joined_any:
+            joined_any = False
+            for i, passage in enumerate(passages):
+                if passage is None or i == slot or passage.source != current.source:
+                    continue
+                joined = _join(passage, current)
+                if joined is None:
+                    continue
+                current, joined_any = joined, True
+                if slot is None or i < slot:
+                    if slot is not None:
+                        passages[slot] = None
+                    slot = i
+                else:
+                    passages[i] = None
+        if slot is None:
+            passages.append(current)
+        else:
+            passages[slot] = current
+    return [passage.text for passage in passages if passage is not None]
+
+
+def fits(passages: List[str], budget_tokens: int) -> List[int]:
+    """Indices of the passages that fit in budget_tokens, taken in rank order.
+
+    A passage that does not fit is skipped, leaving the room to smaller
+    lower-ranked ones.
+    """
+    kept, used = [], 0
+    for i, passage in enumerate(passages):
+        cost = estimate_tokens(passage) + SEPARATOR_TOKENS
+        if used + cost <= budget_tokens:
+            kept.append(i)
+            used += cost
+    return kept
+
+
+def pack(passages: List[str], budget_tokens: int) -> List[str]:
+    """The passages that fit in budget_tokens; the best one is truncated if none does."""
+    kept = [passages[i] for i in fits(passages, budget_tokens)]
+    if not kept and passages:
+        kept = [passages[0][:max(budget_tokens - SEPARATOR_TOKENS, 0) * CHARS_PER_TOKEN]]
+    return kept
+
+
+def _join(a: _Passage, b: _Passage) -> Optional[_Passage]:
+    """The two passages as one if one contains the other or they are neighbours, else None."""
+    if b.text in a.text:
+        return a
+    if a.text in b.text:
+        return b
+    if None in (a.start, a.end, b.start, b.end):
+        # Without offsets, only a repeated chunk overlap marks a seam
+        for left, right in ((a, b), (b, a)):
+            overlap = _overlap(left.text, right.text)
+            if overlap:
+                return _Passage(left.text + right.text[overlap:], a.source, None, None)
+        return None
+
+    left, right = (a, b) if a.start <= b.start else (b, a)
+    gap = right.start - left.end
+    if gap > ADJACENT_GAP:
+        return None
+    if gap >= 0:
+        text = left.text + (" " if gap else "") + right.text
+    else:
+        if not left.text.endswith(right.text[:-gap]):
+            return None  # offsets disagree with the text; keep both
+        text = left.text + right.text[-gap:]
+    return _Passage(text, left.source, left.start, max(left.end, right.end))
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that starts right (0 if under MIN_OVERLAP)."""
+    for size in range(min(len(left), len(right), CHUNK_OVERLAP), MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
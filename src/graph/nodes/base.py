@@ -0,0 +1,130 @@
+"""
+LLM node base — one node body, run synchronously or on an event loop.
+
+A node's `steps(state)` is a generator that yields the LLM calls it needs
+(LLMCall, or LLMBatch for independent calls) and receives their results;
+its return value is the state update. `__call__` drives it with
+`invoke`, `acall` with `ainvoke`, so the graph can be executed with either
+`invoke` or `ainvoke` without duplicating prompt or routing logic.
+
+Blocking work between calls (SQLite reads and writes, SQL over the
+user's tables) is yielded as a BlockingCall: `__call__` runs it inline,
+`acall` in a worker thread, so it never stalls the event loop.
+
+An exception raised by a call is thrown back into the generator at the
+`yield`, so nodes handle LLM failures with ordinary try/except.
+"""
+import time
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple, Union
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from src.graph.state import GraphState
+
+
+@dataclass
+class LLMCall:
+    """One chain invocation; the generator receives its output."""
+    chain: Runnable
+    inputs: Dict[str, Any]
+    config: Optional[RunnableConfig] = None
+
+
+@dataclass
+class LLMBatch:
+    """Independent invocations of one chain, at most max_concurrency at a time.
+
+    The generator receives [(output, seconds)] in input order.
+    """
+    chain: Runnable
+    inputs: List[Dict[str, Any]] = field(default_factory=list)
+    max_concurrency: int = 1
+
+
+@dataclass
+class BlockingCall:
+    """A synchronous function call (I/O, SQLite); the generator receives its result."""
+    fn: Callable[..., Any]
+    args: Tuple[Any, ...] = ()
+
+
+Step = Union[LLMCall, LLMBatch, BlockingCall]
+Steps = Generator[Step, Any, GraphState]
+
+
+class LLMNode:
+    # Batch worker pools, one per concurrency level, reused across calls
+    _executors: Optional[Dict[int, ContextThreadPoolExecutor]] = None
+    _executors_lock = threading.Lock()
+
+    def steps(self, state: GraphState) -> Steps:
+        raise NotImplementedError
+
+    def __call__(self, state: GraphState) -> GraphState:
+        steps = self.steps(state)
+        try:
+            step = next(steps)
+            while True:
+                try:
+                    output = self._run(step)
+                except Exception as e:
+                    step = steps.throw(e)
+                else:
+                    step = steps.send(output)
+        except StopIteration as done:
+            return done.value
+
+    async def acall(self, state: GraphState) -> GraphState:
+        steps = self.steps(state)
+        try:
+            step = next(steps)
+            while True:
+                try:
+                    output = await self._arun(step)
+                except Exception as e:
+                    step = steps.throw(e)
+                else:
+                    step = steps.send(output)
+        except StopIteration as done:
+            return done.value
+
+    def _run(self, step: Step) -> Any:
+        if isinstance(step, BlockingCall):
+            return step.fn(*step.args)
+        if isinstance(step, LLMCall):
+            return step.chain.invoke(step.inputs, config=step.config)
+
+        def timed(inputs: Dict[str, Any]) -> Tuple[Any, float]:
+            started = time.perf_counter()
+            output = step.chain.invoke(inputs)
+            return output, time.perf_counter() - started
+
+        # map() yields in input order, whatever order the calls finish in
+        return list(self._pool(max(1, step.max_concurrency)).map(timed, step.inputs))
+
+    def _pool(self, size: int) -> ContextThreadPoolExecutor:
+        with self._executors_lock:
+            if self._executors is None:
+                self._executors = {}
+            if size not in self._executors:
+                # Copies the run context into workers, so callbacks and tags propagate
+                self._executors[size] = ContextThreadPoolExecutor(max_workers=size)
+            return self._executors[size]
+
+    async def _arun(self, step: Step) -> Any:
+        if isinstance(step, BlockingCall):
+            return await asyncio.to_thread(step.fn, *step.args)
+        if isinstance(step, LLMCall):
+            return await step.chain.ainvoke(step.inputs, config=step.config)
+
+        limit = asyncio.Semaphore(max(1, step.max_concurrency))
+
+        async def timed(inputs: Dict[str, Any]) -> Tuple[Any, float]:
+            async with limit:
+                started = time.perf_counter()
+                output = await step.chain.ainvoke(inputs)
+                return output, time.perf_counter() - started
+
+        return list(await asyncio.gather(*(timed(inputs) for inputs in step.inputs)))
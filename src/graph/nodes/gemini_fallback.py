@@ -4,20 +4,20 @@ when no relevant local documents pass the grading filter.
 Still includes the raw (unfiltered) retrieved documents as personal
 background context, so Gemini has some knowledge of the user.
 """
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from src.graph.state import GraphState
+from src.graph.state import ANSWER_TAG, GraphState
+from src.llm_clients import clients
+from src.graph.nodes.base import LLMCall, LLMNode, Steps
+from src.graph.context import build_context
+from src.config import settings
 
 
-class GeminiFallbackNode:
+class GeminiFallbackNode(LLMNode):
     def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            temperature=0,
-        )
+        self.llm = clients.gemini()
 
-    def __call__(self, state: GraphState) -> GraphState:
+    def steps(self, state: GraphState) -> Steps:
         print("---GENERATE (GEMINI FALLBACK — no graded docs)---")
         question = state["question"]
 
@@ -31,7 +31,9 @@ class GeminiFallbackNode:
                 "The following is background information about the user from their "
                 "personal knowledge base. None of these were deemed directly relevant "
                 "to the question by the grading system, but they may provide useful "
-                "personal context:\n\n" + "\n\n".join(raw_docs)
+                "personal context:\n\n" + build_context(
+                    raw_docs, settings.gemini_context_tokens, state.get("chunk_spans"),
+                )
             )
 
             prompt = ChatPromptTemplate.from_messages([
@@ -56,7 +58,11 @@ class GeminiFallbackNode:
                   f"{context_block}\n\n"
                   f"Question: {question}\n"
                   f"---\n")
-            generation = chain.invoke({"context": context_block, "question": question})
+            generation = yield LLMCall(
+                chain,
+                {"context": context_block, "question": question},
+                config={"tags": [ANSWER_TAG]},
+            )
         else:
             print("    No raw documents available, answering with general knowledge")
             prompt = ChatPromptTemplate.from_messages([
@@ -73,7 +79,7 @@ class GeminiFallbackNode:
             ])
 
             chain = prompt | self.llm | StrOutputParser()
-            generation = chain.invoke({"question": question})
+            generation = yield LLMCall(chain, {"question": question}, config={"tags": [ANSWER_TAG]})
 
         return {
             "generation": generation,
@@ -2,31 +2,28 @@
 Local Generate Node — uses Ollama for fast, private local generation,
 then calls Gemini to enrich the answer with supplementary information.
 """
-from langchain_ollama import ChatOllama
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import List
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from src.graph.state import GraphState
+from src.graph.state import ANSWER_TAG, GraphState
+from src.llm_clients import clients
+from src.graph.nodes.base import LLMCall, LLMNode, Steps
+from src.graph.context import build_context
 from src.config import settings
 
 
-class GenerateNode:
+class GenerateNode(LLMNode):
     def __init__(self):
-        self.local_llm = ChatOllama(
-            model=settings.ollama_model,
-            base_url=settings.ollama_base_url,
-            temperature=0,
-        )
-        self.gemini_llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            temperature=0,
-        )
+        self.local_llm = clients.ollama()
+        self.gemini_llm = clients.gemini()
 
-    def __call__(self, state: GraphState) -> GraphState:
+    def steps(self, state: GraphState) -> Steps:
         print("---GENERATE (LOCAL)---")
         question = state["question"]
         documents = state["documents"]
-        context = "\n\n".join(documents)
+        spans = state.get("chunk_spans")
+        context = build_context(documents, settings.local_context_tokens, spans)
+        feedback = _claims_feedback(state.get("unsupported_claims") or [])
 
         # Step 1: Local LLM generates core answer from personal docs
         local_prompt = ChatPromptTemplate.from_messages([
@@ -39,14 +36,15 @@ class GenerateNode:
             ),
             (
                 "human",
-                "Question: {question}\n\nContext: {context}\n\nAnswer:",
+                "Question: {question}\n\nContext: {context}{feedback}\n\nAnswer:",
             ),
         ])
 
         local_chain = local_prompt | self.local_llm | StrOutputParser()
-        local_answer = local_chain.invoke({
+        local_answer = yield LLMCall(local_chain, {
             "context": context,
             "question": question,
+            "feedback": feedback,
         })
         print(f"    Local answer: {local_answer[:100]}...")
 
@@ -66,21 +64,23 @@ class GenerateNode:
                 "human",
                 "Question: {question}\n\n"
                 "Personal context:\n{context}\n\n"
-                "Local AI answer: {local_answer}\n\n"
+                "Local AI answer: {local_answer}{feedback}\n\n"
                 "Please provide an enriched, comprehensive answer:",
             ),
         ])
 
         enrich_chain = enrich_prompt | self.gemini_llm | StrOutputParser()
-        enriched = enrich_chain.invoke({
+        enrich_context = build_context(documents, settings.gemini_context_tokens, spans)
+        enriched = yield LLMCall(enrich_chain, {
             "question": question,
-            "context": context,
+            "context": enrich_context,
             "local_answer": local_answer,
-        })
+            "feedback": feedback,
+        }, config={"tags": [ANSWER_TAG]})
 
         print(f"\n📝 Prompt sent to Gemini (enrichment):\n"
               f"---\n"
-              f"Personal context:\n{context}\n\n"
+              f"Personal context:\n{enrich_context}\n\n"
               f"Local AI answer: {local_answer}\n\n"
               f"Question: {question}\n"
               f"---\n")
@@ -90,3 +90,12 @@ class GenerateNode:
             "generation_tier": "local+gemini",
             "retry_count": state.get("retry_count", 0) + 1,
         }
+
+
+def _claims_feedback(claims: List[str]) -> str:
+    """Prompt text listing claims a previous answer made without support."""
+    if not claims:
+        return ""
+    listed = "\n".join(f"- {claim}" for claim in claims)
+    return ("\n\nA previous answer was rejected because these claims are not "
+            f"supported by the context. Do not repeat them:\n{listed}")
@@ -3,20 +3,20 @@ Online Generate Node — uses Google Gemini API for richer answers.
 Invoked when the sufficiency check determines local docs are insufficient.
 Sends personal context + question to Gemini.
 """
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from src.graph.state import GraphState
+from src.graph.state import ANSWER_TAG, GraphState
+from src.llm_clients import clients
+from src.graph.nodes.base import LLMCall, LLMNode, Steps
+from src.graph.context import build_context
+from src.config import settings
 
 
-class OnlineGenerateNode:
+class OnlineGenerateNode(LLMNode):
     def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            temperature=0,
-        )
+        self.llm = clients.gemini()
 
-    def __call__(self, state: GraphState) -> GraphState:
+    def steps(self, state: GraphState) -> Steps:
         print("---GENERATE (GEMINI — docs insufficient)---")
         question = state["question"]
         documents = state["documents"]
@@ -39,7 +39,9 @@ class OnlineGenerateNode:
             ),
         ])
 
-        context = "\n\n".join(documents)
+        context = build_context(
+            documents, settings.gemini_context_tokens, state.get("chunk_spans"),
+        )
         print(f"\n📝 Prompt sent to Gemini:\n"
               f"---\n"
               f"Personal context:\n{context}\n\n"
@@ -48,8 +50,8 @@ class OnlineGenerateNode:
 
         rag_chain = prompt | self.llm | StrOutputParser()
 
-        generation = rag_chain.invoke({
+        generation = yield LLMCall(rag_chain, {
             "context": context,
             "question": question,
-        })
+        }, config={"tags": [ANSWER_TAG]})
         return {"generation": generation, "generation_tier": "gemini"}
@@ -1,27 +1,72 @@
 """
 Grade Node — filters retrieved documents for relevance using local Ollama
 with Pydantic structured output.
+
+Documents are graded concurrently, at most settings.grade_concurrency at a
+time (match it to the Ollama server's OLLAMA_NUM_PARALLEL); the kept
+documents stay in retrieval order.
+
+Fast path: a document whose retrieval score is at or above the accept
+threshold is kept, and one at or below the reject floor is dropped,
+without an LLM call. Thresholds come from settings or, when unset, are
+calibrated from the grade log of earlier LLM verdicts. A calibrated fast
+path still sends a random settings.grade_audit_rate sample of its
+decisions to the LLM, so the log keeps verdicts from the whole score range
+and recalibration does not drift toward the ambiguous band.
+
+LLM verdicts are memoized in the metadata store by (normalized question,
+chunk content hash, grader model), so a repeated question re-uses them.
 """
-from langchain_ollama import ChatOllama
+import random
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from src.graph.state import GraphState
+from src.llm_clients import clients
+from src.graph.nodes.base import BlockingCall, LLMBatch, LLMNode, Steps
 from src.graph.schemas import GradeResult
+from src.database.grade_log import GradeLog
+from src.database.metadata_store import MetadataStore
 from src.config import settings
 
 
-class GradeNode:
-    def __init__(self):
-        llm = ChatOllama(
-            model=settings.ollama_model,
-            base_url=settings.ollama_base_url,
-            temperature=0,
-        )
+class GradeNode(LLMNode):
+    def __init__(self, grade_log: Optional[GradeLog] = None,
+                 metadata_store: Optional[MetadataStore] = None):
+        llm = clients.ollama()
         self.structured_llm = llm.with_structured_output(GradeResult)
+        # Without a log, only thresholds set explicitly in settings are used
+        self.grade_log = grade_log
+        # Holds the verdict memo; verdicts are not memoized without it
+        self.metadata_store = metadata_store
+        self._calibration_lock = threading.Lock()
+        self._calibrated: Tuple[Optional[float], Optional[float]] = (None, None)
+        self._logged_since_calibration: Optional[int] = None  # None: never calibrated
 
-    def __call__(self, state: GraphState) -> GraphState:
+    def thresholds(self) -> Tuple[Optional[float], Optional[float]]:
+        """Return the (accept_score, reject_score) currently in force."""
+        if not settings.grade_fast_path:
+            return None, None
+        accept, reject = settings.grade_accept_score, settings.grade_reject_score
+        if accept is not None or reject is not None or self.grade_log is None:
+            return accept, reject
+        with self._calibration_lock:
+            if self._logged_since_calibration is None \
+                    or self._logged_since_calibration >= settings.grade_calibration_interval:
+                self._calibrated = self.grade_log.calibrate(
+                    settings.ollama_model,
+                    settings.grade_calibration_min_samples,
+                    settings.grade_calibration_precision,
+                )
+                self._logged_since_calibration = 0
+            return self._calibrated
+
+    def steps(self, state: GraphState) -> Steps:
         print("---CHECK RELEVANCE---")
         question = state["question"]
         documents = state["documents"]
+        scores: List[Optional[float]] = state.get("retrieval_scores") or [None] * len(documents)
 
         grade_prompt = ChatPromptTemplate.from_messages([
             (
@@ -41,13 +86,104 @@ class GradeNode:
 
         chain = grade_prompt | self.structured_llm
 
+        hashes = [hashlib.sha256(doc.encode("utf-8")).hexdigest() for doc in documents]
+        memo = yield BlockingCall(self._recall, (question, hashes))
+
+        # None: ambiguous, ask the LLM; True/False: decided by memo or score alone
+        accept, reject = yield BlockingCall(self.thresholds)
+        decided: List[Optional[bool]] = []
+        for content_hash, score in zip(hashes, scores):
+            if content_hash in memo:
+                decided.append(memo[content_hash])
+                continue
+            verdict: Optional[bool] = None
+            if score is not None and accept is not None and score >= accept:
+                verdict = True
+            elif score is not None and reject is not None and score <= reject:
+                verdict = False
+            if verdict is not None and self._audited():
+                verdict = None  # Graded and logged like an ambiguous chunk
+            decided.append(verdict)
+
+        ambiguous = [i for i, verdict in enumerate(decided) if verdict is None]
+        graded: Dict[int, Tuple[GradeResult, float]] = {}
+        if ambiguous:
+            results = yield LLMBatch(
+                chain,
+                [{"question": question, "document": documents[i]} for i in ambiguous],
+                max_concurrency=settings.grade_concurrency,
+            )
+            graded = dict(zip(ambiguous, results))
+        if len(ambiguous) < len(documents):
+            print(f"    Decided {len(documents) - len(ambiguous)} of {len(documents)} "
+                  f"documents without the LLM ({len(memo)} memoized)")
+        yield BlockingCall(self._remember, (question, [
+            ([hashes[i]], result.score) for i, (result, _latency) in graded.items()
+        ]))
+
         filtered_docs = []
-        for doc in documents:
-            result: GradeResult = chain.invoke({"question": question, "document": doc})
-            if result.score:
-                print("---GRADE: DOCUMENT RELEVANT---")
+        filtered_scores = []
+        latencies = []
+        outcomes = []
+        for i, doc in enumerate(documents):
+            if i in graded:
+                result, latency = graded[i]
+                relevant = result.score
+                if scores[i] is not None:
+                    outcomes.append((scores[i], relevant))
+            else:
+                relevant, latency = decided[i], 0.0
+            latencies.append(latency)
+            if relevant:
+                print(f"---GRADE: DOCUMENT RELEVANT ({latency:.2f}s)---")
                 filtered_docs.append(doc)
+                filtered_scores.append(scores[i])
             else:
-                print("---GRADE: DOCUMENT NOT RELEVANT---")
+                print(f"---GRADE: DOCUMENT NOT RELEVANT ({latency:.2f}s)---")
+
+        yield BlockingCall(self._log_outcomes, (outcomes,))
+        return {
+            "documents": filtered_docs,
+            "retrieval_scores": filtered_scores,
+            "grade_latencies": latencies,
+        }
+
+    def _audited(self) -> bool:
+        """Whether to send a calibrated fast-path decision to the LLM anyway."""
+        calibrated = (self.grade_log is not None and settings.grade_accept_score is None
+                      and settings.grade_reject_score is None)
+        return calibrated and random.random() < settings.grade_audit_rate
+
+    def _recall(self, question: str, hashes: List[str]) -> Dict[str, bool]:
+        if self.metadata_store is None or not settings.verdict_cache_enabled:
+            return {}
+        try:
+            return self.metadata_store.get_verdicts(
+                "relevance", settings.ollama_model, question, hashes,
+            )
+        except Exception as e:
+            print(f"    ⚠️  Verdict cache unavailable: {e}")
+            return {}
+
+    def _remember(self, question: str, verdicts: List[Tuple[List[str], bool]]):
+        if self.metadata_store is None or not settings.verdict_cache_enabled:
+            return
+        try:
+            self.metadata_store.put_verdicts(
+                "relevance", settings.ollama_model, question, verdicts,
+            )
+        except Exception as e:
+            print(f"    ⚠️  Could not memoize verdicts: {e}")
 
-        return {"documents": filtered_docs}
+    def _log_outcomes(self, outcomes: List[Tuple[float, bool]]):
+        if self.grade_log is None or not outcomes:
+            return
+        try:
+            self.grade_log.record(settings.ollama_model, outcomes)
+        except Exception as e:
+            # Calibration data is best-effort; grading already succeeded
+            print(f"    ⚠️  Could not log grading outcomes: {e}")
+            return
+        with self._calibration_lock:
+            if self._logged_since_calibration is not None:
+                self._logged_since_calibration += len(outcomes)
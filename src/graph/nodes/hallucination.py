@@ -2,28 +2,47 @@
 Hallucination Check Node — verifies the generated answer is grounded
 in the retrieved documents and actually addresses the question.
 Uses Pydantic structured output for reliable boolean results.
+
+By default ("sequential", settings.hallucination_mode) each verdict is
+one call. In "combined" mode one call returns both verdicts plus the
+unsupported claims, which the retry passes to the regenerator.
+
+The answer is checked against the context it was written from: the
+context budget of the tier that generated it.
 """
-from langchain_ollama import ChatOllama
+from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
 from src.graph.state import GraphState
-from src.graph.schemas import HallucinationResult
+from src.llm_clients import clients
+from src.graph.nodes.base import LLMCall, LLMNode, Steps
+from src.graph.context import build_context
+from src.graph.schemas import GroundingVerdict, HallucinationResult
 from src.config import settings
 
 
-class HallucinationNode:
+def _context_budget(tier: Optional[str]) -> int:
+    """Token budget of the context a generation tier answers from."""
+    # "local+gemini" and "gemini" answers are written by Gemini
+    return settings.local_context_tokens if tier == "local" else settings.gemini_context_tokens
+
+
+class HallucinationNode(LLMNode):
     def __init__(self):
-        llm = ChatOllama(
-            model=settings.ollama_model,
-            base_url=settings.ollama_base_url,
-            temperature=0,
-        )
+        llm = clients.ollama()
         self.structured_llm = llm.with_structured_output(HallucinationResult)
+        self.verdict_llm = llm.with_structured_output(GroundingVerdict)
 
-    def __call__(self, state: GraphState) -> GraphState:
+    def steps(self, state: GraphState) -> Steps:
         print("---CHECK HALLUCINATIONS---")
-        documents = state["documents"]
         generation = state["generation"]
         question = state["question"]
+        facts = build_context(
+            state["documents"], _context_budget(state.get("generation_tier")),
+            state.get("chunk_spans"),
+        )
+
+        if settings.hallucination_mode == "combined":
+            return (yield from self._combined_steps(question, facts, generation))
 
         # --- Phase 1: Groundedness Check ---
         hallucination_prompt = ChatPromptTemplate.from_messages([
@@ -44,8 +63,8 @@ class HallucinationNode:
         ])
 
         chain = hallucination_prompt | self.structured_llm
-        result: HallucinationResult = chain.invoke({
-            "documents": "\n\n".join(documents),
+        result: HallucinationResult = yield LLMCall(chain, {
+            "documents": facts,
             "generation": generation,
         })
         print(f"    Hallucination check result: grounded={result.score}")
@@ -74,7 +93,7 @@ class HallucinationNode:
         ])
 
         chain2 = answer_prompt | self.structured_llm
-        result2: HallucinationResult = chain2.invoke({
+        result2: HallucinationResult = yield LLMCall(chain2, {
             "question": question,
             "generation": generation,
         })
@@ -86,3 +105,48 @@ class HallucinationNode:
         else:
             print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
             return {"hallucination_status": False}
+
+    def _combined_steps(self, question: str, facts: str, generation: str) -> Steps:
+        prompt = ChatPromptTemplate.from_messages([
+            (
+                "system",
+                "You are a grader checking an LLM answer against the provided facts.\n"
+                "grounded: true only if every claim in the answer is supported by "
+                "the facts.\n"
+                "resolves_question: true if the answer addresses the question.\n"
+                "unsupported_claims: list each claim in the answer that the facts "
+                "do not support, quoted briefly; leave it empty if grounded.",
+            ),
+            (
+                "human",
+                "Facts:\n{documents}\n\n"
+                "Question: {question}\n\n"
+                "Answer: {generation}",
+            ),
+        ])
+
+        chain = prompt | self.verdict_llm
+        verdict: GroundingVerdict = yield LLMCall(chain, {
+            "documents": facts,
+            "question": question,
+            "generation": generation,
+        })
+        if verdict is None:
+            # Unparseable reply: treat as a failed check with nothing to correct
+            print("---DECISION: VERDICT UNREADABLE → NOT VERIFIED---")
+            return {"hallucination_status": False, "unsupported_claims": []}
+
+        print(f"    Combined check: grounded={verdict.grounded} "
+              f"resolves={verdict.resolves_question} "
+              f"unsupported={len(verdict.unsupported_claims)}")
+        if not verdict.grounded:
+            print("---DECISION: GENERATION IS NOT GROUNDED IN DOCUMENTS---")
+            return {
+                "hallucination_status": False,
+                "unsupported_claims": verdict.unsupported_claims,
+            }
+        if not verdict.resolves_question:
+            print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
+            return {"hallucination_status": False, "unsupported_claims": []}
+        print("---DECISION: GENERATION IS GROUNDED AND ADDRESSES QUESTION---")
+        return {"hallucination_status": True, "unsupported_claims": []}
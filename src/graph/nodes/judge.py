@@ -0,0 +1,130 @@
+"""
+Judge Node — grades relevance and sufficiency of the retrieved documents
+in a single listwise call to the local Ollama model.
+
+Selected with settings.grading_mode = "listwise" in place of GradeNode
+followed by SufficiencyNode, which send the same text k+1 times. The
+chunks are numbered in one prompt; the model returns the numbers of the
+relevant ones and whether those together answer the question.
+
+Chunks beyond settings.local_context_tokens are left out of the prompt
+and count as not relevant. Verdicts share the relevance/sufficiency memo
+with the separate nodes, so a repeated question whose verdicts are all
+known makes no call.
+"""
+import hashlib
+from typing import Dict, List, Optional, Tuple
+from langchain_core.prompts import ChatPromptTemplate
+from src.graph.state import GraphState
+from src.llm_clients import clients
+from src.graph.nodes.base import BlockingCall, LLMCall, LLMNode, Steps
+from src.graph.context import fits
+from src.graph.schemas import ListwiseJudgement
+from src.database.metadata_store import MetadataStore, verdict_key
+from src.config import settings
+
+
+class JudgeNode(LLMNode):
+    def __init__(self, metadata_store: Optional[MetadataStore] = None):
+        llm = clients.ollama()
+        self.structured_llm = llm.with_structured_output(ListwiseJudgement)
+        # Holds the verdict memo; verdicts are not memoized without it
+        self.metadata_store = metadata_store
+
+    def steps(self, state: GraphState) -> Steps:
+        print("---JUDGE RELEVANCE AND SUFFICIENCY---")
+        question = state["question"]
+        documents = state["documents"]
+        scores: List[Optional[float]] = state.get("retrieval_scores") or [None] * len(documents)
+
+        if not documents:
+            return {"documents": [], "retrieval_scores": [], "sufficiency_status": False}
+
+        hashes = [hashlib.sha256(doc.encode("utf-8")).hexdigest() for doc in documents]
+        relevance = yield BlockingCall(self._recall, ("relevance", question, hashes))
+        if len(relevance) == len(set(hashes)):
+            kept = [i for i, content_hash in enumerate(hashes) if relevance[content_hash]]
+            sufficient: Optional[bool] = False
+            if kept:
+                key = verdict_key([hashes[i] for i in kept])
+                known = yield BlockingCall(self._recall, ("sufficiency", question, [key]))
+                sufficient = known.get(key)
+            if sufficient is not None:
+                print("---JUDGEMENT (MEMOIZED)---")
+                return self._result(documents, scores, kept, sufficient)
+
+        prompt = ChatPromptTemplate.from_messages([
+            (
+                "system",
+                "You are a grader assessing numbered documents retrieved for the "
+                "user's question.\n"
+                "relevant_chunks: list the number of every document that contains "
+                "keywords or meaning related to the question.\n"
+                "sufficient: true only if the relevant documents together contain "
+                "all key facts needed to FULLY answer the question; false if they "
+                "are partial or missing critical info.",
+            ),
+            (
+                "human",
+                "Documents:\n{documents}\n\n"
+                "Question: {question}",
+            ),
+        ])
+
+        chain = prompt | self.structured_llm
+        judged = fits(documents, settings.local_context_tokens) or [0]
+        if len(judged) < len(documents):
+            print(f"    Judging {len(judged)} of {len(documents)} documents "
+                  f"within the context budget")
+        numbered = "\n\n".join(
+            f"[{n}] {documents[i]}" for n, i in enumerate(judged, start=1)
+        )
+        judgement: ListwiseJudgement = yield LLMCall(
+            chain, {"documents": numbered, "question": question},
+        )
+        if judgement is None:
+            # Unparseable reply: keep everything and let the online tier answer
+            print("---JUDGEMENT UNREADABLE → ALL KEPT, INSUFFICIENT---")
+            return self._result(documents, scores, judged, False)
+
+        chosen = {judged[n - 1] for n in judgement.relevant_chunks if 1 <= n <= len(judged)}
+        kept = sorted(chosen)
+        sufficient = judgement.sufficient and bool(kept)
+
+        verdicts = [("relevance", [([hashes[i]], i in chosen) for i in judged])]
+        if kept:
+            verdicts.append(("sufficiency", [([hashes[i] for i in kept], sufficient)]))
+        for kind, kind_verdicts in verdicts:
+            yield BlockingCall(self._remember, (kind, question, kind_verdicts))
+        return self._result(documents, scores, kept, sufficient)
+
+    @staticmethod
+    def _result(documents: List[str], scores: List[Optional[float]],
+                kept: List[int], sufficient: bool) -> GraphState:
+        print(f"---JUDGE: {len(kept)} OF {len(documents)} DOCUMENTS RELEVANT---")
+        if sufficient:
+            print("---DECISION: DOCUMENTS SUFFICIENT → LOCAL LLM---")
+        elif kept:
+            print("---DECISION: DOCUMENTS INSUFFICIENT → POWERFUL LLM---")
+        return {
+            "documents": [documents[i] for i in kept],
+            "retrieval_scores": [scores[i] for i in kept],
+            "sufficiency_status": sufficient,
+        }
+
+    def _recall(self, kind: str, question: str, keys: List[str]) -> Dict[str, bool]:
+        if self.metadata_store is None or not settings.verdict_cache_enabled:
+            return {}
+        try:
+            return self.metadata_store.get_verdicts(kind, settings.ollama_model, question, keys)
+        except Exception as e:
+            print(f"    ⚠️  Verdict cache unavailable: {e}")
+            return {}
+
+    def _remember(self, kind: str, question: str, verdicts: List[Tuple[List[str], bool]]):
+        if self.metadata_store is None or not settings.verdict_cache_enabled:
+            return
+        try:
+            self.metadata_store.put_verdicts(kind, settings.ollama_model, question, verdicts)
+        except Exception as e:
+            print(f"    ⚠️  Could not memoize verdicts: {e}")
@@ -1,23 +1,113 @@
+"""
+Retrieve Node — hybrid retrieval over the user's chunks.
+
+Vector similarity search and BM25 keyword search over the chunk
+registry's full-text index run in parallel and are fused by reciprocal
+rank, so exact tokens (account numbers, names, dates, file names) that
+embeddings miss still surface. Question embeddings come from the vector
+store's query cache, so repeated questions are not re-embedded. Each
+document's vector relevance score is kept (None for keyword-only hits)
+so grading can skip the LLM for clear-cut chunks, and each chunk's
+character span so prompt assembly can merge neighbouring chunks of a file.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from src.graph.state import GraphState
+from src.graph.context import ChunkSpan
 from src.database.vector_store import VectorStore
+from src.database.metadata_store import MetadataStore
+from src.config import settings
+
+# (source filename, chunk text) — identifies a chunk across both indexes
+ChunkKey = Tuple[str, str]
+
+
+def reciprocal_rank_fusion(rankings: List[List[ChunkKey]], k: int) -> List[ChunkKey]:
+    """Merge ranked lists: each item scores sum(1 / (k + rank)) over the lists it is in."""
+    scores: Dict[ChunkKey, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
 
 class RetrieveNode:
-    def __init__(self, vector_store: VectorStore):
+    def __init__(self, vector_store: VectorStore,
+                 metadata_store: Optional[MetadataStore] = None):
         self.vector_store = vector_store
+        # Lexical search is skipped without a metadata store (no full-text index)
+        self.metadata_store = metadata_store
+        self.executor = ThreadPoolExecutor(max_workers=2)
 
     def __call__(self, state: GraphState) -> GraphState:
         print("---RETRIEVE---")
         question = state["question"]
         user_id = state["user_id"]
 
-        # Scope retrieval to user_id
-        retriever = self.vector_store.as_retriever(user_id=user_id)
-        documents = retriever.invoke(question)
-        
+        hybrid = settings.hybrid_retrieval and self.metadata_store is not None
+        candidates = settings.retrieval_candidates if hybrid else settings.retrieval_k
+        vector_future = self.executor.submit(self._vector_search, question, user_id, candidates)
+        lexical, spans = self._lexical_search(question, user_id, candidates) if hybrid else ([], {})
+        vector, scores, vector_spans = vector_future.result()
+        spans.update(vector_spans)
+
+        if lexical:
+            ranked = reciprocal_rank_fusion([vector, lexical], settings.rrf_k)
+            print(f"    Fused {len(vector)} vector + {len(lexical)} keyword hits")
+        else:
+            ranked = vector
+        ranked = ranked[:settings.retrieval_k]
+
         # Extract page_content and source metadata
-        doc_texts = [doc.page_content for doc in documents]
-        sources = list(dict.fromkeys(
-            doc.metadata.get("source", "unknown") for doc in documents
-        ))
+        doc_texts = [text for _source, text in ranked]
+        sources = list(dict.fromkeys(source for source, _text in ranked))
+        chunk_spans: Dict[str, ChunkSpan] = {
+            text: (source, *spans.get((source, text), (None, None)))
+            for source, text in ranked
+        }
+
+        return {
+            "documents": doc_texts,
+            "raw_documents": doc_texts,
+            "sources": sources,
+            "chunk_spans": chunk_spans,
+            "retrieval_scores": [scores.get(key) for key in ranked],
+        }
+
+    async def acall(self, state: GraphState) -> GraphState:
+        # Embedding and index lookups are blocking I/O; keep them off the loop
+        return await asyncio.to_thread(self, state)
+
+    def _vector_search(self, question: str, user_id: str, k: int) -> Tuple[
+        List[ChunkKey], Dict[ChunkKey, float], Dict[ChunkKey, Tuple[Optional[int], Optional[int]]]
+    ]:
+        """Return the nearest chunks in rank order, their relevance scores and character spans."""
+        embedding = self.vector_store.embed_query(question)
+        ranked: List[ChunkKey] = []
+        scores: Dict[ChunkKey, float] = {}
+        spans: Dict[ChunkKey, Tuple[Optional[int], Optional[int]]] = {}
+        # Scope retrieval to user_id
+        for doc, score in self.vector_store.search_by_vector(user_id, embedding, k):
+            key = (doc.metadata.get("source", "unknown"), doc.page_content)
+            ranked.append(key)
+            scores.setdefault(key, score)
+            # Vectors stored before offsets were characters carry none
+            spans[key] = (doc.metadata.get("start_char"), doc.metadata.get("end_char"))
+        return ranked, scores, spans
 
-        return {"documents": doc_texts, "raw_documents": doc_texts, "sources": sources}
+    def _lexical_search(self, question: str, user_id: str, k: int) -> Tuple[
+        List[ChunkKey], Dict[ChunkKey, Tuple[Optional[int], Optional[int]]]
+    ]:
+        try:
+            hits = self.metadata_store.search_chunks(user_id, question, k)
+        except Exception as e:
+            # Keyword search is an enhancement; vector results still stand
+            print(f"    ⚠️  Keyword search failed: {e}")
+            return [], {}
+        ranked = [(hit["source"], hit["text"]) for hit in hits]
+        spans = {
+            (hit["source"], hit["text"]): (hit.get("start_char"), hit.get("end_char"))
+            for hit in hits
+        }
+        return ranked, spans
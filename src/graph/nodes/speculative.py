@@ -0,0 +1,96 @@
+"""
+Speculative Sufficiency Node — runs the sufficiency check and the local
+draft answer at the same time.
+
+When the documents turn out to be sufficient (the common case) the draft
+is already under way, saving one LLM round-trip before the hallucination
+check. When they are not, the draft is discarded and the graph continues
+to online generation: under ainvoke the draft task is cancelled; under
+invoke the worker thread cannot be interrupted, so its result is simply
+dropped when it finishes. Wasted-work counters are kept in `stats`.
+"""
+import time
+import asyncio
+import threading
+from typing import Dict, Optional
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from src.graph.state import GraphState
+from src.graph.nodes.sufficiency import SufficiencyNode
+from src.graph.nodes.generate import GenerateNode
+
+
+class SpeculativeSufficiencyNode:
+    def __init__(self, sufficiency_node: SufficiencyNode, generate_node: GenerateNode):
+        self.sufficiency_node = sufficiency_node
+        self.generate_node = generate_node
+        self.executor = ContextThreadPoolExecutor(max_workers=2)
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {
+            "speculated": 0,          # drafts started before the verdict
+            "used": 0,                # drafts kept (documents sufficient)
+            "discarded": 0,           # drafts thrown away (insufficient)
+            "wasted_seconds": 0.0,    # draft time spent on discarded drafts
+        }
+
+    def stats(self) -> Dict[str, float]:
+        """Return speculation counters since the agent started."""
+        with self._lock:
+            return dict(self.counters)
+
+    def _count(self, **deltas: float):
+        with self._lock:
+            for key, delta in deltas.items():
+                self.counters[key] += delta
+
+    def __call__(self, state: GraphState) -> GraphState:
+        known = self._known_verdict(state)
+        if known is not None:
+            return self._without_speculation(known, self.generate_node(state) if known else None)
+
+        print("---CHECK SUFFICIENCY + LOCAL DRAFT (SPECULATIVE)---")
+        started = time.perf_counter()
+        draft = self.executor.submit(self.generate_node, state)
+        verdict = self.sufficiency_node(state)
+        if verdict["sufficiency_status"]:
+            self._count(speculated=1, used=1)
+            return {**verdict, **draft.result()}
+
+        self._count(speculated=1, discarded=1)
+        if not draft.cancel():
+            draft.add_done_callback(
+                lambda _f: self._count(wasted_seconds=time.perf_counter() - started)
+            )
+        print("---SPECULATIVE DRAFT DISCARDED → POWERFUL LLM---")
+        return {**verdict, "speculation_discarded": True}
+
+    async def acall(self, state: GraphState) -> GraphState:
+        known = await asyncio.to_thread(self._known_verdict, state)
+        if known is not None:
+            draft = await self.generate_node.acall(state) if known else None
+            return self._without_speculation(known, draft)
+
+        print("---CHECK SUFFICIENCY + LOCAL DRAFT (SPECULATIVE)---")
+        started = time.perf_counter()
+        draft = asyncio.create_task(self.generate_node.acall(state))
+        try:
+            verdict = await self.sufficiency_node.acall(state)
+        except BaseException:
+            draft.cancel()
+            raise
+        if verdict["sufficiency_status"]:
+            self._count(speculated=1, used=1)
+            return {**verdict, **(await draft)}
+
+        draft.cancel()
+        self._count(speculated=1, discarded=1, wasted_seconds=time.perf_counter() - started)
+        print("---SPECULATIVE DRAFT CANCELLED → POWERFUL LLM---")
+        return {**verdict, "speculation_discarded": True}
+
+    def _known_verdict(self, state: GraphState) -> Optional[bool]:
+        # No point drafting when the verdict needs no LLM call
+        return self.sufficiency_node.memoized(state)
+
+    @staticmethod
+    def _without_speculation(sufficient: bool, draft: Optional[GraphState]) -> GraphState:
+        print(f"---DECISION (KNOWN): {'SUFFICIENT' if sufficient else 'INSUFFICIENT'}---")
+        return {"sufficiency_status": sufficient, **(draft or {})}
@@ -3,24 +3,30 @@ Sufficiency Check Node — determines whether the retrieved documents
 contain enough information to fully answer the user's question.
 Routes to local LLM (sufficient) or powerful LLM (insufficient).
 Uses Pydantic structured output for reliable boolean results.
+
+Verdicts are memoized in the metadata store by (normalized question, the
+sorted set of chunk content hashes, model).
 """
-from langchain_ollama import ChatOllama
+import hashlib
+from typing import List, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from src.graph.state import GraphState
+from src.llm_clients import clients
+from src.graph.nodes.base import BlockingCall, LLMCall, LLMNode, Steps
+from src.graph.context import build_context
 from src.graph.schemas import GradeResult
+from src.database.metadata_store import MetadataStore, verdict_key
 from src.config import settings
 
 
-class SufficiencyNode:
-    def __init__(self):
-        llm = ChatOllama(
-            model=settings.ollama_model,
-            base_url=settings.ollama_base_url,
-            temperature=0,
-        )
+class SufficiencyNode(LLMNode):
+    def __init__(self, metadata_store: Optional[MetadataStore] = None):
+        llm = clients.ollama()
         self.structured_llm = llm.with_structured_output(GradeResult)
+        # Holds the verdict memo; verdicts are not memoized without it
+        self.metadata_store = metadata_store
 
-    def __call__(self, state: GraphState) -> GraphState:
+    def steps(self, state: GraphState) -> Steps:
         print("---CHECK SUFFICIENCY---")
         question = state["question"]
         documents = state["documents"]
@@ -29,7 +35,15 @@ class SufficiencyNode:
             print("---DECISION: NO DOCUMENTS → INSUFFICIENT---")
             return {"sufficiency_status": False}
 
-        context = "\n\n".join(documents)
+        hashes = [hashlib.sha256(doc.encode("utf-8")).hexdigest() for doc in documents]
+        memoized = yield BlockingCall(self._recall, (question, hashes))
+        if memoized is not None:
+            print(f"---DECISION (MEMOIZED): {'SUFFICIENT' if memoized else 'INSUFFICIENT'}---")
+            return {"sufficiency_status": memoized}
+
+        context = build_context(
+            documents, settings.local_context_tokens, state.get("chunk_spans"),
+        )
 
         prompt = ChatPromptTemplate.from_messages([
             (
@@ -49,9 +63,10 @@ class SufficiencyNode:
         ])
 
         chain = prompt | self.structured_llm
-        result: GradeResult = chain.invoke({"context": context, "question": question})
+        result: GradeResult = yield LLMCall(chain, {"context": context, "question": question})
 
         is_sufficient = result.score
+        yield BlockingCall(self._remember, (question, hashes, is_sufficient))
 
         if is_sufficient:
             print("---DECISION: DOCUMENTS SUFFICIENT → LOCAL LLM---")
@@ -59,3 +74,33 @@ class SufficiencyNode:
             print("---DECISION: DOCUMENTS INSUFFICIENT → POWERFUL LLM---")
 
         return {"sufficiency_status": is_sufficient}
+
+    def memoized(self, state: GraphState) -> Optional[bool]:
+        """The verdict known without an LLM call (no documents, or memoized), else None."""
+        documents = state["documents"]
+        if not documents:
+            return False
+        hashes = [hashlib.sha256(doc.encode("utf-8")).hexdigest() for doc in documents]
+        return self._recall(state["question"], hashes)
+
+    def _recall(self, question: str, hashes: List[str]) -> Optional[bool]:
+        if self.metadata_store is None or not settings.verdict_cache_enabled:
+            return None
+        key = verdict_key(hashes)
+        try:
+            return self.metadata_store.get_verdicts(
+                "sufficiency", settings.ollama_model, question, [key],
+            ).get(key)
+        except Exception as e:
+            print(f"    ⚠️  Verdict cache unavailable: {e}")
+            return None
+
+    def _remember(self, question: str, hashes: List[str], verdict: bool):
+        if self.metadata_store is None or not settings.verdict_cache_enabled:
+            return
+        try:
+            self.metadata_store.put_verdicts(
+                "sufficiency", settings.ollama_model, question, [(hashes, verdict)],
+            )
+        except Exception as e:
+            print(f"    ⚠️  Could not memoize verdict: {e}")
@@ -0,0 +1,136 @@
+"""
+Table Query Node — answers table-shaped questions (totals, counts,
+averages, filters over CSV data) with a generated SQL query over the
+user's ingested tables, instead of stuffing serialized rows into a prompt.
+Falls through to normal retrieval when the question is not tabular or
+the query fails or runs over its budget.
+
+Questions that share no word with any table's column names or source
+filename skip the routing call (and the schema's sample-row queries)
+altogether, so non-tabular questions pay nothing for having CSVs.
+"""
+import re
+import sqlite3
+from typing import Any, Dict, List, Set
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from src.graph.state import GraphState
+from src.llm_clients import clients
+from src.graph.nodes.base import BlockingCall, LLMCall, LLMNode, Steps
+from src.graph.schemas import TableQueryResult
+from src.database.table_store import TableStore
+from src.config import settings
+
+# Words shorter than this ("is", "of", "my") match too much to mean anything
+MIN_TERM_LENGTH = 3
+
+
+def _terms(text: str) -> Set[str]:
+    """Lower-cased words of text, split on underscores too, with a plural "s" dropped."""
+    return {
+        word[:-1] if len(word) > MIN_TERM_LENGTH and word.endswith("s") else word
+        for word in re.findall(r"[a-z0-9]+", text.lower())
+        if len(word) >= MIN_TERM_LENGTH
+    }
+
+
+def mentions_tables(question: str, tables: List[Dict[str, Any]]) -> bool:
+    """True if the question shares a word with a table's column names or filename."""
+    vocabulary: Set[str] = set()
+    for table in tables:
+        vocabulary |= _terms(table["filename"].rsplit(".", 1)[0])
+        for column, _type in table["columns"]:
+            vocabulary |= _terms(column)
+    return bool(_terms(question) & vocabulary)
+
+
+class TableQueryNode(LLMNode):
+    def __init__(self, table_store: TableStore):
+        self.table_store = table_store
+        self.llm = clients.ollama()
+        self.structured_llm = self.llm.with_structured_output(TableQueryResult)
+
+    def steps(self, state: GraphState) -> Steps:
+        print("---CHECK TABLES---")
+        question = state["question"]
+        user_id = state["user_id"]
+
+        tables = yield BlockingCall(self.table_store.list_tables, (user_id,))
+        if not tables:
+            return {"table_status": False}
+        if not mentions_tables(question, tables):
+            print("---DECISION: NO TABLE TERMS IN QUESTION → RETRIEVE---")
+            return {"table_status": False}
+
+        schema = yield BlockingCall(self.table_store.describe, (user_id,))
+        if not schema:
+            return {"table_status": False}
+
+        query_prompt = ChatPromptTemplate.from_messages([
+            (
+                "system",
+                "You translate questions about a user's tabular data into SQLite "
+                "queries. Only use the tables and columns listed below, and always "
+                "double-quote table and column names.\n"
+                "Set is_tabular to true only if the question is about values in "
+                "these tables (totals, counts, averages, lookups, filters). "
+                "Otherwise set it to false and leave sql empty.\n\n"
+                "{schema}",
+            ),
+            ("human", "Question: {question}"),
+        ])
+
+        chain = query_prompt | self.structured_llm
+        try:
+            decision: TableQueryResult = yield LLMCall(chain, {"schema": schema, "question": question})
+        except Exception as e:
+            # A malformed structured reply must not take down the whole graph
+            print(f"---TABLE ROUTING FAILED ({e}) → RETRIEVE---")
+            return {"table_status": False}
+        if decision is None or not decision.is_tabular or not decision.sql.strip():
+            print("---DECISION: NOT A TABLE QUESTION → RETRIEVE---")
+            return {"table_status": False}
+
+        print(f"    SQL: {decision.sql}")
+        try:
+            columns, rows = yield BlockingCall(self.table_store.query, (user_id, decision.sql))
+        except sqlite3.Error as e:
+            print(f"---TABLE QUERY FAILED ({e}) → RETRIEVE---")
+            return {"table_status": False}
+
+        result_text = "\n".join(
+            [" | ".join(columns)] + [" | ".join(str(v) for v in row) for row in rows]
+        )
+
+        answer_prompt = ChatPromptTemplate.from_messages([
+            (
+                "system",
+                "You are a personal assistant. Answer the user's question using "
+                "ONLY the SQL query result below. Be concise and state the numbers "
+                "exactly as they appear.",
+            ),
+            (
+                "human",
+                "Question: {question}\n\n"
+                "SQL: {sql}\n\n"
+                "Result:\n{result}\n\nAnswer:",
+            ),
+        ])
+
+        answer_chain = answer_prompt | self.llm | StrOutputParser()
+        generation = yield LLMCall(answer_chain, {
+            "question": question,
+            "sql": decision.sql,
+            "result": result_text,
+        })
+
+        sources = [t["filename"] for t in tables if t["table_name"] in decision.sql]
+        print("---DECISION: ANSWERED FROM TABLES---")
+        return {
+            "generation": generation,
+            "generation_tier": "table",
+            "table_status": True,
+            "hallucination_status": True,  # Computed from the data, not generated
+            "documents": [result_text],
+            "sources": sources,
+        }
@@ -1,8 +1,9 @@
 """
 Pydantic schemas for structured LLM outputs.
-Used by grading, sufficiency, and hallucination nodes
+Used by grading, sufficiency, judge, and hallucination nodes
 to get reliable boolean results instead of parsing raw strings.
 """
+from typing import List
 from pydantic import BaseModel, Field
 
 
@@ -13,8 +14,45 @@ class GradeResult(BaseModel):
     )
 
 
+class ListwiseJudgement(BaseModel):
+    """Relevance of each numbered chunk and sufficiency of the relevant ones, judged in one call."""
+    relevant_chunks: List[int] = Field(
+        default_factory=list,
+        description="Numbers of the chunks relevant to the question; empty if none are.",
+    )
+    sufficient: bool = Field(
+        description="Set to true if the relevant chunks together contain enough information "
+                    "to fully answer the question, false otherwise."
+    )
+
+
 class HallucinationResult(BaseModel):
     """Result of a hallucination or answer-resolution check."""
     score: bool = Field(
         description="Set to true if the generation is grounded in facts / resolves the question, false otherwise."
     )
+
+
+class GroundingVerdict(BaseModel):
+    """Groundedness and question resolution of an answer, judged in one call."""
+    grounded: bool = Field(
+        description="Set to true if every claim in the generation is supported by the facts."
+    )
+    resolves_question: bool = Field(
+        description="Set to true if the generation addresses the user's question."
+    )
+    unsupported_claims: List[str] = Field(
+        default_factory=list,
+        description="Each claim in the generation that the facts do not support; empty if grounded.",
+    )
+
+
+class TableQueryResult(BaseModel):
+    """Decision on whether a question can be answered by querying the user's tables."""
+    is_tabular: bool = Field(
+        description="Set to true if the question can be answered exactly by an SQL query over the listed tables."
+    )
+    sql: str = Field(
+        default="",
+        description="A single SQLite SELECT statement answering the question, or empty if is_tabular is false.",
+    )
@@ -1,4 +1,8 @@
-from typing import TypedDict, List
+from typing import Dict, TypedDict, List, Optional, Tuple
+
+# Run tag marking the LLM call whose tokens form the user-facing answer;
+# RagAgent.stream forwards only these tokens.
+ANSWER_TAG = "answer"
 
 
 class GraphState(TypedDict):
@@ -12,7 +16,14 @@ class GraphState(TypedDict):
     relevance_score: float        # Score from the grader
     hallucination_status: bool    # True if answer is supported by docs
     sufficiency_status: bool      # True if docs are sufficient to answer
-    generation_tier: str          # "local", "powerful", or "gemini"
+    generation_tier: str          # "local", "powerful", "gemini" or "table"
     retry_count: int              # Number of generation retries
     user_id: str                  # User context
     sources: List[str]            # Source filenames for citation
+    table_status: bool            # True if answered by a query over CSV tables
+    grade_latencies: List[float]  # Seconds spent grading each retrieved doc
+    retrieval_scores: List[Optional[float]]  # Vector relevance per doc (None: keyword-only)
+    speculation_discarded: bool   # True if a speculative local draft was thrown away
+    unsupported_claims: List[str] # Claims the hallucination check rejected, for the retry
+    # Chunk text → (source filename, start_char, end_char), for merging neighbours
+    chunk_spans: Dict[str, Tuple[str, Optional[int], Optional[int]]]
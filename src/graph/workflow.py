@@ -2,54 +2,121 @@
 RAG Agent Workflow — LangGraph state machine with two-tier generation.
 
 Flow:
-  Retrieve → Grade
+  Table Query
+    → (answered by SQL over CSV tables) → END
+    → (not tabular / no tables) → Retrieve
+  Retrieve (vector + BM25, fused by reciprocal rank) → Grade
     → (no relevant docs) → Gemini Fallback → END
     → (has relevant docs) → Sufficiency Check
       → (sufficient)   → Generate Local  → Hallucination Check → END / retry
       → (insufficient) → Generate Online → Hallucination Check → END / retry
+
+With grading_mode "listwise", one Judge call grades relevance and
+sufficiency together in place of Grade + Sufficiency Check, and routes
+straight to generation.
+
+A retry regenerates locally; with hallucination_mode "combined" the check
+names the unsupported claims and the regeneration is told to avoid them.
+
+With speculative_generation, Sufficiency Check drafts the local answer in
+parallel and a sufficient verdict goes straight to Hallucination Check.
+
+RagAgent.run answers a question from the answer cache when the user asked
+a near-identical one since their files last changed. RagAgent.stream and
+astream yield node progress and answer tokens while the graph runs.
 """
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
-from src.graph.state import GraphState
+from src.graph.state import ANSWER_TAG, GraphState
 from src.graph.nodes.retrieve import RetrieveNode
 from src.graph.nodes.grade import GradeNode
 from src.graph.nodes.sufficiency import SufficiencyNode
+from src.graph.nodes.judge import JudgeNode
 from src.graph.nodes.generate import GenerateNode
 from src.graph.nodes.generate_online import OnlineGenerateNode
 from src.graph.nodes.hallucination import HallucinationNode
 from src.graph.nodes.gemini_fallback import GeminiFallbackNode
+from src.graph.nodes.table_query import TableQueryNode
+from src.graph.nodes.speculative import SpeculativeSufficiencyNode
 from src.database.vector_store import VectorStore
+from src.database.metadata_store import MetadataStore
+from src.database.table_store import TableStore
+from src.database.answer_cache import AnswerCache
+from src.database.grade_log import GradeLog
+from src.config import settings
 
 MAX_RETRIES = 2
+GRAPH_CONFIG = {"recursion_limit": 10}
+
+
+def _node(node) -> RunnableLambda:
+    """Wrap a node so the graph runs __call__ under invoke and acall under ainvoke."""
+    return RunnableLambda(node, afunc=node.acall, name=type(node).__name__)
 
 
 class RagAgent:
     def __init__(self):
         # Initialize Dependencies
         self.vector_store = VectorStore()
+        self.metadata_store = MetadataStore()
+        self.table_store = TableStore()
+        self.answer_cache = AnswerCache()
 
         # Initialize Nodes
-        self.retrieve_node = RetrieveNode(self.vector_store)
-        self.grade_node = GradeNode()
-        self.sufficiency_node = SufficiencyNode()
+        self.table_query_node = TableQueryNode(self.table_store)
+        self.retrieve_node = RetrieveNode(self.vector_store, self.metadata_store)
+        self.grade_node = GradeNode(GradeLog(), self.metadata_store)
+        self.sufficiency_node = SufficiencyNode(self.metadata_store)
+        # One listwise call for relevance and sufficiency instead of k+1
+        self.judge_node = (
+            JudgeNode(self.metadata_store) if settings.grading_mode == "listwise" else None
+        )
         self.generate_node = GenerateNode()
         self.online_generate_node = OnlineGenerateNode()
         self.hallucination_node = HallucinationNode()
         self.gemini_fallback_node = GeminiFallbackNode()
+        # Optionally draft the local answer while sufficiency is being judged
+        # (the listwise judge has no separate sufficiency call to overlap)
+        self.speculative_node = (
+            SpeculativeSufficiencyNode(self.sufficiency_node, self.generate_node)
+            if settings.speculative_generation and self.judge_node is None else None
+        )
 
         # Build Graph
         self.workflow = StateGraph(GraphState)
 
         # Add Nodes
-        self.workflow.add_node("retrieve", self.retrieve_node)
-        self.workflow.add_node("grade_documents", self.grade_node)
-        self.workflow.add_node("sufficiency_check", self.sufficiency_node)
-        self.workflow.add_node("generate_local", self.generate_node)
-        self.workflow.add_node("generate_online", self.online_generate_node)
-        self.workflow.add_node("hallucination_check", self.hallucination_node)
-        self.workflow.add_node("gemini_fallback", self.gemini_fallback_node)
+        self.workflow.add_node("table_query", _node(self.table_query_node))
+        self.workflow.add_node("retrieve", _node(self.retrieve_node))
+        self.workflow.add_node("grade_documents", _node(self.judge_node or self.grade_node))
+        if self.judge_node is None:
+            self.workflow.add_node(
+                "sufficiency_check", _node(self.speculative_node or self.sufficiency_node),
+            )
+        self.workflow.add_node("generate_local", _node(self.generate_node))
+        self.workflow.add_node("generate_online", _node(self.online_generate_node))
+        self.workflow.add_node("hallucination_check", _node(self.hallucination_node))
+        self.workflow.add_node("gemini_fallback", _node(self.gemini_fallback_node))
 
         # --- Edges ---
-        self.workflow.set_entry_point("retrieve")
+        self.workflow.set_entry_point("table_query")
+
+        # Table-shaped questions answered by SQL skip retrieval entirely
+        def check_table_answer(state):
+            if state.get("table_status", False):
+                return "end_table"
+            return "retrieve"
+
+        self.workflow.add_conditional_edges(
+            "table_query",
+            check_table_answer,
+            {
+                "end_table": END,
+                "retrieve": "retrieve",
+            },
+        )
         self.workflow.add_edge("retrieve", "grade_documents")
 
         # After grading: check if any relevant docs remain
@@ -58,32 +125,51 @@ class RagAgent:
                 return "no_docs_gemini"
             return "check_sufficiency"
 
-        self.workflow.add_conditional_edges(
-            "grade_documents",
-            check_doc_relevance,
-            {
-                "check_sufficiency": "sufficiency_check",
-                "no_docs_gemini": "gemini_fallback",
-            },
-        )
-
         # Gemini fallback goes straight to END (no hallucination check needed)
         self.workflow.add_edge("gemini_fallback", END)
 
-        # After sufficiency check: route to local or online generation
+        # After sufficiency check: route to local or online generation.
+        # A speculative check has already produced the local answer.
+        local_target = "hallucination_check" if self.speculative_node else "generate_local"
+
         def route_generation(state):
             if state.get("sufficiency_status", False):
                 return "generate_local"
             return "generate_online"
 
-        self.workflow.add_conditional_edges(
-            "sufficiency_check",
-            route_generation,
-            {
-                "generate_local": "generate_local",
-                "generate_online": "generate_online",
-            },
-        )
+        if self.judge_node is None:
+            self.workflow.add_conditional_edges(
+                "grade_documents",
+                check_doc_relevance,
+                {
+                    "check_sufficiency": "sufficiency_check",
+                    "no_docs_gemini": "gemini_fallback",
+                },
+            )
+            self.workflow.add_conditional_edges(
+                "sufficiency_check",
+                route_generation,
+                {
+                    "generate_local": local_target,
+                    "generate_online": "generate_online",
+                },
+            )
+        else:
+            # The judge has already decided sufficiency
+            def route_judgement(state):
+                if not state["documents"]:
+                    return "no_docs_gemini"
+                return route_generation(state)
+
+            self.workflow.add_conditional_edges(
+                "grade_documents",
+                route_judgement,
+                {
+                    "generate_local": "generate_local",
+                    "generate_online": "generate_online",
+                    "no_docs_gemini": "gemini_fallback",
+                },
+            )
 
         # Both generation paths lead to hallucination check
         self.workflow.add_edge("generate_local", "hallucination_check")
@@ -111,16 +197,141 @@ class RagAgent:
         self.app = self.workflow.compile()
 
     def run(self, question: str, user_id: str):
-        inputs = {"question": question, "user_id": user_id, "retry_count": 0}
+        cache_key = self._answer_cache_key(question, user_id)
+        cached = self._cached_answer(user_id, cache_key)
+        if cached is not None:
+            return cached
+        try:
+            result = self.app.invoke(self._inputs(question, user_id), config=GRAPH_CONFIG)
+        except Exception as e:
+            result = self._give_up(e)
+        return self._finish(question, user_id, cache_key, result)
+
+    async def arun(self, question: str, user_id: str):
+        """Async variant of run(); LLM calls are awaited rather than blocking a thread."""
+        cache_key = await asyncio.to_thread(self._answer_cache_key, question, user_id)
+        cached = self._cached_answer(user_id, cache_key)
+        if cached is not None:
+            return cached
         try:
-            return self.app.invoke(inputs, config={"recursion_limit": 10})
+            result = await self.app.ainvoke(self._inputs(question, user_id), config=GRAPH_CONFIG)
         except Exception as e:
-            if "recursion" in str(e).lower():
-                print(f"---RECURSION LIMIT REACHED, STOPPING---")
-                return {
-                    "generation": "I wasn't able to produce a fully verified answer. "
-                                  "Please try rephrasing your question.",
-                    "hallucination_status": False,
-                    "generation_tier": "local",
+            result = self._give_up(e)
+        return self._finish(question, user_id, cache_key, result)
+
+    def stream(self, question: str, user_id: str) -> Iterator[Dict[str, Any]]:
+        """Run the graph, yielding events as they happen:
+
+          {"type": "node", "node": name}      a node finished
+          {"type": "token", "text": str}      a piece of the provisional answer
+          {"type": "retract", "retrying": b}  the answer failed the hallucination
+                                              check; when retrying, discard it,
+                                              a new one is streamed next
+          {"type": "final", "result": dict}   last event; same dict as run()
+        """
+        cache_key = self._answer_cache_key(question, user_id)
+        cached = self._cached_answer(user_id, cache_key)
+        if cached is not None:
+            yield {"type": "final", "result": cached}
+            return
+        state = self._inputs(question, user_id)
+        try:
+            for mode, payload in self.app.stream(
+                dict(state), config=GRAPH_CONFIG, stream_mode=["updates", "messages"],
+            ):
+                yield from self._events(mode, payload, state)
+        except Exception as e:
+            state = self._give_up(e)
+        yield {"type": "final", "result": self._finish(question, user_id, cache_key, state)}
+
+    async def astream(self, question: str, user_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of stream(), yielding the same events."""
+        cache_key = await asyncio.to_thread(self._answer_cache_key, question, user_id)
+        cached = self._cached_answer(user_id, cache_key)
+        if cached is not None:
+            yield {"type": "final", "result": cached}
+            return
+        state = self._inputs(question, user_id)
+        try:
+            async for mode, payload in self.app.astream(
+                dict(state), config=GRAPH_CONFIG, stream_mode=["updates", "messages"],
+            ):
+                for event in self._events(mode, payload, state):
+                    yield event
+        except Exception as e:
+            state = self._give_up(e)
+        yield {"type": "final", "result": self._finish(question, user_id, cache_key, state)}
+
+    @staticmethod
+    def _inputs(question: str, user_id: str) -> Dict[str, Any]:
+        return {"question": question, "user_id": user_id, "retry_count": 0}
+
+    @staticmethod
+    def _events(mode: str, payload: Any, state: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Turn one LangGraph stream item into events, folding updates into state."""
+        if mode == "messages":
+            chunk, metadata = payload
+            if state.get("speculation_discarded") \
+                    and metadata.get("langgraph_node") == "sufficiency_check":
+                return  # late tokens of a discarded draft
+            if ANSWER_TAG in (metadata.get("tags") or []):
+                text = chunk.content if isinstance(chunk.content, str) else "".join(
+                    part.get("text", "") for part in chunk.content if isinstance(part, dict)
+                )
+                if text:
+                    yield {"type": "token", "text": text}
+            return
+        for node, update in payload.items():
+            state.update(update or {})
+            yield {"type": "node", "node": node}
+            if node == "sufficiency_check" and (update or {}).get("speculation_discarded"):
+                yield {"type": "retract", "retrying": True}
+            if node == "hallucination_check" and not state.get("hallucination_status"):
+                yield {
+                    "type": "retract",
+                    "retrying": state.get("retry_count", 0) < MAX_RETRIES,
                 }
-            raise
+
+    def _cached_answer(self, user_id: str, cache_key) -> Optional[Dict[str, Any]]:
+        if cache_key is None:
+            return None
+        cached = self.answer_cache.lookup(user_id, *cache_key)
+        if cached is not None:
+            print("---ANSWER CACHE HIT---")
+            cached["cached"] = True
+        return cached
+
+    def _finish(self, question: str, user_id: str, cache_key,
+                result: Dict[str, Any]) -> Dict[str, Any]:
+        result["cached"] = False
+        # Only answers grounded in the user's data are worth replaying
+        if cache_key is not None and result.get("generation") and (
+            result.get("hallucination_status") or result.get("table_status")
+        ):
+            self.answer_cache.store(user_id, question, *cache_key, result)
+        return result
+
+    def _answer_cache_key(self, question: str, user_id: str):
+        """Return (question embedding, corpus version), or None to bypass the cache."""
+        if not settings.answer_cache_enabled:
+            return None
+        try:
+            # Served from the query cache again when retrieval runs
+            embedding = self.vector_store.embed_query(question)
+            return embedding, self.metadata_store.get_corpus_version(user_id)
+        except Exception as e:
+            print(f"    ⚠️  Answer cache unavailable: {e}")
+            return None
+
+    @staticmethod
+    def _give_up(error: Exception) -> Dict[str, Any]:
+        """Result for a run stopped by the recursion limit; other errors propagate."""
+        if "recursion" not in str(error).lower():
+            raise error
+        print(f"---RECURSION LIMIT REACHED, STOPPING---")
+        return {
+            "generation": "I wasn't able to produce a fully verified answer. "
+                          "Please try rephrasing your question.",
+            "hallucination_status": False,
+            "generation_tier": "local",
+        }
@@ -1,51 +1,89 @@
 """
-CSV Processor — Table-level serialization for CSV files.
-Concatenates all rows into a single document so the LLM can see the
-complete table context when answering queries.
+CSV Processor — Streaming row-group serialization for CSV files.
+The table is read in chunks and rows are packed into documents sized to
+a token budget. Every document repeats the column preamble so the LLM
+sees the table context, and records which rows it covers.
 """
 import pandas as pd
 from typing import List, Dict, Any, Tuple
 
+from src.tokens import CHARS_PER_TOKEN
+
+
+# Rows read from disk per pandas chunk
+READ_CHUNK_ROWS = 10_000
+
+# Approximate token budget per emitted document (~4 characters per token)
+TOKENS_PER_DOCUMENT = 512
+
 
 def process_csv_file(file_path: str, user_id: str) -> Tuple[List[str], List[Dict[str, Any]]]:
     """
-    Read a CSV file and serialize the entire table into a single document.
-    Each row is rendered as 'Column: Value' pairs, separated by blank lines.
-    A header preamble lists all column names for additional context.
+    Read a CSV file and serialize it into row-group documents.
+    Each row is rendered as 'Column: Value' lines, rows separated by blank
+    lines, and each document starts with a preamble listing all columns.
+    A small table still fits in a single document.
 
     Returns (documents, metadatas) ready for vector store ingestion.
     """
-    df = pd.read_csv(file_path)
     filename = file_path.split("/")[-1]
+    budget = TOKENS_PER_DOCUMENT * CHARS_PER_TOKEN
 
-    if df.empty:
-        return [], []
-
-    # Build a preamble that describes the table structure
-    columns_list = ", ".join(df.columns.tolist())
-    preamble = f"Data from {filename} (columns: {columns_list}):\n"
+    documents: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    preamble = ""
+    group: List[str] = []
+    group_chars = 0
+    group_start = last_row = 0  # 0-based data-row numbers, row_end inclusive
 
-    # Serialize every row into 'Column: Value' lines
-    row_blocks = []
-    for _, row in df.iterrows():
-        context_str = "\n".join(
-            [f"{col}: {val}" for col, val in row.items() if pd.notna(val)]
-        )
-        if context_str.strip():
-            row_blocks.append(context_str)
+    def emit(row_end: int):
+        documents.append(preamble + "\n\n".join(group))
+        metadatas.append({
+            "user_id": user_id,
+            "source": filename,
+            "source_type": "csv",
+            "file_path": file_path,
+            "chunk_index": len(documents) - 1,
+            "row_start": group_start,
+            "row_end": row_end,
+        })
 
-    if not row_blocks:
-        return [], []
+    row_offset = 0
+    for df in pd.read_csv(file_path, chunksize=READ_CHUNK_ROWS):
+        if not preamble:
+            columns_list = ", ".join(str(c) for c in df.columns)
+            preamble = f"Data from {filename} (columns: {columns_list}):\n"
 
-    # Join all rows into one document separated by blank lines
-    full_document = preamble + "\n\n".join(row_blocks)
+        for row_number, block in zip(range(row_offset, row_offset + len(df)),
+                                     _serialize_rows(df)):
+            if not block:
+                continue
+            if group and group_chars + len(block) > budget - len(preamble):
+                emit(last_row)
+                group, group_chars = [], 0
+            if not group:
+                group_start = row_number
+            group.append(block)
+            group_chars += len(block) + 2  # "\n\n" separator
+            last_row = row_number
+        row_offset += len(df)
 
-    documents = [full_document]
-    metadatas = [{
-        "user_id": user_id,
-        "source": filename,
-        "source_type": "csv",
-        "file_path": file_path,
-    }]
+    if group:
+        emit(last_row)
 
     return documents, metadatas
+
+
+def _serialize_rows(df: pd.DataFrame) -> List[str]:
+    """Render each row as 'Column: Value' lines using column-wise string ops.
+
+    Missing values are left out. Rows with no values become empty strings.
+    """
+    rows = pd.Series("", index=df.index, dtype=object)
+    for col in df.columns:
+        values = df[col]
+        present = values.notna()
+        piece = (f"{col}: " + values.astype(str)).where(present, "")
+        separator = pd.Series("\n", index=df.index).where((rows != "") & present, "")
+        rows = rows + separator + piece
+    return rows.tolist()
@@ -3,12 +3,15 @@ Directory Scanner — walks a local directory, detects file types,
 and routes each file to the appropriate processor for ingestion.
 """
 import os
-from typing import Dict, Callable, Tuple, List, Any
+from typing import Dict, Callable, Iterator, Optional, Set, Tuple, List, Any
 
 from src.database.vector_store import VectorStore
-from src.database.metadata_store import MetadataStore
+from src.database.metadata_store import ChunkRecord, MetadataStore
+from src.database.table_store import TableStore
 from src.ingestion.text_processor import process_text_file, process_pdf_file
 from src.ingestion.csv_loader import process_csv_file
+from src.ingestion.pipeline import IngestionPipeline, parse_file
+from src.config import settings
 
 
 # Map file extensions to their processor functions
@@ -25,69 +28,258 @@ SUPPORTED_EXTENSIONS = set(EXTENSION_MAP.keys())
 
 
 class DirectoryScanner:
-    def __init__(self, vector_store: VectorStore, metadata_store: MetadataStore):
+    def __init__(self, vector_store: VectorStore, metadata_store: MetadataStore,
+                 table_store: Optional[TableStore] = None):
         self.vector_store = vector_store
         self.metadata_store = metadata_store
+        # When set, CSV files are also loaded as queryable SQL tables
+        self.table_store = table_store
 
-    def scan(self, directory: str, user_id: str) -> Dict[str, int]:
+    def scan(self, directory: str, user_id: str,
+             workers: Optional[int] = None, paranoid: bool = False) -> Dict[str, int]:
         """
         Walk a directory, process all supported files, and ingest them.
 
-        Returns a summary dict: {"ingested": N, "skipped": M, "errors": E}
+        With workers > 1 (default: settings.ingest_workers) the files go
+        through the parallel IngestionPipeline instead of one at a time.
+        Files whose (size, mtime, inode) are unchanged are not re-read;
+        paranoid=True forces a full SHA-256 of every file.
+
+        Files recorded for this user under the directory but no longer on
+        disk are tombstoned and their vectors deleted.
+
+        Returns a summary dict: {"ingested": N, "skipped": M, "errors": E,
+        "removed": R, "cache_hits": H, "cache_misses": X}, the last two
+        counting chunks served from / missing in the embedding cache.
         """
-        directory = os.path.expanduser(directory)
+        # Absolute, so "./data" and "data" record the same paths
+        directory = os.path.abspath(os.path.expanduser(directory))
         if not os.path.isdir(directory):
             print(f"Error: '{directory}' is not a valid directory.")
-            return {"ingested": 0, "skipped": 0, "errors": 1}
+            return {"ingested": 0, "skipped": 0, "errors": 1, "removed": 0,
+                    "cache_hits": 0, "cache_misses": 0}
+
+        workers = settings.ingest_workers if workers is None else workers
+        cache_before = self.vector_store.cache_stats()
+        files = list(self._iter_files(directory))
+        if workers > 1:
+            print(f"  ⚙️  Pipelined scan with {workers} workers")
+            pipeline = IngestionPipeline(
+                self.vector_store, self.metadata_store,
+                workers=workers, paranoid=paranoid, table_store=self.table_store,
+            )
+            stats = pipeline.run(files, user_id)
+        else:
+            stats = self._scan_sequential(files, user_id, paranoid)
+
+        stats["removed"] = self._reconcile_deleted(
+            directory, user_id, {entry[0] for entry in files}, stats
+        )
+
+        cache_after = self.vector_store.cache_stats()
+        stats["cache_hits"] = cache_after["hits"] - cache_before["hits"]
+        stats["cache_misses"] = cache_after["misses"] - cache_before["misses"]
+        return stats
+
+    def ingest_paths(self, changed: List[str], removed: List[str],
+                     user_id: str) -> Dict[str, int]:
+        """Ingest specific changed files and remove deleted ones, without a walk.
+
+        Used by watch mode so the cost scales with the number of touched
+        files rather than the size of the directory.
+        """
+        cache_before = self.vector_store.cache_stats()
+        files = [
+            entry for entry in (self._file_entry(os.path.abspath(p)) for p in changed)
+            if entry is not None
+        ]
+        stats = self._scan_sequential(files, user_id, paranoid=False)
+        # Only files that were actually ingested need removing
+        recorded = sorted(self.metadata_store.get_hashes(
+            [os.path.abspath(p) for p in removed]
+        ))
+        stats["removed"] = self._remove_files(user_id, recorded, stats)
 
+        cache_after = self.vector_store.cache_stats()
+        stats["cache_hits"] = cache_after["hits"] - cache_before["hits"]
+        stats["cache_misses"] = cache_after["misses"] - cache_before["misses"]
+        return stats
+
+    def _reconcile_deleted(self, directory: str, user_id: str,
+                           seen: Set[str], stats: Dict[str, int]) -> int:
+        """Tombstone recorded files that are gone from disk. Returns how many."""
+        vanished = sorted(
+            set(self.metadata_store.get_live_paths(user_id, directory)) - seen
+        )
+        return self._remove_files(user_id, vanished, stats)
+
+    def _remove_files(self, user_id: str, vanished: List[str],
+                      stats: Dict[str, int]) -> int:
+        """Delete vectors and tombstone records for vanished files. Returns how many."""
+        if not vanished:
+            return 0
+        try:
+            # Vectors first: if this fails the files stay live and are retried
+            registered = self.metadata_store.get_chunk_ids(user_id, vanished)
+            self.vector_store.delete_ids(
+                [vector_id for ids in registered.values() for vector_id in ids]
+            )
+            # Files ingested before the chunk registry existed
+            unregistered = [p for p in vanished if p not in registered]
+            if unregistered:
+                self.vector_store.delete_files(user_id, unregistered)
+            self.metadata_store.tombstone_files(user_id, vanished)
+            if self.table_store is not None:
+                self.table_store.drop_tables(user_id, vanished)
+        except Exception as e:
+            print(f"  ❌ Error removing {len(vanished)} deleted files: {e}")
+            stats["errors"] += 1
+            return 0
+        for file_path in vanished:
+            print(f"  🗑️  Removed (deleted from disk): {file_path}")
+        return len(vanished)
+
+    def _scan_sequential(self, files: List[Tuple[str, str, str, Callable]],
+                         user_id: str, paranoid: bool) -> Dict[str, int]:
+        """Hash, parse, embed and record files one at a time in this process."""
         stats = {"ingested": 0, "skipped": 0, "errors": 0}
+        # Files whose chunks are buffered in the vector store, awaiting flush
+        pending: List[Tuple[str, str, str, str, List[ChunkRecord]]] = []
 
-        for root, _dirs, files in os.walk(directory):
-            for filename in sorted(files):
-                file_path = os.path.join(root, filename)
-                ext = os.path.splitext(filename)[1].lower()
+        # Stored hashes and stat signatures for every file, in a few queries
+        paths = [entry[0] for entry in files]
+        stored_hashes = self.metadata_store.get_hashes(paths)
+        file_states = {} if paranoid else self.metadata_store.get_file_states(paths)
+        fresh_states: List[Tuple[str, os.stat_result, str]] = []
 
-                if ext not in SUPPORTED_EXTENSIONS:
-                    continue
+        for file_path, filename, ext, processor in files:
+            # --- Change detection: skip unchanged files ---
+            try:
+                stat = os.stat(file_path)
+                current_hash = self.metadata_store.hash_for_stat(
+                    file_states.get(file_path), stat
+                )
+                if current_hash is None:
+                    current_hash = self.metadata_store.compute_file_hash(file_path)
+                    fresh_states.append((file_path, stat, current_hash))
+            except OSError as e:
+                print(f"  ⚠️  Cannot read {file_path}: {e}")
+                stats["errors"] += 1
+                continue
 
-                # --- Change detection: skip unchanged files ---
-                try:
-                    current_hash = MetadataStore.compute_file_hash(file_path)
-                except OSError as e:
-                    print(f"  ⚠️  Cannot read {file_path}: {e}")
-                    stats["errors"] += 1
-                    continue
+            if stored_hashes.get(file_path) == current_hash:
+                print(f"  ⏩ Skipping (unchanged): {file_path}")
+                stats["skipped"] += 1
+                if ext == ".csv":
+                    self._ensure_table(user_id, file_path)
+                continue
+
+            # --- Process the file ---
+            try:
+                print(f"  📄 Processing: {file_path}")
+                documents, metadatas = parse_file(processor, file_path, user_id, current_hash)
 
-                if not self.metadata_store.check_file_changed(file_path, current_hash):
-                    print(f"  ⏩ Skipping (unchanged): {file_path}")
+                if documents:
+                    # Buffered: chunks from several files share embedding calls
+                    self.vector_store.add_documents(
+                        texts=documents, metadatas=metadatas, flush=False,
+                        existing=self.metadata_store.get_chunk_ids(user_id, [file_path]),
+                    )
+                    records = self.vector_store.chunk_records(
+                        user_id, file_path, documents, metadatas
+                    )
+                    pending.append((filename, file_path, current_hash, ext, records))
+                elif file_path in stored_hashes:
+                    # Edited down to nothing: its old chunks are all stale
+                    removed = self.vector_store.clear_file(
+                        user_id, file_path, flush=False,
+                        existing=self.metadata_store.get_chunk_ids(user_id, [file_path])
+                        .get(file_path),
+                    )
+                    print(f"    ⚠️  No content left in {file_path}; "
+                          f"removing {removed} stale chunks")
+                    pending.append((filename, file_path, current_hash, ext, []))
+                else:
+                    print(f"    ⚠️  No content extracted from {file_path}")
                     stats["skipped"] += 1
-                    continue
 
-                # --- Process the file ---
-                processor = EXTENSION_MAP[ext]
-                try:
-                    print(f"  📄 Processing: {file_path}")
-                    documents, metadatas = processor(file_path, user_id)
-
-                    if documents:
-                        self.vector_store.add_documents(
-                            texts=documents, metadatas=metadatas
-                        )
-                        self.metadata_store.add_file(
-                            user_id=user_id,
-                            filename=filename,
-                            file_path=file_path,
-                            file_hash=current_hash,
-                            source_type=ext.lstrip("."),
-                        )
-                        print(f"    ✅ Ingested {len(documents)} chunks")
-                        stats["ingested"] += 1
-                    else:
-                        print(f"    ⚠️  No content extracted from {file_path}")
-                        stats["skipped"] += 1
-
-                except Exception as e:
-                    print(f"    ❌ Error processing {file_path}: {e}")
-                    stats["errors"] += 1
+            except Exception as e:
+                print(f"    ❌ Error processing {file_path}: {e}")
+                stats["errors"] += 1
+                continue
 
+            if pending and self.vector_store.batch_ready():
+                self._commit(pending, user_id, stats)
+
+        self._commit(pending, user_id, stats)
+        self.metadata_store.record_file_states(fresh_states)
         return stats
+
+    def _commit(self, pending: List[Tuple[str, str, str, str, List[ChunkRecord]]],
+                user_id: str, stats: Dict[str, int]):
+        """Flush buffered vectors, then record the files they belong to.
+
+        Metadata is only written after its vectors, so a failed flush leaves
+        the files unrecorded and the next scan retries them.
+        """
+        if not pending:
+            return
+        try:
+            self.vector_store.flush()
+        except Exception as e:
+            for _filename, file_path, _hash, _ext, _records in pending:
+                print(f"    ❌ Error processing {file_path}: embedding failed: {e}")
+            stats["errors"] += len(pending)
+            pending.clear()
+            return
+
+        self.metadata_store.add_files(
+            user_id,
+            [
+                (filename, file_path, file_hash, ext.lstrip("."))
+                for filename, file_path, file_hash, ext, _records in pending
+            ],
+            chunks={file_path: records for _name, file_path, _hash, _ext, records in pending},
+        )
+        for filename, file_path, file_hash, ext, records in pending:
+            if ext == ".csv" and self.table_store is not None:
+                if records:
+                    self._load_table(user_id, file_path)
+                else:
+                    self.table_store.drop_tables(user_id, [file_path])
+            print(f"    ✅ Ingested {len(records)} chunks: {filename}")
+            stats["ingested"] += 1
+        pending.clear()
+
+    def _ensure_table(self, user_id: str, file_path: str):
+        """Load an unchanged CSV whose table is missing (ingested before the
+        table store existed, or its last load failed)."""
+        if self.table_store is not None and not self.table_store.has_table(user_id, file_path):
+            self._load_table(user_id, file_path)
+
+    def _load_table(self, user_id: str, file_path: str):
+        """Load a CSV into the table store; failures only cost the SQL path."""
+        try:
+            rows = self.table_store.load_csv(user_id, file_path)
+            print(f"    📊 Loaded {rows} rows as a table")
+        except Exception as e:
+            print(f"    ⚠️  Could not load {file_path} as a table: {e}")
+
+    @staticmethod
+    def _file_entry(file_path: str) -> Optional[Tuple[str, str, str, Callable]]:
+        """Return (file_path, filename, ext, processor), or None if unsupported."""
+        filename = os.path.basename(file_path)
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in SUPPORTED_EXTENSIONS or not os.path.isfile(file_path):
+            return None
+        return file_path, filename, ext, EXTENSION_MAP[ext]
+
+    @staticmethod
+    def _iter_files(directory: str) -> Iterator[Tuple[str, str, str, Callable]]:
+        """Yield (file_path, filename, ext, processor) for every supported file."""
+        for root, _dirs, files in os.walk(directory):
+            for filename in sorted(files):
+                ext = os.path.splitext(filename)[1].lower()
+                if ext not in SUPPORTED_EXTENSIONS:
+                    continue
+                yield os.path.join(root, filename), filename, ext, EXTENSION_MAP[ext]
@@ -0,0 +1,317 @@
+"""
+Ingestion Pipeline — parallel, pipelined variant of DirectoryScanner.scan.
+
+Stages, connected by bounded queues so a slow stage applies backpressure:
+  1. Hash   — stat() every candidate; files whose stat signature changed are
+              SHA-256'd in a process pool, streaming into the parse stage
+  2. Parse  — changed files are routed to their processor in the same pool
+  3. Embed  — chunks from several files are batched into one embedding call
+  4. Write  — a single writer thread records vectors + metadata
+"""
+import os
+import queue
+import inspect
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.database.metadata_store import MetadataStore
+from src.config import settings
+
+if TYPE_CHECKING:
+    # Imported lazily: worker processes re-import this module and should not
+    # pay for loading Chroma + LangChain just to hash and parse files.
+    from src.database.vector_store import ChunkDiff, VectorStore
+    from src.database.table_store import TableStore
+
+
+# Sentinel marking the end of a stage's output
+_DONE = object()
+
+
+@dataclass
+class ParsedFile:
+    """A file travelling through the pipeline, from parse to write."""
+    file_path: str
+    filename: str
+    ext: str
+    file_hash: str
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    # Recorded by an earlier scan, so yielding no chunks removes its old ones
+    ingested: bool = False
+    diff: Optional["ChunkDiff"] = None
+    embeddings: Optional[List[List[float]]] = None
+    error: Optional[str] = None
+
+
+def _hash_file(file_path: str) -> Tuple[Optional[str], Optional[str]]:
+    """Worker: return (hash, None) or (None, error message)."""
+    try:
+        return MetadataStore.compute_file_hash(file_path), None
+    except OSError as e:
+        return None, str(e)
+
+
+def parse_file(processor: Callable, file_path: str, user_id: str,
+               file_hash: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Run a file's processor, handing the hash already computed for change
+    detection to processors that take one (so they need not re-read the file)."""
+    if "file_hash" in inspect.signature(processor).parameters:
+        return processor(file_path, user_id, file_hash=file_hash)
+    return processor(file_path, user_id)
+
+
+class IngestionPipeline:
+    def __init__(
+        self,
+        vector_store: "VectorStore",
+        metadata_store: MetadataStore,
+        workers: int,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        paranoid: bool = False,
+        table_store: Optional["TableStore"] = None,
+    ):
+        self.vector_store = vector_store
+        self.metadata_store = metadata_store
+        self.workers = max(1, workers)
+        self.queue_size = queue_size or settings.ingest_queue_size
+        self.batch_size = batch_size or settings.embed_batch_size
+        self.paranoid = paranoid
+        self.table_store = table_store
+        self._stats_lock = threading.Lock()
+
+    def run(
+        self,
+        files: List[Tuple[str, str, str, Callable]],
+        user_id: str,
+    ) -> Dict[str, int]:
+        """
+        Ingest (file_path, filename, ext, processor) entries.
+
+        Returns a summary dict: {"ingested": N, "skipped": M, "errors": E}
+        """
+        stats = {"ingested": 0, "skipped": 0, "errors": 0}
+        parsed_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        embedded_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        # "spawn" avoids forking a process that already runs Chroma/HTTP threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            # Lazy: hashing advances as the parse stage pulls changed files
+            changed = self._hash_stage(pool, files, user_id, stats)
+
+            embedder = threading.Thread(
+                target=self._embed_stage, args=(parsed_q, embedded_q, user_id), daemon=True
+            )
+            writer = threading.Thread(
+                target=self._write_stage, args=(embedded_q, user_id, stats), daemon=True
+            )
+            embedder.start()
+            writer.start()
+
+            try:
+                self._parse_stage(pool, changed, user_id, parsed_q)
+            finally:
+                parsed_q.put(_DONE)
+                embedder.join()
+                writer.join()
+
+        return stats
+
+    # ---- Stage 1: hashing + change detection (streams into stage 2) ----
+
+    def _hash_stage(self, pool, files, user_id,
+                    stats) -> Iterator[Tuple[str, str, str, Callable, str, bool]]:
+        """Yield changed files as their hashes complete, with whether each was ingested before.
+
+        At most queue_size hashes are in flight, so parsing of the first
+        changed files starts while later ones are still being hashed.
+        Stored hashes and stat signatures are fetched in bulk up front, and
+        new signatures are recorded in one batch at the end.
+        """
+        paths = [entry[0] for entry in files]
+        stored = self.metadata_store.get_hashes(paths)
+        states = {} if self.paranoid else self.metadata_store.get_file_states(paths)
+        fresh_states: List[Tuple[str, os.stat_result, str]] = []
+
+        hashing: deque = deque()  # (entry, stat, future)
+        for entry in files:
+            file_path = entry[0]
+            try:
+                stat = os.stat(file_path)
+            except OSError as e:
+                print(f"  ⚠️  Cannot read {file_path}: {e}")
+                self._count(stats, "errors")
+                continue
+            cached = self.metadata_store.hash_for_stat(states.get(file_path), stat)
+            if cached is not None:
+                yield from self._check_changed(entry, cached, stored, user_id, stats)
+                continue
+            hashing.append((entry, stat, pool.submit(_hash_file, file_path)))
+            if len(hashing) >= self.queue_size:
+                yield from self._finish_hash(hashing.popleft(), stored, fresh_states,
+                                             user_id, stats)
+        while hashing:
+            yield from self._finish_hash(hashing.popleft(), stored, fresh_states,
+                                         user_id, stats)
+        self.metadata_store.record_file_states(fresh_states)
+
+    def _finish_hash(self, pending, stored, fresh_states, user_id, stats):
+        entry, stat, future = pending
+        file_hash, error = future.result()
+        if error is not None:
+            print(f"  ⚠️  Cannot read {entry[0]}: {error}")
+            self._count(stats, "errors")
+            return
+        fresh_states.append((entry[0], stat, file_hash))
+        yield from self._check_changed(entry, file_hash, stored, user_id, stats)
+
+    def _check_changed(self, entry, file_hash, stored, user_id, stats):
+        if stored.get(entry[0]) == file_hash:
+            print(f"  ⏩ Skipping (unchanged): {entry[0]}")
+            self._count(stats, "skipped")
+            # Unchanged CSVs still get a table if theirs is missing
+            if (entry[2] == ".csv" and self.table_store is not None
+                    and not self.table_store.has_table(user_id, entry[0])):
+                self._load_table(user_id, entry[0], entry[1])
+            return
+        yield (*entry, file_hash, entry[0] in stored)
+
+    def _count(self, stats: Dict[str, int], key: str):
+        """Increment a stat; the hash stage and the writer thread both count."""
+        with self._stats_lock:
+            stats[key] += 1
+
+    # ---- Stage 2: parsing (process pool, bounded in-flight) ----
+
+    def _parse_stage(self, pool, changed, user_id, parsed_q):
+        inflight: deque = deque()
+        for file_path, filename, ext, processor, file_hash, ingested in changed:
+            if len(inflight) >= self.queue_size:
+                self._drain_oldest(inflight, parsed_q)
+            print(f"  📄 Processing: {file_path}")
+            future = pool.submit(parse_file, processor, file_path, user_id, file_hash)
+            inflight.append((
+                ParsedFile(file_path, filename, ext, file_hash, [], [], ingested), future,
+            ))
+        while inflight:
+            self._drain_oldest(inflight, parsed_q)
+
+    @staticmethod
+    def _drain_oldest(inflight: deque, parsed_q: queue.Queue):
+        item, future = inflight.popleft()
+        try:
+            item.documents, item.metadatas = future.result()
+        except Exception as e:
+            item.error = str(e)
+        parsed_q.put(item)  # Blocks while the embed stage is behind
+
+    # ---- Stage 3: cross-file embedding batches ----
+
+    def _embed_stage(self, parsed_q, embedded_q, user_id):
+        pending: List[ParsedFile] = []
+        pending_chunks = 0
+        try:
+            while True:
+                item = parsed_q.get()
+                if item is _DONE:
+                    break
+                pending.append(item)
+                if not item.error:
+                    pending_chunks += len(item.documents)
+                if pending_chunks >= self.batch_size:
+                    self._embed_batch(pending, embedded_q, user_id)
+                    pending, pending_chunks = [], 0
+            if pending:
+                self._embed_batch(pending, embedded_q, user_id)
+        finally:
+            embedded_q.put(_DONE)
+
+    def _embed_batch(self, items: List[ParsedFile], embedded_q, user_id: str):
+        ready = []
+        try:
+            registered = self.metadata_store.get_chunk_ids(
+                user_id, [item.file_path for item in items if not item.error]
+            )
+        except Exception as e:
+            print(f"  ⚠️  Chunk registry lookup failed, using Chroma: {e}")
+            registered = {}
+        for item in items:
+            if item.error or not (item.documents or item.ingested):
+                continue
+            try:
+                # Only chunks not already stored for this file need embedding;
+                # a file edited down to nothing diffs against no chunks
+                item.diff = self.vector_store.diff_chunks(
+                    user_id, item.file_path, item.documents, item.metadatas,
+                    existing=registered.get(item.file_path),
+                )
+            except Exception as e:
+                item.error = f"chunk diff failed: {e}"
+                continue
+            ready.append(item)
+        texts = [text for item in ready for text in item.diff.new_texts]
+        if texts:
+            try:
+                embeddings = self.vector_store.embed_texts(texts)
+            except Exception as e:
+                for item in ready:
+                    item.error = f"embedding failed: {e}"
+            else:
+                offset = 0
+                for item in ready:
+                    count = len(item.diff.new_texts)
+                    item.embeddings = embeddings[offset:offset + count]
+                    offset += count
+        for item in items:
+            embedded_q.put(item)
+
+    # ---- Stage 4: single writer ----
+
+    def _load_table(self, user_id: str, file_path: str, filename: str):
+        """Load a CSV into the table store; failures only cost the SQL path."""
+        try:
+            rows = self.table_store.load_csv(user_id, file_path)
+            print(f"    📊 Loaded {rows} rows as a table: {filename}")
+        except Exception as e:
+            print(f"    ⚠️  Could not load {file_path} as a table: {e}")
+
+    def _write_stage(self, embedded_q, user_id, stats):
+        while True:
+            item = embedded_q.get()
+            if item is _DONE:
+                return
+            if item.error:
+                print(f"    ❌ Error processing {item.file_path}: {item.error}")
+                self._count(stats, "errors")
+                continue
+            if not (item.documents or item.ingested):
+                print(f"    ⚠️  No content extracted from {item.file_path}")
+                self._count(stats, "skipped")
+                continue
+            try:
+                self.vector_store.write_chunk_diff(item.diff, item.embeddings or [])
+                records = self.vector_store.chunk_records(
+                    user_id, item.file_path, item.documents, item.metadatas
+                )
+                self.metadata_store.add_files(
+                    user_id,
+                    [(item.filename, item.file_path, item.file_hash, item.ext.lstrip("."))],
+                    chunks={item.file_path: records},
+                )
+                if item.ext == ".csv" and self.table_store is not None:
+                    if records:
+                        self._load_table(user_id, item.file_path, item.filename)
+                    else:
+                        self.table_store.drop_tables(user_id, [item.file_path])
+                print(f"    ✅ Ingested {len(item.diff.new_ids)} new chunks, "
+                      f"removed {len(item.diff.stale_ids)} stale: {item.filename}")
+                self._count(stats, "ingested")
+            except Exception as e:
+                print(f"    ❌ Error processing {item.file_path}: {e}")
+                self._count(stats, "errors")
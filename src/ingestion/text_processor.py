@@ -1,15 +1,33 @@
 """
 Processor for text-based files: .txt, .md, .pdf
 Chunks text using LangChain's RecursiveCharacterTextSplitter.
+
+Large PDFs are extracted in page ranges across worker processes and
+chunked as the pages arrive. The extracted page text is cached by file
+hash, so changing CHUNK_SIZE / CHUNK_OVERLAP re-chunks without re-parsing.
+
+Each chunk records its start_char/end_char: character offsets into the
+text it was split from, not byte offsets into the file. For .txt/.md
+that is the file's text with comment lines removed; for PDFs, the
+extracted pages joined by blank lines.
 """
-from typing import List, Dict, Any, Tuple
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from src.config import settings
+from src.database.metadata_store import MetadataStore
+from src.database.text_cache import ExtractedTextCache
+
 
 # Default chunking parameters
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 
+# Chunks' worth of text buffered before the streaming splitter runs
+STREAM_BUFFER_CHUNKS = 40
+
 
 def process_text_file(file_path: str, user_id: str) -> Tuple[List[str], List[Dict[str, Any]]]:
     """Read a .txt or .md file, chunk it, and return (documents, metadatas).
@@ -26,27 +44,143 @@ def process_text_file(file_path: str, user_id: str) -> Tuple[List[str], List[Dic
     return _chunk_and_prepare(raw_text, file_path, user_id, source_type="text")
 
 
-def process_pdf_file(file_path: str, user_id: str) -> Tuple[List[str], List[Dict[str, Any]]]:
-    """Extract text from a PDF, chunk it, and return (documents, metadatas)."""
+def process_pdf_file(
+    file_path: str,
+    user_id: str,
+    cache: Optional[ExtractedTextCache] = None,
+    file_hash: Optional[str] = None,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Extract text from a PDF, chunk it, and return (documents, metadatas).
+
+    Page text comes from the extracted-text cache when this exact file was
+    parsed before; otherwise it is extracted and cached. file_hash is the
+    file's SHA-256 when the caller already has it; it is computed otherwise.
+    """
     try:
-        from PyPDF2 import PdfReader
+        import PyPDF2
     except ImportError:
         print("  ⚠️  PyPDF2 not installed. Skipping PDF: " + file_path)
         return [], []
 
-    reader = PdfReader(file_path)
-    pages_text = []
-    for page in reader.pages:
-        text = page.extract_text()
-        if text:
-            pages_text.append(text)
-
-    raw_text = "\n\n".join(pages_text)
-    if not raw_text.strip():
+    cache = cache or ExtractedTextCache()
+    extractor = f"PyPDF2-{PyPDF2.__version__}"
+    file_hash = file_hash or MetadataStore.compute_file_hash(file_path)
+
+    pages = cache.get(file_hash, extractor)
+    if pages is not None:
+        documents, metadatas = _prepare_chunks(
+            _stream_chunks(pages), file_path, user_id, source_type="pdf"
+        )
+    else:
+        pages = []
+        documents, metadatas = _prepare_chunks(
+            _stream_chunks(_recorded(_iter_pdf_pages(file_path), pages)),
+            file_path, user_id, source_type="pdf",
+        )
+        # Cached even when empty, so text-less scans are not re-parsed
+        cache.put(file_hash, extractor, pages)
+
+    if not documents:
         print(f"  ⚠️  No text extracted from PDF: {file_path}")
         return [], []
+    return documents, metadatas
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """Worker: extract the text of pages [start, end)."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _iter_pdf_pages(file_path: str) -> Iterator[str]:
+    """Yield each page's text in order.
+
+    PDFs longer than one task are split into page ranges extracted by
+    settings.pdf_workers processes. Inside a pipeline worker (which is
+    itself one of several processes) pages are extracted serially.
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+    per_task = max(1, settings.pdf_pages_per_task)
+    workers = min(settings.pdf_workers, -(-page_count // per_task))
+
+    if workers <= 1 or multiprocessing.parent_process() is not None:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    starts = list(range(0, page_count, per_task))
+    ends = [min(start + per_task, page_count) for start in starts]
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        # map() yields ranges in page order as soon as each one is ready
+        for texts in pool.map(_extract_page_range, [file_path] * len(starts), starts, ends):
+            yield from texts
+
 
-    return _chunk_and_prepare(raw_text, file_path, user_id, source_type="pdf")
+def _recorded(pages: Iterable[str], sink: List[str]) -> Iterator[str]:
+    """Pass pages through while keeping a copy for the cache."""
+    for page in pages:
+        sink.append(page)
+        yield page
+
+
+def _make_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+
+
+def _with_offsets(text: str, chunks: List[str]) -> Iterator[Tuple[str, int, int]]:
+    """Yield (chunk, start_char, end_char) for chunks split from text.
+
+    Chunk starts only move forward (overlapping chunks start after their
+    predecessor), so each search resumes just past the previous match.
+    """
+    search_from = 0
+    for chunk in chunks:
+        index = text.find(chunk, search_from)
+        if index < 0:
+            index = search_from
+        search_from = index + 1
+        yield chunk, index, index + len(chunk)
+
+
+def _stream_chunks(pieces: Iterable[str]) -> Iterator[Tuple[str, int, int]]:
+    """Chunk a stream of text pieces (e.g. PDF pages) without joining them all.
+
+    Yields (chunk, start_char, end_char), offsets being positions in the
+    pieces joined by blank lines. Pieces are joined into a bounded buffer;
+    each time it fills, every chunk but the last is emitted and the buffer
+    restarts at the last chunk, which may continue into the next piece.
+    """
+    splitter = _make_splitter()
+    limit = CHUNK_SIZE * STREAM_BUFFER_CHUNKS
+    buffer = ""
+    base = 0  # offset of buffer[0] in the joined text
+    for piece in pieces:
+        if not piece:
+            continue
+        buffer = f"{buffer}\n\n{piece}" if buffer else piece
+        if len(buffer) < limit:
+            continue
+        located = list(_with_offsets(buffer, splitter.split_text(buffer)))
+        if not located:
+            continue
+        for chunk, start, end in located[:-1]:
+            yield chunk, base + start, base + end
+        _chunk, last_start, _end = located[-1]
+        buffer = buffer[last_start:]
+        base += last_start
+    if buffer:
+        for chunk, start, end in _with_offsets(buffer, splitter.split_text(buffer)):
+            yield chunk, base + start, base + end
 
 
 def _chunk_and_prepare(
@@ -56,17 +190,21 @@ def _chunk_and_prepare(
     source_type: str,
 ) -> Tuple[List[str], List[Dict[str, Any]]]:
     """Split raw text into chunks and prepare metadata for each."""
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        separators=["\n\n", "\n", ". ", " ", ""],
-    )
-    chunks = splitter.split_text(raw_text)
+    chunks = _make_splitter().split_text(raw_text)
+    return _prepare_chunks(_with_offsets(raw_text, chunks), file_path, user_id, source_type)
 
+
+def _prepare_chunks(
+    chunks: Iterable[Tuple[str, int, int]],
+    file_path: str,
+    user_id: str,
+    source_type: str,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Pair each non-blank (chunk, start_char, end_char) with its metadata."""
     filename = file_path.split("/")[-1]
     documents = []
     metadatas = []
-    for i, chunk in enumerate(chunks):
+    for i, (chunk, start_char, end_char) in enumerate(chunks):
         if not chunk.strip():
             continue
         documents.append(chunk)
@@ -76,6 +214,8 @@ def _chunk_and_prepare(
             "source_type": source_type,
             "file_path": file_path,
             "chunk_index": i,
+            "start_char": start_char,
+            "end_char": end_char,
         })
 
     return documents, metadatas
@@ -0,0 +1,181 @@
+"""
+Directory Watcher — long-running watch mode on top of DirectoryScanner.
+
+Filesystem events come from the native watcher (inotify on Linux, via the
+optional `watchfiles` package) or, when that is unavailable, from
+periodic stat() snapshots. Events are coalesced per path and only
+flushed once the directory has been quiet for the debounce window, so a
+burst of writes to one file costs a single re-ingestion.
+
+A directory event stands for every file under it: a created or moved-in
+directory is walked, and a vanished one removes every file recorded
+beneath it.
+"""
+import os
+import time
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from src.ingestion.directory_scanner import DirectoryScanner, SUPPORTED_EXTENSIONS
+from src.config import settings
+
+
+# (path, deleted) pairs reported by an event source; empty on idle ticks
+EventBatch = List[Tuple[str, bool]]
+
+# How often an idle event source wakes up so debounced events get flushed
+TICK_SECONDS = 0.2
+
+
+class DirectoryWatcher:
+    def __init__(
+        self,
+        scanner: DirectoryScanner,
+        directory: str,
+        user_id: str,
+        debounce: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        force_polling: bool = False,
+    ):
+        self.scanner = scanner
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.user_id = user_id
+        self.debounce = settings.watch_debounce_seconds if debounce is None else debounce
+        self.poll_interval = (
+            settings.watch_poll_interval if poll_interval is None else poll_interval
+        )
+        self.force_polling = force_polling
+
+        # path → deleted?, last event wins
+        self._pending: Dict[str, bool] = {}
+        self._last_event = 0.0
+
+    def run(self, stop_event: Optional[threading.Event] = None,
+            initial_scan: bool = True):
+        """Watch until stop_event is set (or KeyboardInterrupt).
+
+        The initial scan catches changes made while nothing was watching.
+        """
+        stop_event = stop_event or threading.Event()
+        if initial_scan:
+            self.scanner.scan(self.directory, self.user_id)
+
+        try:
+            for batch in self._events(stop_event):
+                self.record(batch)
+                if self._pending and time.monotonic() - self._last_event >= self.debounce:
+                    self.flush()
+        finally:
+            self.flush()
+
+    def record(self, batch: EventBatch):
+        """Coalesce a batch of raw events into the pending set."""
+        for path, deleted in batch:
+            path = self._normalize(path)
+            # A deleted path may have been a directory, whatever its name
+            if not (deleted or os.path.isdir(path) or self._supported(path)):
+                continue
+            self._pending[path] = deleted
+            self._last_event = time.monotonic()
+
+    def flush(self) -> Optional[Dict[str, int]]:
+        """Ingest every pending path. Returns the scanner stats, or None if idle."""
+        if not self._pending:
+            return None
+        pending, self._pending = self._pending, {}
+        changed: Set[str] = set()
+        removed: Set[str] = set()
+        for path, deleted in pending.items():
+            if os.path.isdir(path):
+                # Created or moved in: its files were not reported one by one
+                walked = {entry[0] for entry in DirectoryScanner._iter_files(path)}
+                changed |= walked
+                removed |= set(self._recorded_under(path)) - walked
+            elif os.path.isfile(path):
+                if not deleted and self._supported(path):
+                    changed.add(path)
+            else:
+                # A vanished directory takes every file recorded beneath it
+                beneath = self._recorded_under(path)
+                if beneath:
+                    removed.update(beneath)
+                elif self._supported(path):
+                    removed.add(path)
+        changed, removed = sorted(changed), sorted(removed)
+
+        print(f"👀 {len(changed)} changed, {len(removed)} removed")
+        stats = self.scanner.ingest_paths(changed, removed, self.user_id)
+        print(f"   Ingested: {stats['ingested']} | "
+              f"Skipped: {stats['skipped']} | "
+              f"Removed: {stats['removed']} | "
+              f"Errors: {stats['errors']}")
+        return stats
+
+    def _recorded_under(self, directory: str) -> List[str]:
+        return self.scanner.metadata_store.get_live_paths(self.user_id, directory)
+
+    @staticmethod
+    def _supported(path: str) -> bool:
+        return os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        """Express a path the way DirectoryScanner records it (absolute)."""
+        return os.path.abspath(path)
+
+    # ---- Event sources ----
+
+    def _events(self, stop_event: threading.Event) -> Iterator[EventBatch]:
+        if not self.force_polling:
+            try:
+                import watchfiles
+            except ImportError:
+                print("  ⚠️  watchfiles not installed. Falling back to polling.")
+            else:
+                print(f"👀 Watching {self.directory} (native events)")
+                yield from self._native_events(watchfiles, stop_event)
+                return
+        print(f"👀 Watching {self.directory} (polling every {self.poll_interval}s)")
+        yield from self._poll_events(stop_event)
+
+    def _native_events(self, watchfiles, stop_event) -> Iterator[EventBatch]:
+        tick_ms = int(TICK_SECONDS * 1000)
+        for changes in watchfiles.watch(
+            self.directory,
+            stop_event=stop_event,
+            debounce=tick_ms,
+            rust_timeout=tick_ms,
+            yield_on_timeout=True,
+        ):
+            yield [(path, change == watchfiles.Change.deleted) for change, path in changes]
+
+    def _poll_events(self, stop_event: threading.Event) -> Iterator[EventBatch]:
+        previous = self.snapshot()
+        next_poll = time.monotonic() + self.poll_interval
+        while not stop_event.wait(TICK_SECONDS):
+            if time.monotonic() < next_poll:
+                yield []
+                continue
+            next_poll = time.monotonic() + self.poll_interval
+            current = self.snapshot()
+            yield diff_snapshots(previous, current)
+            previous = current
+
+    def snapshot(self) -> Dict[str, Tuple[int, int, int]]:
+        """Map every supported file to its (size, mtime_ns, inode)."""
+        state = {}
+        for file_path, _filename, _ext, _processor in DirectoryScanner._iter_files(self.directory):
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            state[file_path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return state
+
+
+def diff_snapshots(before: Dict[str, Tuple[int, int, int]],
+                   after: Dict[str, Tuple[int, int, int]]) -> EventBatch:
+    """Events turning one polling snapshot into the next."""
+    events = [(path, False) for path, sig in after.items() if before.get(path) != sig]
+    events.extend((path, True) for path in before if path not in after)
+    return events
@@ -0,0 +1,250 @@
+"""
+LLM client registry — one client per model, shared by every graph node.
+
+Nodes and the vector store take their chat and embedding models from
+`clients` instead of building their own, so:
+
+- all Ollama models reuse one HTTP connection pool per endpoint;
+- every chat request holds one of its endpoint's call slots
+  (settings.ollama_max_concurrency / gemini_max_concurrency) while it
+  runs, whether it is made from a thread or an event loop;
+- Ollama keeps the models loaded for settings.ollama_keep_alive_seconds,
+  and warm_up() loads them concurrently at startup, so the first question
+  does not pay the model-load latency.
+"""
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+import ollama
+from pydantic import PrivateAttr
+from langchain_ollama import ChatOllama, OllamaEmbeddings
+from langchain_google_genai import ChatGoogleGenerativeAI
+from src.config import settings
+
+GEMINI_MODEL = "gemini-2.0-flash"
+GEMINI_ENDPOINT = "gemini"
+
+
+class EndpointLimit:
+    """At most `limit` requests to one endpoint at a time, from threads and event loops alike."""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._condition = threading.Condition()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def acquire(self):
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self.active < self.limit:
+                    self.active += 1
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._condition:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+                    else:
+                        self._wake_one()  # pass on the wake-up this waiter was given
+                raise
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            # Both kinds of waiter may be queued; the loser of the race waits again
+            self._condition.notify()
+            self._wake_one()
+
+    def _wake_one(self):
+        """Wake the oldest event-loop waiter. Called with the condition held."""
+        while self._waiters:
+            loop, waiter = self._waiters.popleft()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve, waiter)
+                return
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        await self.aacquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+def _resolve(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class _Limited:
+    """Chat model mixin: each request holds a call slot of the model's endpoint."""
+
+    def _generate(self, *args, **kwargs):
+        with self._endpoint_limit:
+            return super()._generate(*args, **kwargs)
+
+    async def _agenerate(self, *args, **kwargs):
+        async with self._endpoint_limit:
+            return await super()._agenerate(*args, **kwargs)
+
+    def _stream(self, *args, **kwargs):
+        with self._endpoint_limit:
+            yield from super()._stream(*args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        async with self._endpoint_limit:
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+
+
+class SharedChatOllama(_Limited, ChatOllama):
+    _endpoint_limit: EndpointLimit = PrivateAttr()
+
+
+class SharedChatGemini(_Limited, ChatGoogleGenerativeAI):
+    _endpoint_limit: EndpointLimit = PrivateAttr()
+
+
+class LLMClients:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple[str, str, str], Any] = {}
+        self._limits: Dict[str, EndpointLimit] = {}
+        self._transports: Dict[str, httpx.HTTPTransport] = {}
+
+    def ollama(self, model: Optional[str] = None) -> ChatOllama:
+        """The shared chat client for an Ollama model (default settings.ollama_model)."""
+        model = model or settings.ollama_model
+        base_url = settings.ollama_base_url
+        with self._lock:
+            key = ("chat", base_url, model)
+            if key not in self._models:
+                llm = SharedChatOllama(
+                    model=model,
+                    base_url=base_url,
+                    temperature=0,
+                    keep_alive=settings.ollama_keep_alive_seconds,
+                    sync_client_kwargs={"transport": self._transport(base_url)},
+                )
+                llm._endpoint_limit = self._limit(base_url)
+                self._models[key] = llm
+            return self._models[key]
+
+    def gemini(self, model: str = GEMINI_MODEL) -> ChatGoogleGenerativeAI:
+        """The shared chat client for a Gemini model."""
+        with self._lock:
+            key = ("chat", GEMINI_ENDPOINT, model)
+            if key not in self._models:
+                llm = SharedChatGemini(model=model, temperature=0)
+                llm._endpoint_limit = self._limit(GEMINI_ENDPOINT)
+                self._models[key] = llm
+            return self._models[key]
+
+    def embeddings(self, model: Optional[str] = None) -> OllamaEmbeddings:
+        """The shared Ollama embeddings client (default settings.ollama_embed_model).
+
+        Embedding requests share the connection pool but not the chat call
+        slots; ingestion bounds its own embedding concurrency.
+        """
+        model = model or settings.ollama_embed_model
+        base_url = settings.ollama_base_url
+        with self._lock:
+            key = ("embed", base_url, model)
+            if key not in self._models:
+                self._models[key] = OllamaEmbeddings(
+                    model=model,
+                    base_url=base_url,
+                    keep_alive=settings.ollama_keep_alive_seconds,
+                    sync_client_kwargs={"transport": self._transport(base_url)},
+                )
+            return self._models[key]
+
+    def limit(self, endpoint: str) -> EndpointLimit:
+        """The call-slot limit for an endpoint (an Ollama base URL, or GEMINI_ENDPOINT)."""
+        with self._lock:
+            return self._limit(endpoint)
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """Load the Ollama chat and embedding models concurrently, with keep-alive.
+
+        Runs in a daemon thread unless background is False. Failures are
+        reported and otherwise ignored; the first question then loads the
+        model as before.
+        """
+        if not settings.warm_up_models:
+            return None
+        if not background:
+            self._warm_up()
+            return None
+        thread = threading.Thread(target=self._warm_up, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up(self):
+        base_url = settings.ollama_base_url
+        with self._lock:
+            transport = self._transport(base_url)
+        client = ollama.Client(host=base_url, transport=transport)
+        keep_alive = settings.ollama_keep_alive_seconds
+        loads = {
+            # An empty prompt only loads the model
+            settings.ollama_model: lambda: client.generate(
+                model=settings.ollama_model, prompt="", keep_alive=keep_alive,
+            ),
+            settings.ollama_embed_model: lambda: client.embed(
+                model=settings.ollama_embed_model, input="warm-up", keep_alive=keep_alive,
+            ),
+        }
+
+        def load(model: str):
+            started = time.perf_counter()
+            try:
+                loads[model]()
+            except Exception as e:
+                print(f"  ⚠️  Could not warm up {model}: {e}")
+                return
+            print(f"  🔥 {model} loaded in {time.perf_counter() - started:.1f}s")
+
+        with ThreadPoolExecutor(max_workers=len(loads)) as pool:
+            list(pool.map(load, loads))
+
+    def _limit(self, endpoint: str) -> EndpointLimit:
+        if endpoint not in self._limits:
+            self._limits[endpoint] = EndpointLimit(
+                settings.gemini_max_concurrency if endpoint == GEMINI_ENDPOINT
+                else settings.ollama_max_concurrency
+            )
+        return self._limits[endpoint]
+
+    def _transport(self, base_url: str) -> httpx.HTTPTransport:
+        # The transport owns the connection pool; clients built on it share it
+        if base_url not in self._transports:
+            self._transports[base_url] = httpx.HTTPTransport()
+        return self._transports[base_url]
+
+
+# Shared by the whole process, like settings
+clients = LLMClients()
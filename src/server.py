@@ -0,0 +1,222 @@
+"""
+HTTP serving entry point — answers many users' questions from one process.
+
+Run with: python -m src.server
+
+Every request runs RagAgent.arun / astream on a single event loop.
+Admission control keeps the process responsive under load:
+  - at most serve_max_concurrency questions run at once, and at most
+    serve_max_per_user of them for one user; the rest wait their turn;
+  - at most serve_max_pending questions may be admitted (running or
+    waiting) in total, and serve_max_pending_per_user per user; beyond
+    that requests are refused with 503 / 429 and a Retry-After header.
+Streamed responses await the client between events, so a slow reader
+slows its own run instead of buffering without bound.
+
+Endpoints:
+  POST /ask     {"question": str, "user_id": str} → JSON result
+  POST /stream  same body → NDJSON, one RagAgent.stream event per line
+  GET  /health  → {"status": "ok", "running": n, "pending": n}
+"""
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from src.config import settings
+
+# Request bodies are a question and a user id
+MAX_BODY_BYTES = 64_000
+
+# Result fields returned to HTTP clients
+PUBLIC_FIELDS = (
+    "generation", "generation_tier", "hallucination_status", "sources", "cached",
+)
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 429: "Too Many Requests", 503: "Service Unavailable",
+}
+
+
+class Rejected(Exception):
+    """A request refused before it ran, carrying the HTTP status to answer with."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def public_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: result.get(key) for key in PUBLIC_FIELDS}
+
+
+class AgentServer:
+    def __init__(self, agent,
+                 max_concurrency: Optional[int] = None,
+                 max_per_user: Optional[int] = None,
+                 max_pending: Optional[int] = None,
+                 max_pending_per_user: Optional[int] = None):
+        self.agent = agent
+        self.max_per_user = max_per_user or settings.serve_max_per_user
+        self.max_pending = max_pending or settings.serve_max_pending
+        self.max_pending_per_user = max_pending_per_user or settings.serve_max_pending_per_user
+        self._slots = asyncio.Semaphore(max_concurrency or settings.serve_max_concurrency)
+        self._user_slots: Dict[str, asyncio.Semaphore] = {}
+        self._pending: Dict[str, int] = {}
+        self.running = 0
+
+    @property
+    def pending(self) -> int:
+        return sum(self._pending.values())
+
+    @asynccontextmanager
+    async def admit(self, user_id: str) -> AsyncIterator[None]:
+        """Hold a run slot for the user, waiting for one or refusing when overloaded."""
+        if self.pending >= self.max_pending:
+            raise Rejected(503, "server busy, retry later")
+        if self._pending.get(user_id, 0) >= self.max_pending_per_user:
+            raise Rejected(429, "too many questions in flight for this user")
+        self._pending[user_id] = self._pending.get(user_id, 0) + 1
+        user_slots = self._user_slots.setdefault(user_id, asyncio.Semaphore(self.max_per_user))
+        try:
+            async with user_slots, self._slots:
+                self.running += 1
+                try:
+                    yield
+                finally:
+                    self.running -= 1
+        finally:
+            self._pending[user_id] -= 1
+            if not self._pending[user_id]:
+                del self._pending[user_id]
+                self._user_slots.pop(user_id, None)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one HTTP/1.1 request, then close the connection."""
+        try:
+            method, path, body = await self._read_request(reader)
+            if path == "/health" and method == "GET":
+                await self._send_json(writer, 200, {
+                    "status": "ok", "running": self.running, "pending": self.pending,
+                })
+            elif path in ("/ask", "/stream"):
+                if method != "POST":
+                    raise Rejected(405, "use POST")
+                question, user_id = self._parse_question(body)
+                async with self.admit(user_id):
+                    if path == "/ask":
+                        result = await self.agent.arun(question, user_id)
+                        await self._send_json(writer, 200, public_result(result))
+                    else:
+                        await self._stream(writer, question, user_id)
+            else:
+                raise Rejected(404, "unknown endpoint")
+        except Rejected as e:
+            await self._send_json(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"  ⚠️  Request failed: {e}")
+            try:
+                await self._send_json(writer, 500, {"error": "internal error"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _stream(self, writer: asyncio.StreamWriter, question: str, user_id: str):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        async for event in self.agent.astream(question, user_id):
+            if event["type"] == "final":
+                event = {"type": "final", "result": public_result(event["result"])}
+            line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+            writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+            # Backpressure: wait for a slow client instead of buffering
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise Rejected(400, "malformed request line")
+        method, target, _version = request_line
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                try:
+                    length = int(value.strip())
+                except ValueError:
+                    raise Rejected(400, "bad Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise Rejected(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], body
+
+    @staticmethod
+    def _parse_question(body: bytes) -> Tuple[str, str]:
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise Rejected(400, "body must be JSON")
+        question = payload.get("question") if isinstance(payload, dict) else None
+        user_id = payload.get("user_id") if isinstance(payload, dict) else None
+        if not isinstance(question, str) or not question.strip():
+            raise Rejected(400, "question is required")
+        if not isinstance(user_id, str) or not user_id:
+            raise Rejected(400, "user_id is required")
+        return question, user_id
+
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = [
+            f"HTTP/1.1 {status} {REASONS.get(status, 'Internal Server Error')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        if status in (429, 503):
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(agent, host: str, port: int):
+    server = AgentServer(agent)
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"🌐 Serving on http://{host}:{port} "
+          f"(max {settings.serve_max_concurrency} concurrent, "
+          f"{settings.serve_max_per_user} per user)")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+    from src.graph.workflow import RagAgent
+    from src.llm_clients import clients
+
+    print("🤖 Initializing Personal Assistant RAG Agent...")
+    agent = RagAgent()
+    clients.warm_up()
+    try:
+        asyncio.run(serve(agent, settings.serve_host, settings.serve_port))
+    except KeyboardInterrupt:
+        print("\n⏹️  Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""
+Token estimates shared by ingestion and prompt building.
+
+Ollama does not expose its tokenizer, so token counts are approximated
+from character length; ~4 characters per token holds well for English
+text under both nomic-embed-text and the Llama chat models.
+"""
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of tokens in text (rounded up)."""
+    return -(-len(text) // CHARS_PER_TOKEN)
@@ -0,0 +1,85 @@
+"""
+答案缓存测试 — 验证相似度命中、用户隔离、语料版本失效和 RagAgent.run 集成。
+"""
+from unittest.mock import MagicMock
+from src.database.answer_cache import AnswerCache
+from src.graph.workflow import RagAgent
+
+
+class TestAnswerCache:
+    """测试 AnswerCache 类。"""
+
+    def _make_cache(self, **kwargs):
+        """创建阈值为 0.9 的 AnswerCache。"""
+        options = {"threshold": 0.9, "max_entries": 10, "ttl_seconds": 0}
+        options.update(kwargs)
+        return AnswerCache(**options)
+
+    def test_similar_question_hits(self):
+        """验证嵌入足够相似的问题命中，不相似的问题未命中。"""
+        cache = self._make_cache()
+        cache.store("u1", "rent?", [1.0, 0.0], 3, {"generation": "1200"})
+        assert cache.lookup("u1", [0.99, 0.05], 3)["generation"] == "1200"
+        assert cache.lookup("u1", [0.0, 1.0], 3) is None
+
+    def test_scoped_per_user(self):
+        """验证答案不会跨用户共享。"""
+        cache = self._make_cache()
+        cache.store("u1", "rent?", [1.0, 0.0], 3, {"generation": "1200"})
+        assert cache.lookup("u2", [1.0, 0.0], 3) is None
+
+    def test_corpus_version_change_invalidates(self):
+        """验证语料版本变化后旧答案全部失效。"""
+        cache = self._make_cache()
+        cache.store("u1", "rent?", [1.0, 0.0], 3, {"generation": "1200"})
+        assert cache.lookup("u1", [1.0, 0.0], 4) is None
+        stats = cache.stats()
+        assert stats["invalidations"] == 1 and stats["size"] == 0
+
+    def test_lru_eviction_per_user(self):
+        """验证每个用户的缓存条目数有上限。"""
+        cache = self._make_cache(max_entries=1)
+        cache.store("u1", "a", [1.0, 0.0], 1, {"generation": "a"})
+        cache.store("u1", "b", [0.0, 1.0], 1, {"generation": "b"})
+        assert cache.lookup("u1", [1.0, 0.0], 1) is None
+        assert cache.lookup("u1", [0.0, 1.0], 1)["generation"] == "b"
+
+
+class TestRagAgentAnswerCache:
+    """测试 RagAgent.run 前的答案缓存（不构建真实的图和模型）。"""
+
+    def _make_agent(self, result):
+        """创建一个 LangGraph 应用被 mock 的 RagAgent。"""
+        agent = RagAgent.__new__(RagAgent)
+        agent.vector_store = MagicMock()
+        agent.vector_store.embed_query.return_value = [1.0, 0.0]
+        agent.metadata_store = MagicMock()
+        agent.metadata_store.get_corpus_version.return_value = 1
+        agent.answer_cache = AnswerCache(threshold=0.9, max_entries=10, ttl_seconds=0)
+        agent.app = MagicMock()
+        agent.app.invoke.side_effect = lambda *args, **kwargs: dict(result)
+        return agent
+
+    def test_grounded_answer_served_from_cache(self):
+        """验证已验证的答案第二次直接从缓存返回，并带有 cached 标记。"""
+        agent = self._make_agent({"generation": "1200", "hallucination_status": True})
+        first = agent.run("How much is rent?", "u1")
+        second = agent.run("How much is rent?", "u1")
+        assert first["cached"] is False
+        assert second["cached"] is True and second["generation"] == "1200"
+        assert agent.app.invoke.call_count == 1
+
+    def test_ungrounded_answer_not_cached(self):
+        """验证未通过幻觉检查的答案不会被缓存。"""
+        agent = self._make_agent({"generation": "maybe", "hallucination_status": False})
+        agent.run("q", "u1")
+        agent.run("q", "u1")
+        assert agent.app.invoke.call_count == 2
+
+    def test_new_scan_invalidates(self):
+        """验证语料版本变化后重新运行完整流程。"""
+        agent = self._make_agent({"generation": "1200", "hallucination_status": True})
+        agent.run("q", "u1")
+        agent.metadata_store.get_corpus_version.return_value = 2
+        assert agent.run("q", "u1")["cached"] is False
+        assert agent.app.invoke.call_count == 2
@@ -0,0 +1,88 @@
+"""
+上下文构建测试 — 验证相邻分块合并、冗余去除和按 token 预算打包。
+"""
+from src.graph.context import build_context, fits, merge_passages, pack
+from src.ingestion.text_processor import _make_splitter, _with_offsets
+from src.tokens import estimate_tokens
+
+TEXT = " ".join(
+    f"Payment {i} of {i * 37} dollars went to vendor {i % 7} on day {i}." for i in range(40)
+)
+
+
+def split_with_spans(text, source="ledger.txt"):
+    """按入库方式切分文本，返回 (分块, {分块: (来源, 起始字符, 结束字符)})。"""
+    chunks = _make_splitter().split_text(text)
+    spans = {chunk: (source, start, end) for chunk, start, end in _with_offsets(text, chunks)}
+    return chunks, spans
+
+
+class TestMergePassages:
+    """测试分块合并与去重。"""
+
+    def test_rejoins_adjacent_chunks(self):
+        """同一文件的相邻分块按字符位置合并，还原原文。"""
+        chunks, spans = split_with_spans(TEXT)
+        assert len(chunks) > 2
+        assert merge_passages(chunks, spans) == [TEXT]
+
+    def test_removes_repeated_overlap(self):
+        """分块之间重复的重叠文本只保留一次。"""
+        text = " ".join(f"word{i}" for i in range(300))
+        chunks, spans = split_with_spans(text)
+        assert chunks[0][-20:] in chunks[1]  # 分块确实存在重叠
+        assert merge_passages(chunks, spans) == [text]
+
+    def test_out_of_order_chunks_merge_at_best_rank(self):
+        """检索顺序打乱时仍能合并，合并结果排在最高排名分块的位置。"""
+        chunks, spans = split_with_spans(TEXT)
+        other = "Unrelated note from another file."
+        spans[other] = ("notes.txt", 0, len(other))
+        merged = merge_passages([chunks[2], other, chunks[0], chunks[1]], spans)
+        assert merged[1] == other
+        assert merged[0].startswith(chunks[0]) and merged[0].endswith(chunks[2])
+
+    def test_distant_chunks_stay_apart(self):
+        """同一文件中不相邻的分块不合并。"""
+        chunks, spans = split_with_spans(TEXT)
+        assert merge_passages([chunks[0], chunks[3]], spans) == [chunks[0], chunks[3]]
+
+    def test_different_files_not_merged(self):
+        """不同文件的分块即使文本重叠也不合并；无位置信息时按重叠文本合并。"""
+        a = "The quarterly budget review covers marketing spend"
+        b = "covers marketing spend and travel reimbursements"
+        spans = {a: ("a.txt", None, None), b: ("b.txt", None, None)}
+        assert merge_passages([a, b], spans) == [a, b]
+        assert merge_passages([a, b]) == [a + b[len("covers marketing spend"):]]
+
+    def test_drops_duplicates_and_contained(self):
+        """重复分块和被包含的分块被去除。"""
+        long = "I was born in Shanghai and moved to Toronto in 2015."
+        assert merge_passages([long, "moved to Toronto", long]) == [long]
+
+    def test_short_coincidental_overlap_not_merged(self):
+        """过短的首尾重合不视为分块接缝。"""
+        assert merge_passages(["alpha ends", "ends beta"]) == ["alpha ends", "ends beta"]
+
+
+class TestPacking:
+    """测试按 token 预算打包。"""
+
+    def test_keeps_rank_order_within_budget(self):
+        """按排名装入预算，放不下的被跳过，较小的后续段落可以补位。"""
+        passages = ["a" * 40, "b" * 400, "c" * 40]
+        assert fits(passages, 30) == [0, 2]
+        assert pack(passages, 30) == ["a" * 40, "c" * 40]
+
+    def test_truncates_oversized_best_passage(self):
+        """没有段落能放下时，截断最相关的段落而不是返回空上下文。"""
+        packed = pack(["x" * 4000, "y" * 4000], 100)
+        assert len(packed) == 1 and packed[0].startswith("x")
+        assert estimate_tokens(packed[0]) <= 100
+
+    def test_build_context_respects_budget(self):
+        """构建的上下文不超过预算。"""
+        docs = [f"Fact number {i}: " + "detail " * 50 for i in range(20)]
+        context = build_context(docs, 300)
+        assert estimate_tokens(context) <= 300
+        assert context.startswith("Fact number 0:")
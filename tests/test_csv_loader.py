@@ -3,6 +3,7 @@
 验证 CSV 行到上下文的序列化、NaN 处理和空文件。
 """
 import csv
+from unittest.mock import patch
 from src.ingestion.csv_loader import process_csv_file
 
 
@@ -55,3 +56,35 @@ class TestProcessCsvFile:
         assert len(row_lines) == 0  # NaN values should be skipped
         assert "Name: Alice" in docs[0]
         assert "City: Toronto" in docs[0]
+
+    def test_large_csv_split_into_row_groups(self, tmp_path):
+        """验证大表按 token 预算拆分为多个行组文档，每个文档重复列头。"""
+        file_path = tmp_path / "big.csv"
+        with open(file_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Date", "Item", "Amount"])
+            for i in range(500):
+                writer.writerow([f"2024-03-{i % 28 + 1:02d}", f"item{i}", i])
+        docs, metas = process_csv_file(str(file_path), user_id="test_user")
+        assert len(docs) > 1
+        assert all(doc.startswith("Data from big.csv (columns: Date, Item, Amount)") for doc in docs)
+        # 行范围连续且覆盖全部 500 行
+        assert metas[0]["row_start"] == 0
+        assert metas[-1]["row_end"] == 499
+        for prev, nxt in zip(metas, metas[1:]):
+            assert nxt["row_start"] == prev["row_end"] + 1
+        assert "Item: item499" in docs[-1]
+
+    def test_row_groups_span_read_chunks(self, tmp_path):
+        """验证跨 pandas 读取块的行被正确编号。"""
+        file_path = tmp_path / "chunks.csv"
+        with open(file_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Name"])
+            for i in range(10):
+                writer.writerow([f"n{i}"])
+        with patch("src.ingestion.csv_loader.READ_CHUNK_ROWS", 3):
+            docs, metas = process_csv_file(str(file_path), user_id="test_user")
+        assert len(docs) == 1
+        assert (metas[0]["row_start"], metas[0]["row_end"]) == (0, 9)
+        assert "Name: n9" in docs[0]
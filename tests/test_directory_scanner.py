@@ -2,6 +2,7 @@
 目录扫描器测试 — 验证文件发现、扩展名过滤和变更检测。
 """
 import os
+import inspect
 from unittest.mock import MagicMock, patch
 from src.ingestion.directory_scanner import DirectoryScanner
 
@@ -12,9 +13,14 @@ class TestDirectoryScanner:
     def _make_scanner(self):
         """创建一个使用 mock 依赖的 DirectoryScanner。"""
         mock_vector_store = MagicMock()
+        mock_vector_store.cache_stats.return_value = {"hits": 0, "misses": 0}
         mock_metadata_store = MagicMock()
+        mock_metadata_store.get_live_paths.return_value = []
         # 默认: 所有文件都是 "新的"（触发摄入）
-        mock_metadata_store.check_file_changed.return_value = True
+        mock_metadata_store.get_hashes.return_value = {}
+        mock_metadata_store.get_file_states.return_value = {}
+        mock_metadata_store.hash_for_stat.return_value = None
+        mock_metadata_store.get_chunk_ids.return_value = {}
         mock_metadata_store.compute_file_hash = MagicMock(return_value="fake_hash")
         return DirectoryScanner(mock_vector_store, mock_metadata_store)
 
@@ -37,7 +43,9 @@ class TestDirectoryScanner:
         """验证未变更的文件被跳过。"""
         scanner = self._make_scanner()
         # 模拟: 文件未变更
-        scanner.metadata_store.check_file_changed.return_value = False
+        scanner.metadata_store.get_hashes.side_effect = (
+            lambda paths: {p: "fake_hash" for p in paths}
+        )
         stats = scanner.scan(sample_data_dir, user_id="test_user")
         assert stats["ingested"] == 0
         assert stats["skipped"] == 2  # .txt 和 .csv 都被跳过
@@ -56,7 +64,156 @@ class TestDirectoryScanner:
         assert scanner.vector_store.add_documents.call_count == 2
 
     def test_metadata_store_records_file(self, sample_data_dir):
-        """验证摄入时调用了 metadata_store.add_file。"""
+        """验证摄入的文件在一次 add_files 调用中记录。"""
         scanner = self._make_scanner()
+        scanner.vector_store.batch_ready.return_value = False
         scanner.scan(sample_data_dir, user_id="test_user")
-        assert scanner.metadata_store.add_file.call_count == 2
+        scanner.metadata_store.add_files.assert_called_once()
+        assert len(scanner.metadata_store.add_files.call_args.args[1]) == 2
+
+    def test_scan_flushes_before_recording(self, sample_data_dir):
+        """验证向量刷新失败时不写入元数据，并计为错误。"""
+        scanner = self._make_scanner()
+        scanner.vector_store.batch_ready.return_value = False
+        scanner.vector_store.flush.side_effect = RuntimeError("ollama down")
+        stats = scanner.scan(sample_data_dir, user_id="test_user")
+        assert stats["errors"] == 2
+        assert stats["ingested"] == 0
+        scanner.metadata_store.add_files.assert_not_called()
+
+    def test_emptied_file_removes_old_chunks(self, sample_data_dir):
+        """验证已摄入的文件被编辑为空后，旧分块被删除并记录新哈希。"""
+        scanner = self._make_scanner()
+        scanner.vector_store.batch_ready.return_value = False
+        scanner.vector_store.clear_file.return_value = 3
+        scanner.table_store = MagicMock()
+        txt = os.path.join(sample_data_dir, "test_data.txt")
+        csv_path = os.path.join(sample_data_dir, "test_data.csv")
+        scanner.metadata_store.get_hashes.side_effect = (
+            lambda paths: {p: "old_hash" for p in paths}
+        )
+        scanner.metadata_store.get_chunk_ids.return_value = {txt: {"v1", "v2", "v3"}}
+        open(txt, "w").close()
+        with open(csv_path, "w") as f:
+            f.write("Name,Age,City\n")
+        stats = scanner.scan(sample_data_dir, user_id="test_user")
+        assert stats["ingested"] == 2 and stats["skipped"] == 0
+        scanner.vector_store.clear_file.assert_any_call(
+            "test_user", txt, flush=False, existing={"v1", "v2", "v3"},
+        )
+        recorded = scanner.metadata_store.add_files.call_args
+        assert ("test_data.txt", txt, "fake_hash", "txt") in recorded.args[1]
+        assert recorded.kwargs["chunks"][txt] == []
+        scanner.table_store.drop_tables.assert_called_once_with("test_user", [csv_path])
+        scanner.table_store.load_csv.assert_not_called()
+
+    def test_empty_new_file_is_skipped(self, sample_data_dir):
+        """验证从未摄入过的空文件仍被跳过，不写入记录。"""
+        scanner = self._make_scanner()
+        open(os.path.join(sample_data_dir, "test_data.txt"), "w").close()
+        stats = scanner.scan(sample_data_dir, user_id="test_user")
+        assert stats["skipped"] == 1
+        scanner.vector_store.clear_file.assert_not_called()
+
+    def test_pdf_processor_gets_computed_hash(self, sample_data_dir):
+        """验证变更检测计算的哈希被传给 PDF 处理器，而不是重新读取文件。"""
+        scanner = self._make_scanner()
+        pdf = os.path.join(sample_data_dir, "statement.pdf")
+        with open(pdf, "wb") as f:
+            f.write(b"%PDF-1.4 fake")
+
+        def process_pdf(file_path, user_id, cache=None, file_hash=None):
+            return [], []
+
+        mock_pdf = MagicMock(side_effect=process_pdf)
+        mock_pdf.__signature__ = inspect.signature(process_pdf)
+        with patch.dict("src.ingestion.directory_scanner.EXTENSION_MAP", {".pdf": mock_pdf}):
+            scanner.scan(sample_data_dir, user_id="test_user")
+        mock_pdf.assert_called_once_with(pdf, "test_user", file_hash="fake_hash")
+
+    def test_scan_removes_deleted_files(self, sample_data_dir):
+        """验证磁盘上已删除的文件被标记删除并批量清除向量。"""
+        scanner = self._make_scanner()
+        gone = os.path.join(sample_data_dir, "gone.txt")
+        kept = os.path.join(sample_data_dir, "test_data.txt")
+        scanner.metadata_store.get_live_paths.return_value = [gone, kept]
+        stats = scanner.scan(sample_data_dir, user_id="test_user")
+        assert stats["removed"] == 1
+        scanner.vector_store.delete_files.assert_called_once_with("test_user", [gone])
+        scanner.metadata_store.tombstone_files.assert_called_once_with("test_user", [gone])
+
+    def test_scan_loads_csv_tables(self, sample_data_dir):
+        """验证提供 table_store 时 CSV 文件被加载为 SQL 表。"""
+        scanner = self._make_scanner()
+        scanner.table_store = MagicMock()
+        scanner.scan(sample_data_dir, user_id="test_user")
+        scanner.table_store.load_csv.assert_called_once_with(
+            "test_user", os.path.join(sample_data_dir, "test_data.csv")
+        )
+
+    def test_ingest_paths_only_touches_given_files(self, sample_data_dir):
+        """验证按路径摄入只处理给定文件，删除仅作用于已记录的文件。"""
+        scanner = self._make_scanner()
+        txt = os.path.join(sample_data_dir, "test_data.txt")
+        gone = os.path.join(sample_data_dir, "gone.txt")
+        scanner.metadata_store.get_hashes.side_effect = (
+            lambda paths: {p: "old_hash" for p in paths}
+        )
+        stats = scanner.ingest_paths([txt], [gone], user_id="test_user")
+        assert stats["ingested"] == 1
+        assert stats["removed"] == 1
+        scanner.vector_store.delete_files.assert_called_once_with("test_user", [gone])
+
+    def test_scan_records_absolute_paths(self, sample_data_dir):
+        """验证相对目录被规范化为绝对路径，避免同一文件被记录两次。"""
+        scanner = self._make_scanner()
+        scanner.scan(os.path.relpath(sample_data_dir), user_id="test_user")
+        scanner.metadata_store.get_live_paths.assert_called_once_with(
+            "test_user", sample_data_dir
+        )
+        recorded = scanner.metadata_store.add_files.call_args.args[1]
+        assert all(os.path.isabs(file_path) for _name, file_path, _h, _t in recorded)
+
+    def test_commit_records_chunk_registry(self, sample_data_dir):
+        """验证提交时分块注册表与上传记录一起写入。"""
+        scanner = self._make_scanner()
+        scanner.vector_store.batch_ready.return_value = False
+        scanner.vector_store.chunk_records.side_effect = (
+            lambda user_id, file_path, texts, metadatas: [f"rec:{file_path}"] * len(texts)
+        )
+        scanner.scan(sample_data_dir, user_id="test_user")
+        chunks = scanner.metadata_store.add_files.call_args.kwargs["chunks"]
+        txt = os.path.join(sample_data_dir, "test_data.txt")
+        assert chunks[txt] == [f"rec:{txt}"]
+
+    def test_removal_uses_registered_vector_ids(self, sample_data_dir):
+        """验证删除文件时按注册表中的向量 ID 删除，未注册的文件回退到元数据过滤。"""
+        scanner = self._make_scanner()
+        registered = os.path.join(sample_data_dir, "registered.txt")
+        legacy = os.path.join(sample_data_dir, "legacy.txt")
+        scanner.metadata_store.get_live_paths.return_value = [registered, legacy]
+        scanner.metadata_store.get_chunk_ids.side_effect = (
+            lambda user_id, paths: {registered: {"v1"}} if legacy in paths else {}
+        )
+        stats = scanner.scan(sample_data_dir, user_id="test_user")
+        assert stats["removed"] == 2
+        scanner.vector_store.delete_ids.assert_called_once_with(["v1"])
+        scanner.vector_store.delete_files.assert_called_once_with("test_user", [legacy])
+
+    def test_unchanged_csv_without_table_is_loaded(self, sample_data_dir):
+        """验证未变更但缺少表的 CSV (如上次加载失败) 会被重新加载。"""
+        scanner = self._make_scanner()
+        scanner.metadata_store.get_hashes.side_effect = (
+            lambda paths: {p: "fake_hash" for p in paths}
+        )
+        scanner.table_store = MagicMock()
+        scanner.table_store.has_table.return_value = False
+        scanner.scan(sample_data_dir, user_id="test_user")
+        scanner.table_store.load_csv.assert_called_once_with(
+            "test_user", os.path.join(sample_data_dir, "test_data.csv")
+        )
+
+        scanner.table_store.reset_mock()
+        scanner.table_store.has_table.return_value = True
+        scanner.scan(sample_data_dir, user_id="test_user")
+        scanner.table_store.load_csv.assert_not_called()
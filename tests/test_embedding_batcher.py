@@ -0,0 +1,75 @@
+"""
+嵌入批处理器测试 — 验证跨文件批量、字节预算拆分和并发嵌入。
+"""
+from unittest.mock import MagicMock
+from src.database.embedding_batcher import EmbeddingBatcher
+
+
+class TestEmbeddingBatcher:
+    """测试 EmbeddingBatcher 类。"""
+
+    def _make_batcher(self, **kwargs):
+        """创建一个使用 mock 嵌入函数和集合的 EmbeddingBatcher。"""
+        embedder = MagicMock()
+        embedder.embed_documents.side_effect = lambda texts: [[float(len(t))] for t in texts]
+        collection = MagicMock()
+        params = {"batch_size": 2, "max_batch_bytes": 1000, "concurrency": 2}
+        params.update(kwargs)
+        return EmbeddingBatcher(embedder, collection, **params)
+
+    def test_flush_upserts_all_buffered_chunks(self):
+        """验证多个文件的分块在一次 flush 中写入。"""
+        batcher = self._make_batcher()
+        batcher.add(["a", "bb"], [{"f": 1}, {"f": 1}])
+        batcher.add(["ccc"], [{"f": 2}])
+        assert batcher.flush() == 3
+        batcher.collection.upsert.assert_called_once()
+        kwargs = batcher.collection.upsert.call_args.kwargs
+        assert kwargs["documents"] == ["a", "bb", "ccc"]
+        assert kwargs["embeddings"] == [[1.0], [2.0], [3.0]]
+        assert batcher.pending == 0
+
+    def test_embed_splits_by_batch_size(self):
+        """验证按批量大小拆分嵌入请求并保持顺序。"""
+        batcher = self._make_batcher()
+        vectors = batcher.embed(["a", "bb", "ccc", "dddd", "eeeee"])
+        assert vectors == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        assert batcher.embedding_function.embed_documents.call_count == 3
+
+    def test_embed_splits_by_byte_budget(self):
+        """验证超出字节预算时提前结束批次。"""
+        batcher = self._make_batcher(batch_size=10, max_batch_bytes=5)
+        batcher.embed(["aaa", "bbb", "ccc"])
+        assert batcher.embedding_function.embed_documents.call_count == 3
+
+    def test_is_full(self):
+        """验证缓冲区达到 batch_size * concurrency 时报告已满。"""
+        batcher = self._make_batcher()
+        batcher.add(["a", "b", "c"], [{}, {}, {}])
+        assert not batcher.is_full()
+        batcher.add(["d"], [{}])
+        assert batcher.is_full()
+
+    def test_flush_empty_is_noop(self):
+        """验证空缓冲区 flush 不调用 Chroma。"""
+        batcher = self._make_batcher()
+        assert batcher.flush() == 0
+        batcher.collection.upsert.assert_not_called()
+
+    def test_flush_respects_max_write_batch(self):
+        """验证超过 Chroma 最大批量的写入被拆分为多次 upsert/delete。"""
+        batcher = self._make_batcher(batch_size=100, max_write_batch=2)
+        batcher.add(["a", "b", "c", "d", "e"], [{}] * 5)
+        batcher.delete(["x", "y", "z"])
+        assert batcher.flush() == 5
+        sizes = [len(c.kwargs["ids"]) for c in batcher.collection.upsert.call_args_list]
+        assert sizes == [2, 2, 1]
+        assert batcher.collection.delete.call_count == 2
+
+    def test_flush_updates_kept_metadata(self):
+        """验证保留分块的元数据更新在 flush 时写入，且不重新嵌入。"""
+        batcher = self._make_batcher(max_write_batch=2)
+        batcher.update(["k1", "k2", "k3"], [{"chunk_index": i} for i in range(3)])
+        assert batcher.flush() == 0
+        batcher.embedding_function.embed_documents.assert_not_called()
+        assert batcher.collection.update.call_count == 2
@@ -0,0 +1,59 @@
+"""
+嵌入缓存测试 — 验证内容寻址的命中/未命中、LRU 淘汰和批处理器集成。
+"""
+from unittest.mock import MagicMock
+from src.database.embedding_cache import EmbeddingCache
+from src.database.embedding_batcher import EmbeddingBatcher
+from src.config import Settings
+
+
+class TestEmbeddingCache:
+    """测试 EmbeddingCache 类。"""
+
+    def _make_cache(self, tmp_path, max_entries=100):
+        """创建使用临时数据库路径的 EmbeddingCache。"""
+        return EmbeddingCache(str(tmp_path / "cache.db"), max_entries=max_entries)
+
+    def test_put_and_get(self, tmp_path):
+        """验证写入后可按 (模型, 文本) 命中。"""
+        cache = self._make_cache(tmp_path)
+        cache.put_many("nomic", ["hello"], [[0.5, 1.5]])
+        assert cache.get_many("nomic", ["hello", "other"]) == [[0.5, 1.5], None]
+        assert cache.stats() == {"hits": 1, "misses": 1}
+
+    def test_key_includes_model(self, tmp_path):
+        """验证不同嵌入模型之间不共享缓存。"""
+        cache = self._make_cache(tmp_path)
+        cache.put_many("nomic", ["hello"], [[1.0]])
+        assert cache.get_many("other-model", ["hello"]) == [None]
+
+    def test_lru_eviction(self, tmp_path):
+        """验证超出容量时淘汰最久未使用的条目。"""
+        cache = self._make_cache(tmp_path, max_entries=2)
+        cache.put_many("m", ["a"], [[1.0]])
+        cache.put_many("m", ["b"], [[2.0]])
+        cache.get_many("m", ["a"])  # 触碰 a，使 b 成为最久未使用
+        cache.put_many("m", ["c"], [[3.0]])
+        assert cache.get_many("m", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+    def test_batcher_embeds_only_misses(self, tmp_path):
+        """验证批处理器只为缓存未命中的分块调用嵌入模型。"""
+        cache = self._make_cache(tmp_path)
+        cache.put_many("m", ["cached"], [[9.0]])
+        embedder = MagicMock()
+        embedder.embed_documents.side_effect = lambda texts: [[1.0] for _ in texts]
+        batcher = EmbeddingBatcher(
+            embedder, MagicMock(), batch_size=8, max_batch_bytes=1000,
+            concurrency=1, cache=cache, model_name="m",
+        )
+        assert batcher.embed(["cached", "fresh"]) == [[9.0], [1.0]]
+        embedder.embed_documents.assert_called_once_with(["fresh"])
+
+
+def test_default_path_follows_metadata_db():
+    """验证缓存默认与 file_metadata.db 放在同一目录。"""
+    custom = Settings(metadata_db_path="/srv/rag/file_metadata.db")
+    assert custom.embedding_cache_path == "/srv/rag/embedding_cache.db"
+    assert custom.text_cache_path == "/srv/rag/extracted_text_cache.db"
+    explicit = Settings(embedding_cache_path="/tmp/cache.db")
+    assert explicit.embedding_cache_path == "/tmp/cache.db"
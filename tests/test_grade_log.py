@@ -0,0 +1,37 @@
+"""
+评分日志测试 — 验证评分结果的记录、容量上限和阈值校准。
+"""
+from src.database.grade_log import GradeLog
+
+
+class TestGradeLog:
+    """测试 GradeLog 类。"""
+
+    def _make_log(self, tmp_path, max_entries=1000):
+        """创建使用临时数据库路径的 GradeLog。"""
+        return GradeLog(str(tmp_path / "grade_log.db"), max_entries=max_entries)
+
+    def test_calibrates_separated_scores(self, tmp_path):
+        """高分总是相关、低分总是不相关时，校准出介于两者之间的阈值。"""
+        log = self._make_log(tmp_path)
+        outcomes = [(0.9 - i * 0.005, True) for i in range(30)]     # 0.9 .. 0.755
+        outcomes += [(0.6 + i * 0.005, i % 2 == 0) for i in range(20)]  # 模糊区间
+        outcomes += [(0.2 + i * 0.005, False) for i in range(30)]   # 0.2 .. 0.345
+        log.record("llama", outcomes)
+        accept, reject = log.calibrate("llama", min_samples=50, precision=0.98)
+        assert 0.7 < accept <= 0.755
+        assert 0.345 <= reject < 0.6
+
+    def test_too_few_samples(self, tmp_path):
+        """样本不足时不校准。"""
+        log = self._make_log(tmp_path)
+        log.record("llama", [(0.9, True)] * 20)
+        assert log.calibrate("llama", min_samples=50, precision=0.98) == (None, None)
+
+    def test_scoped_per_model_and_bounded(self, tmp_path):
+        """验证按模型区分，且只保留最新的 max_entries 条记录。"""
+        log = self._make_log(tmp_path, max_entries=5)
+        log.record("llama", [(0.5, True)] * 8)
+        log.record("other", [(0.5, False)] * 2)
+        assert log.count("llama") == 5
+        assert log.count("other") == 2
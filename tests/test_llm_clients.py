@@ -0,0 +1,177 @@
+"""
+LLM 客户端注册表测试 — 验证客户端共享、按端点的并发上限和启动预热。
+"""
+import time
+import asyncio
+import threading
+from typing import Any, List, Optional
+from unittest.mock import MagicMock, patch
+
+from pydantic import PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from src.config import settings
+from src.llm_clients import EndpointLimit, LLMClients, _Limited
+
+
+class Tracker:
+    """记录同时进行中的请求数峰值。"""
+
+    def __init__(self):
+        self.now = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def enter(self):
+        with self.lock:
+            self.now += 1
+            self.peak = max(self.peak, self.now)
+
+    def leave(self):
+        with self.lock:
+            self.now -= 1
+
+
+class SlowChatModel(BaseChatModel):
+    """每次调用耗时固定的假聊天模型。"""
+    tracker: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        self.tracker.enter()
+        time.sleep(0.05)
+        self.tracker.leave()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs) -> ChatResult:
+        self.tracker.enter()
+        await asyncio.sleep(0.05)
+        self.tracker.leave()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+
+class LimitedSlowChatModel(_Limited, SlowChatModel):
+    _endpoint_limit: EndpointLimit = PrivateAttr()
+
+
+def limited_model(limit: int) -> LimitedSlowChatModel:
+    model = LimitedSlowChatModel(tracker=Tracker())
+    model._endpoint_limit = EndpointLimit(limit)
+    return model
+
+
+class TestLLMClients:
+    """测试客户端注册表。"""
+
+    def test_one_client_per_model(self, monkeypatch):
+        """同一模型只构建一个客户端；聊天与嵌入客户端共享同一连接池。"""
+        monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+        registry = LLMClients()
+        assert registry.ollama() is registry.ollama()
+        assert registry.ollama("other-model") is not registry.ollama()
+        assert registry.gemini() is registry.gemini()
+        transport = registry.ollama()._client._client._transport
+        assert registry.embeddings()._client._client._transport is transport
+        assert registry.ollama().keep_alive == settings.ollama_keep_alive_seconds
+
+    def test_endpoints_have_separate_limits(self, monkeypatch):
+        """Ollama 模型共用一个端点上限，Gemini 单独计数。"""
+        monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+        registry = LLMClients()
+        assert registry.ollama()._endpoint_limit is registry.ollama("other")._endpoint_limit
+        assert registry.gemini()._endpoint_limit is not registry.ollama()._endpoint_limit
+        assert registry.gemini()._endpoint_limit.limit == settings.gemini_max_concurrency
+
+
+class TestEndpointLimit:
+    """测试按端点的并发上限。"""
+
+    def test_caps_threaded_calls(self):
+        """多线程同时调用时，进行中的请求不超过上限。"""
+        model = limited_model(2)
+        threads = [threading.Thread(target=model.invoke, args=("hi",)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert model.tracker.peak == 2
+        assert model._endpoint_limit.active == 0
+
+    def test_caps_async_calls(self):
+        """事件循环中并发调用时同样受上限约束。"""
+        model = limited_model(2)
+
+        async def main():
+            await asyncio.gather(*(model.ainvoke("hi") for _ in range(6)))
+
+        asyncio.run(main())
+        assert model.tracker.peak == 2
+        assert model._endpoint_limit.active == 0
+
+    def test_threads_and_loop_share_limit(self):
+        """线程和事件循环的请求共用同一个上限。"""
+        model = limited_model(2)
+
+        async def main():
+            await asyncio.gather(*(model.ainvoke("hi") for _ in range(4)))
+
+        threads = [threading.Thread(target=model.invoke, args=("hi",)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        asyncio.run(main())
+        for thread in threads:
+            thread.join()
+        assert model.tracker.peak <= 2
+        assert model._endpoint_limit.active == 0
+
+    def test_cancelled_waiter_passes_slot_on(self):
+        """等待中的请求被取消后，空出的名额仍会交给下一个等待者。"""
+        limit = EndpointLimit(1)
+
+        async def main():
+            await limit.aacquire()
+            cancelled = asyncio.create_task(limit.aacquire())
+            waiting = asyncio.create_task(limit.aacquire())
+            await asyncio.sleep(0)
+            limit.release()
+            cancelled.cancel()
+            await asyncio.wait_for(waiting, timeout=1)
+
+        asyncio.run(main())
+        assert limit.active == 1
+
+
+class TestWarmUp:
+    """测试启动时的模型预热。"""
+
+    def test_loads_chat_and_embedding_models(self):
+        """并发加载聊天模型和嵌入模型，并带上 keep-alive。"""
+        client = MagicMock()
+        with patch("src.llm_clients.ollama.Client", return_value=client):
+            LLMClients().warm_up(background=False)
+        client.generate.assert_called_once_with(
+            model=settings.ollama_model, prompt="",
+            keep_alive=settings.ollama_keep_alive_seconds,
+        )
+        assert client.embed.call_args.kwargs["model"] == settings.ollama_embed_model
+
+    def test_failure_is_not_raised(self):
+        """Ollama 不可用时只打印警告。"""
+        client = MagicMock()
+        client.generate.side_effect = ConnectionError("refused")
+        with patch("src.llm_clients.ollama.Client", return_value=client):
+            LLMClients().warm_up(background=False)
+        client.embed.assert_called_once()
+
+    def test_disabled(self):
+        """关闭预热时不发起请求。"""
+        with patch.object(settings, "warm_up_models", False), \
+                patch("src.llm_clients.ollama.Client") as MockClient:
+            assert LLMClients().warm_up() is None
+        MockClient.assert_not_called()
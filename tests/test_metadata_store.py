@@ -3,8 +3,9 @@
 验证 SQLite 的 CRUD 操作、文件哈希和变更检测。
 """
 import os
+import sqlite3
 from unittest.mock import patch
-from src.database.metadata_store import MetadataStore
+from src.database.metadata_store import ChunkRecord, MetadataStore, verdict_key
 
 
 class TestMetadataStore:
@@ -32,6 +33,14 @@ class TestMetadataStore:
         user2_files = store.get_user_files("user2")
         assert len(user2_files) == 1
 
+    def test_add_file_replaces_previous_record(self, tmp_path):
+        """验证重新摄入同一路径时替换旧记录而非追加。"""
+        store = self._make_store(tmp_path)
+        store.add_file("user1", "data.txt", "/path/data.txt", "old_hash", "text")
+        store.add_file("user1", "data.txt", "/path/data.txt", "new_hash", "text")
+        assert store.get_user_files("user1") == ["data.txt"]
+        assert store.get_file_hash("/path/data.txt") == "new_hash"
+
     def test_file_hash_storage(self, tmp_path):
         """验证文件哈希的存储和检索。"""
         store = self._make_store(tmp_path)
@@ -68,3 +77,236 @@ class TestMetadataStore:
         hash2 = MetadataStore.compute_file_hash(sample_txt_file)
         assert hash1 == hash2
         assert len(hash1) == 64  # SHA-256 hex 长度
+
+    def test_resolve_file_hash_uses_stat_cache(self, tmp_path, sample_txt_file):
+        """验证 stat 签名未变时不重新计算哈希。"""
+        store = self._make_store(tmp_path)
+        old = os.stat(sample_txt_file).st_mtime_ns - 10_000_000_000
+        os.utime(sample_txt_file, ns=(old, old))
+
+        first = store.resolve_file_hash(sample_txt_file)
+        with patch.object(MetadataStore, "compute_file_hash") as mock_hash:
+            assert store.resolve_file_hash(sample_txt_file) == first
+            mock_hash.assert_not_called()
+
+    def test_resolve_file_hash_paranoid_rehashes(self, tmp_path, sample_txt_file):
+        """验证 paranoid 模式总是重新计算哈希。"""
+        store = self._make_store(tmp_path)
+        old = os.stat(sample_txt_file).st_mtime_ns - 10_000_000_000
+        os.utime(sample_txt_file, ns=(old, old))
+
+        store.resolve_file_hash(sample_txt_file)
+        with patch.object(MetadataStore, "compute_file_hash", return_value="fresh") as mock_hash:
+            assert store.resolve_file_hash(sample_txt_file, paranoid=True) == "fresh"
+            mock_hash.assert_called_once()
+
+    def test_recently_modified_file_not_cached(self, tmp_path, sample_txt_file):
+        """验证刚修改的文件不会写入 stat 缓存（同一 mtime 刻度内可能仍在写入）。"""
+        store = self._make_store(tmp_path)
+        store.resolve_file_hash(sample_txt_file)
+        assert store.get_cached_hash(sample_txt_file, os.stat(sample_txt_file)) is None
+
+    def test_tombstone_hides_file(self, tmp_path):
+        """验证标记删除的文件不再出现在列表中，且重新出现时视为新文件。"""
+        store = self._make_store(tmp_path)
+        store.add_file("user1", "a.txt", "/data/a.txt", "h1", "text")
+        store.add_file("user1", "b.txt", "/data/b.txt", "h2", "text")
+        store.add_file("user1", "c.txt", "/other/c.txt", "h3", "text")
+        assert sorted(store.get_live_paths("user1", "/data")) == ["/data/a.txt", "/data/b.txt"]
+
+        store.tombstone_files("user1", ["/data/a.txt"])
+        assert store.get_live_paths("user1", "/data") == ["/data/b.txt"]
+        assert "a.txt" not in store.get_user_files("user1")
+        assert store.check_file_changed("/data/a.txt", "h1") is True
+
+    def test_bulk_add_and_get_hashes(self, tmp_path):
+        """验证批量记录与批量查询哈希。"""
+        store = self._make_store(tmp_path)
+        store.add_files("user1", [
+            ("a.txt", "/data/a.txt", "h1", "text"),
+            ("b.txt", "/data/b.txt", "h2", "text"),
+        ])
+        store.add_files("user1", [("a.txt", "/data/a.txt", "h1b", "text")])
+        assert store.get_hashes(["/data/a.txt", "/data/b.txt", "/data/missing.txt"]) == {
+            "/data/a.txt": "h1b",
+            "/data/b.txt": "h2",
+        }
+        assert sorted(store.get_user_files("user1")) == ["a.txt", "b.txt"]
+
+    def test_bulk_file_states(self, tmp_path, sample_txt_file):
+        """验证批量记录和读取 stat 签名。"""
+        store = self._make_store(tmp_path)
+        old = os.stat(sample_txt_file).st_mtime_ns - 10_000_000_000
+        os.utime(sample_txt_file, ns=(old, old))
+        stat = os.stat(sample_txt_file)
+        store.record_file_states([(sample_txt_file, stat, "h1")])
+        states = store.get_file_states([sample_txt_file, "/missing"])
+        assert list(states) == [sample_txt_file]
+        assert MetadataStore.hash_for_stat(states[sample_txt_file], stat) == "h1"
+
+    def test_wal_mode_and_indexes(self, tmp_path):
+        """验证数据库使用 WAL 模式，并建立了按路径查询的索引。"""
+        store = self._make_store(tmp_path)
+        conn = sqlite3.connect(store.db_path)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT file_hash FROM uploads "
+            "WHERE file_path = ? AND deleted_at IS NULL ORDER BY upload_timestamp",
+            ("/x",),
+        ).fetchall()
+        conn.close()
+        assert "idx_uploads_path_time" in str(plan)
+
+    def test_migrates_legacy_database(self, tmp_path):
+        """验证旧版数据库 (无 deleted_at、含重复记录) 被迁移。"""
+        db_path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE uploads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                file_path TEXT,
+                file_hash TEXT,
+                source_type TEXT DEFAULT 'unknown',
+                upload_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO uploads (user_id, filename, file_path, file_hash) VALUES (?, ?, ?, ?)",
+            [("user1", "a.txt", "/a.txt", "old"), ("user1", "a.txt", "/a.txt", "new")],
+        )
+        conn.commit()
+        conn.close()
+
+        store = MetadataStore(db_path)
+        assert store.get_user_files("user1") == ["a.txt"]
+        assert store.get_file_hash("/a.txt") == "new"
+        store.tombstone_files("user1", ["/a.txt"])
+        assert store.get_user_files("user1") == []
+
+    def test_byte_offsets_migrated_to_chars(self, tmp_path):
+        """验证旧的字节偏移列被改名为字符偏移，旧值被清空。"""
+        from src.database import metadata_store
+        db_path = str(tmp_path / "offsets.db")
+        with patch.object(metadata_store, "MIGRATIONS", metadata_store.MIGRATIONS[:-1]):
+            MetadataStore(db_path).close()
+        conn = sqlite3.connect(db_path)
+        file_id = conn.execute(
+            "INSERT INTO uploads (user_id, filename, file_path, file_hash) "
+            "VALUES ('user1', 'a.txt', '/a.txt', 'h')"
+        ).lastrowid
+        rowid = conn.execute(
+            "INSERT INTO chunks (vector_id, file_id, chunk_index, content_hash, "
+            "start_byte, end_byte, token_count) VALUES ('v0', ?, 0, 'h0', 4, 12, 2)",
+            (file_id,),
+        ).lastrowid
+        conn.execute("INSERT INTO chunks_fts (rowid, text) VALUES (?, 'Café menu')", (rowid,))
+        conn.commit()
+        conn.close()
+
+        store = MetadataStore(db_path)
+        hits = store.search_chunks("user1", "menu", 5)
+        assert (hits[0]["start_char"], hits[0]["end_char"]) == (None, None)
+
+    def test_chunk_registry(self, tmp_path):
+        """验证分块注册表随上传记录写入，并提供按文件的统计。"""
+        store = self._make_store(tmp_path)
+        chunks = [ChunkRecord(f"v{i}", i, f"h{i}", i * 10, i * 10 + 10, 3) for i in range(3)]
+        store.add_files("user1", [("a.txt", "/data/a.txt", "h", "text")],
+                        chunks={"/data/a.txt": chunks})
+        store.add_files("user1", [("b.txt", "/data/b.txt", "h", "text")])
+        assert store.get_chunk_ids("user1", ["/data/a.txt", "/data/b.txt"]) == {
+            "/data/a.txt": {"v0", "v1", "v2"},
+        }
+        assert store.get_chunk_ids("user2", ["/data/a.txt"]) == {}
+        stats = {f["filename"]: f for f in store.get_file_stats("user1")}
+        assert stats["a.txt"]["chunks"] == 3
+        assert stats["a.txt"]["tokens"] == 9
+        assert stats["b.txt"]["chunks"] == 0
+
+    def test_reingest_replaces_chunks_and_keeps_file_id(self, tmp_path):
+        """验证重新摄入替换分块注册，且文件 ID 保持不变。"""
+        store = self._make_store(tmp_path)
+        store.add_files("user1", [("a.txt", "/data/a.txt", "h1", "text")],
+                        chunks={"/data/a.txt": [ChunkRecord("old", 0, "h", None, None, 1)]})
+        store.add_files("user1", [("a.txt", "/data/a.txt", "h2", "text")],
+                        chunks={"/data/a.txt": [ChunkRecord("new", 0, "h", None, None, 1)]})
+        assert store.get_chunk_ids("user1", ["/data/a.txt"]) == {"/data/a.txt": {"new"}}
+        conn = sqlite3.connect(store.db_path)
+        assert conn.execute("SELECT COUNT(*) FROM uploads").fetchone()[0] == 1
+        conn.close()
+
+    def test_tombstone_forgets_chunks(self, tmp_path):
+        """验证标记删除的文件不再有注册的分块。"""
+        store = self._make_store(tmp_path)
+        store.add_files("user1", [("a.txt", "/data/a.txt", "h", "text")],
+                        chunks={"/data/a.txt": [ChunkRecord("v0", 0, "h", None, None, 1)]})
+        store.tombstone_files("user1", ["/data/a.txt"])
+        assert store.get_chunk_ids("user1", ["/data/a.txt"]) == {}
+
+    def test_search_chunks_bm25(self, tmp_path):
+        """验证关键词检索按用户过滤，并能命中精确的账号等词元。"""
+        store = self._make_store(tmp_path)
+        store.add_files("user1", [("bank.txt", "/data/bank.txt", "h", "text")], chunks={
+            "/data/bank.txt": [
+                ChunkRecord("v0", 0, "h0", None, None, 5, text="Account 99-1234 is my chequing account."),
+                ChunkRecord("v1", 1, "h1", None, None, 5, text="I like hiking on weekends."),
+            ],
+        })
+        store.add_files("user2", [("other.txt", "/data/other.txt", "h", "text")], chunks={
+            "/data/other.txt": [ChunkRecord("v2", 0, "h2", None, None, 5, text="Account 99-1234 too.")],
+        })
+        hits = store.search_chunks("user1", "What is account 99-1234 for?", 5)
+        assert [h["vector_id"] for h in hits] == ["v0"]
+        assert hits[0]["source"] == "bank.txt"
+        assert store.search_chunks("user1", "?!", 5) == []
+
+        store.tombstone_files("user1", ["/data/bank.txt"])
+        assert store.search_chunks("user1", "account", 5) == []
+
+    def test_corpus_version_changes_on_ingest_and_removal(self, tmp_path):
+        """验证摄入或删除文件都会推进该用户的语料版本，且不影响其他用户。"""
+        store = self._make_store(tmp_path)
+        assert store.get_corpus_version("user1") == 0
+        store.add_files("user1", [("a.txt", "/data/a.txt", "h1", "text")])
+        after_ingest = store.get_corpus_version("user1")
+        assert after_ingest > 0
+        store.tombstone_files("user1", ["/data/a.txt"])
+        assert store.get_corpus_version("user1") > after_ingest
+        assert store.get_corpus_version("user2") == 0
+
+    def test_verdicts_memoized_by_normalized_question(self, tmp_path):
+        """验证判定结果按规范化问题、分块哈希和模型记忆。"""
+        store = self._make_store(tmp_path)
+        store.put_verdicts("relevance", "llama", "What is my rent?", [(["h1"], True), (["h2"], False)])
+        assert store.get_verdicts("relevance", "llama", "  what is my RENT ", ["h1", "h2", "h3"]) == {
+            "h1": True, "h2": False,
+        }
+        assert store.get_verdicts("relevance", "other-model", "What is my rent?", ["h1"]) == {}
+        assert store.get_verdicts("sufficiency", "llama", "What is my rent?", ["h1"]) == {}
+
+    def test_sufficiency_key_ignores_order(self):
+        """验证多分块判定的键与分块顺序无关。"""
+        assert verdict_key(["a", "b"]) == verdict_key(["b", "a"])
+        assert verdict_key(["a"]) == "a"
+
+    def test_reingestion_drops_verdicts_of_removed_chunks(self, tmp_path):
+        """验证重新摄入后，已不存在的分块相关的判定被清除，保留的分块判定仍有效。"""
+        store = self._make_store(tmp_path)
+
+        def record(hashes):
+            return [ChunkRecord(f"v-{h}", i, h, None, None, 1, text=h) for i, h in enumerate(hashes)]
+
+        store.add_files("user1", [("a.txt", "/data/a.txt", "f1", "text")],
+                        chunks={"/data/a.txt": record(["h1", "h2"])})
+        store.put_verdicts("relevance", "llama", "q", [(["h1"], True), (["h2"], True)])
+        store.put_verdicts("sufficiency", "llama", "q", [(["h1", "h2"], True)])
+
+        store.add_files("user1", [("a.txt", "/data/a.txt", "f2", "text")],
+                        chunks={"/data/a.txt": record(["h1", "h3"])})
+        assert store.get_verdicts("relevance", "llama", "q", ["h1", "h2"]) == {"h1": True}
+        assert store.get_verdicts("sufficiency", "llama", "q", [verdict_key(["h1", "h2"])]) == {}
+
+        store.tombstone_files("user1", ["/data/a.txt"])
+        assert store.get_verdicts("relevance", "llama", "q", ["h1"]) == {}
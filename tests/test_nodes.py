@@ -4,10 +4,138 @@
 Uses Pydantic structured output mocks (GradeResult / HallucinationResult).
 """
 from unittest.mock import patch, MagicMock
+from src.config import settings
+from src.graph.nodes.base import BlockingCall, LLMBatch, LLMNode
+from src.graph.nodes.generate import GenerateNode
 from src.graph.nodes.grade import GradeNode
+from src.graph.nodes.judge import JudgeNode
 from src.graph.nodes.sufficiency import SufficiencyNode
 from src.graph.nodes.hallucination import HallucinationNode
-from src.graph.schemas import GradeResult, HallucinationResult
+from src.graph.nodes.table_query import TableQueryNode, mentions_tables
+from src.graph.nodes.retrieve import RetrieveNode, reciprocal_rank_fusion
+from src.graph.nodes.speculative import SpeculativeSufficiencyNode
+from src.graph.schemas import (
+    GradeResult, GroundingVerdict, HallucinationResult, ListwiseJudgement,
+    TableQueryResult,
+)
+from src.database.table_store import TableStore
+
+
+# ========== Retrieve Node 测试 ==========
+
+class TestRetrieveNode:
+    """测试混合检索节点。"""
+
+    def _make_node(self, vector_hits, keyword_hits):
+        """创建一个使用 mock 向量检索器和关键词索引的 RetrieveNode。"""
+        vector_store = MagicMock()
+        docs = []
+        for source, text in vector_hits:
+            doc = MagicMock(page_content=text)
+            doc.metadata = {"source": source}
+            docs.append(doc)
+        vector_store.search_by_vector.return_value = [
+            (doc, 0.9 - 0.1 * i) for i, doc in enumerate(docs)
+        ]
+        metadata_store = MagicMock()
+        metadata_store.search_chunks.return_value = [
+            {"vector_id": f"v{i}", "source": source, "text": text}
+            for i, (source, text) in enumerate(keyword_hits)
+        ]
+        return RetrieveNode(vector_store, metadata_store)
+
+    def test_fuses_vector_and_keyword_hits(self):
+        """两路都命中的分块排在最前，只被关键词命中的分块也会返回。"""
+        node = self._make_node(
+            vector_hits=[("a.txt", "hiking"), ("b.txt", "account 99-1234")],
+            keyword_hits=[("b.txt", "account 99-1234"), ("c.txt", "routing 001")],
+        )
+        result = node({"question": "account 99-1234", "user_id": "u1"})
+        assert result["documents"][0] == "account 99-1234"
+        assert "routing 001" in result["documents"]
+        assert result["sources"][0] == "b.txt"
+
+    def test_keeps_vector_scores(self):
+        """向量命中的文档带有相关度分数，仅关键词命中的文档分数为 None。"""
+        node = self._make_node(
+            vector_hits=[("a.txt", "hiking")],
+            keyword_hits=[("c.txt", "routing 001")],
+        )
+        result = node({"question": "hiking", "user_id": "u1"})
+        scores = dict(zip(result["documents"], result["retrieval_scores"]))
+        assert scores == {"hiking": 0.9, "routing 001": None}
+
+    def test_vector_search_uses_cached_embedding(self):
+        """向量检索使用 embed_query 的向量，而非每次构建检索器。"""
+        node = self._make_node(vector_hits=[("a.txt", "hiking")], keyword_hits=[])
+        node.vector_store.embed_query.return_value = [0.1, 0.2]
+        node({"question": "hiking", "user_id": "u1"})
+        node.vector_store.embed_query.assert_called_once_with("hiking")
+        node.vector_store.search_by_vector.assert_called_once()
+        assert node.vector_store.search_by_vector.call_args[0][:2] == ("u1", [0.1, 0.2])
+        node.vector_store.as_retriever.assert_not_called()
+
+    def test_records_chunk_spans(self):
+        """记录每个分块的来源和字符位置，供上下文构建合并相邻分块。"""
+        node = self._make_node(vector_hits=[("a.txt", "hiking")], keyword_hits=[])
+        doc = node.vector_store.search_by_vector.return_value[0][0]
+        doc.metadata.update({"start_char": 10, "end_char": 16})
+        result = node({"question": "hiking", "user_id": "u1"})
+        assert result["chunk_spans"] == {"hiking": ("a.txt", 10, 16)}
+
+    def test_keyword_failure_falls_back_to_vector(self):
+        """关键词检索失败时仍返回向量检索结果。"""
+        node = self._make_node(vector_hits=[("a.txt", "hiking")], keyword_hits=[])
+        node.metadata_store.search_chunks.side_effect = RuntimeError("fts broken")
+        result = node({"question": "hiking", "user_id": "u1"})
+        assert result["documents"] == ["hiking"]
+
+    def test_rrf_rewards_agreement(self):
+        """RRF: 在两个列表中都出现的项得分高于只出现一次的第一名。"""
+        fused = reciprocal_rank_fusion([["x", "shared"], ["y", "shared"]], k=60)
+        assert fused[0] == "shared"
+
+
+# ========== LLMNode 驱动测试 ==========
+
+class TestLLMNodeDriver:
+    """测试节点生成器的同步/异步驱动。"""
+
+    class Probe(LLMNode):
+        """在阻塞调用中记录所在线程的节点。"""
+
+        def steps(self, state):
+            import threading
+            thread = yield BlockingCall(threading.get_ident)
+            return {"thread": thread}
+
+    def test_blocking_call_runs_inline_when_sync(self):
+        """同步驱动时阻塞调用在当前线程执行。"""
+        import threading
+        assert self.Probe()({})["thread"] == threading.get_ident()
+
+    def test_blocking_call_leaves_event_loop(self):
+        """异步驱动时阻塞调用在工作线程执行，不占用事件循环。"""
+        import asyncio
+        import threading
+
+        async def main():
+            return threading.get_ident(), await self.Probe().acall({})
+
+        loop_thread, result = asyncio.run(main())
+        assert result["thread"] != loop_thread
+
+    def test_batch_pools_reused_per_size(self):
+        """相同并发度复用同一个线程池，不同并发度各有一个。"""
+        chain = MagicMock()
+        chain.invoke.return_value = "ok"
+        node = LLMNode()
+        node._run(LLMBatch(chain, [{}], max_concurrency=2))
+        pool = node._pool(2)
+        node._run(LLMBatch(chain, [{}], max_concurrency=3))
+        node._run(LLMBatch(chain, [{}], max_concurrency=2))
+        assert node._pool(2) is pool
+        assert set(node._executors) == {2, 3}
 
 
 # ========== Grade Node 测试 ==========
@@ -17,19 +145,19 @@ class TestGradeNode:
 
     def _make_node_with_mock(self, score: bool):
         """创建一个使用 mock structured LLM 的 GradeNode。"""
-        with patch("src.graph.nodes.grade.ChatOllama") as MockLLM:
+        with patch("src.graph.nodes.grade.clients") as MockClients:
             mock_instance = MagicMock()
             mock_instance.with_structured_output.return_value = mock_instance
-            MockLLM.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
             node = GradeNode()
         return node
 
     def test_grade_keeps_relevant(self):
         """mock LLM 返回 score=True → 文档应保留。"""
-        with patch("src.graph.nodes.grade.ChatOllama") as MockLLM:
+        with patch("src.graph.nodes.grade.clients") as MockClients:
             mock_instance = MagicMock()
             mock_instance.with_structured_output.return_value = mock_instance
-            MockLLM.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
             node = GradeNode()
 
             # Mock the chain to return GradeResult(score=True)
@@ -47,10 +175,10 @@ class TestGradeNode:
 
     def test_grade_filters_irrelevant(self):
         """mock LLM 返回 score=False → 文档应被过滤。"""
-        with patch("src.graph.nodes.grade.ChatOllama") as MockLLM:
+        with patch("src.graph.nodes.grade.clients") as MockClients:
             mock_instance = MagicMock()
             mock_instance.with_structured_output.return_value = mock_instance
-            MockLLM.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
             node = GradeNode()
 
             mock_chain = MagicMock()
@@ -65,6 +193,131 @@ class TestGradeNode:
                 result = node(state)
                 assert len(result["documents"]) == 0
 
+    def test_grade_concurrent_keeps_order(self):
+        """并发评分时，先完成的文档不会打乱原有顺序，且记录每个文档的耗时。"""
+        import threading
+        import time as _time
+        with patch("src.graph.nodes.grade.clients") as MockClients:
+            mock_instance = MagicMock()
+            mock_instance.with_structured_output.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
+            node = GradeNode()
+
+            active = {"now": 0, "peak": 0}
+            lock = threading.Lock()
+
+            def slow_grade(inputs):
+                with lock:
+                    active["now"] += 1
+                    active["peak"] = max(active["peak"], active["now"])
+                # 第一个文档最慢，最后完成
+                _time.sleep(0.1 if inputs["document"] == "d0" else 0.02)
+                with lock:
+                    active["now"] -= 1
+                return GradeResult(score=inputs["document"] != "d2")
+
+            mock_chain = MagicMock()
+            mock_chain.invoke.side_effect = slow_grade
+            with patch("src.graph.nodes.grade.ChatPromptTemplate") as MockPrompt:
+                MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+
+                result = node({"question": "q", "documents": ["d0", "d1", "d2", "d3"]})
+        assert result["documents"] == ["d0", "d1", "d3"]
+        assert len(result["grade_latencies"]) == 4
+        assert active["peak"] > 1
+
+    def test_grade_async_matches_sync(self):
+        """acall 使用 ainvoke 并发评分，结果与同步调用一致。"""
+        import asyncio
+        from unittest.mock import AsyncMock
+        with patch("src.graph.nodes.grade.clients") as MockClients:
+            mock_instance = MagicMock()
+            mock_instance.with_structured_output.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
+            node = GradeNode()
+
+            mock_chain = MagicMock()
+            mock_chain.ainvoke = AsyncMock(
+                side_effect=lambda inputs: GradeResult(score=inputs["document"] != "d1")
+            )
+            with patch("src.graph.nodes.grade.ChatPromptTemplate") as MockPrompt:
+                MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+                result = asyncio.run(node.acall({"question": "q", "documents": ["d0", "d1", "d2"]}))
+        assert result["documents"] == ["d0", "d2"]
+        assert mock_chain.ainvoke.await_count == 3
+        mock_chain.invoke.assert_not_called()
+
+    def test_grade_fast_path_skips_clear_cut_docs(self, tmp_path):
+        """分数高于接受阈值或低于拒绝阈值的文档不调用 LLM，模糊区间的结果写入日志。"""
+        from src.config import settings
+        from src.database.grade_log import GradeLog
+        with patch("src.graph.nodes.grade.clients") as MockClients:
+            mock_instance = MagicMock()
+            mock_instance.with_structured_output.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
+            log = GradeLog(str(tmp_path / "grade_log.db"))
+            node = GradeNode(log)
+
+            mock_chain = MagicMock()
+            mock_chain.invoke.return_value = GradeResult(score=True)
+            with patch("src.graph.nodes.grade.ChatPromptTemplate") as MockPrompt, \
+                    patch.object(settings, "grade_accept_score", 0.8), \
+                    patch.object(settings, "grade_reject_score", 0.3):
+                MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+                result = node({
+                    "question": "q",
+                    "documents": ["high", "mid", "low", "keyword-only"],
+                    "retrieval_scores": [0.9, 0.5, 0.1, None],
+                })
+        assert result["documents"] == ["high", "mid", "keyword-only"]
+        assert result["retrieval_scores"] == [0.9, 0.5, None]
+        assert mock_chain.invoke.call_count == 2
+        assert log.count(settings.ollama_model) == 1
+
+    def test_calibrated_fast_path_audits_a_sample(self, tmp_path):
+        """校准阈值生效后，快速路径的判定仍按抽样率交给 LLM 并写入日志。"""
+        from src.config import settings
+        from src.database.grade_log import GradeLog
+        with patch("src.graph.nodes.grade.clients") as MockClients:
+            mock_instance = MagicMock()
+            mock_instance.with_structured_output.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
+            log = GradeLog(str(tmp_path / "grade_log.db"))
+            node = GradeNode(log)
+
+            mock_chain = MagicMock()
+            mock_chain.invoke.return_value = GradeResult(score=False)
+            state = {"question": "q", "documents": ["high", "low"], "retrieval_scores": [0.9, 0.1]}
+            with patch("src.graph.nodes.grade.ChatPromptTemplate") as MockPrompt, \
+                    patch.object(node, "thresholds", return_value=(0.8, 0.3)):
+                MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+                with patch.object(settings, "grade_audit_rate", 0.0):
+                    assert node(state)["documents"] == ["high"]
+                assert mock_chain.invoke.call_count == 0
+                with patch.object(settings, "grade_audit_rate", 1.0):
+                    # 抽检时以 LLM 的判定为准
+                    assert node(state)["documents"] == []
+        assert mock_chain.invoke.call_count == 2
+        assert log.count(settings.ollama_model) == 2
+
+    def test_grade_reuses_memoized_verdicts(self, tmp_path):
+        """同一问题再次评分时直接复用已记忆的判定，不再调用 LLM。"""
+        from src.database.metadata_store import MetadataStore
+        with patch("src.graph.nodes.grade.clients") as MockClients:
+            mock_instance = MagicMock()
+            mock_instance.with_structured_output.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
+            node = GradeNode(metadata_store=MetadataStore(str(tmp_path / "meta.db")))
+
+            mock_chain = MagicMock()
+            mock_chain.invoke.side_effect = lambda inputs: GradeResult(score=inputs["document"] == "yes")
+            with patch("src.graph.nodes.grade.ChatPromptTemplate") as MockPrompt:
+                MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+                first = node({"question": "Rent?", "documents": ["yes", "no"]})
+                second = node({"question": "rent", "documents": ["yes", "no"]})
+        assert first["documents"] == second["documents"] == ["yes"]
+        assert mock_chain.invoke.call_count == 2
+
 
 # ========== Sufficiency Node 测试 ==========
 
@@ -73,10 +326,10 @@ class TestSufficiencyNode:
 
     def test_empty_docs_insufficient(self):
         """无文档 → 自动判定不充分。"""
-        with patch("src.graph.nodes.sufficiency.ChatOllama") as MockLLM:
+        with patch("src.graph.nodes.sufficiency.clients") as MockClients:
             mock_instance = MagicMock()
             mock_instance.with_structured_output.return_value = mock_instance
-            MockLLM.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
             node = SufficiencyNode()
         state = {"question": "What is my name?", "documents": []}
         result = node(state)
@@ -84,10 +337,10 @@ class TestSufficiencyNode:
 
     def test_sufficient_response(self):
         """mock LLM 返回 score=True → sufficiency_status=True。"""
-        with patch("src.graph.nodes.sufficiency.ChatOllama") as MockLLM:
+        with patch("src.graph.nodes.sufficiency.clients") as MockClients:
             mock_instance = MagicMock()
             mock_instance.with_structured_output.return_value = mock_instance
-            MockLLM.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
             node = SufficiencyNode()
 
             mock_chain = MagicMock()
@@ -104,10 +357,10 @@ class TestSufficiencyNode:
 
     def test_insufficient_response(self):
         """mock LLM 返回 score=False → sufficiency_status=False。"""
-        with patch("src.graph.nodes.sufficiency.ChatOllama") as MockLLM:
+        with patch("src.graph.nodes.sufficiency.clients") as MockClients:
             mock_instance = MagicMock()
             mock_instance.with_structured_output.return_value = mock_instance
-            MockLLM.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
             node = SufficiencyNode()
 
             mock_chain = MagicMock()
@@ -123,17 +376,192 @@ class TestSufficiencyNode:
                 assert result["sufficiency_status"] is False
 
 
+class TestSufficiencyMemo:
+    """测试充分性判定的记忆。"""
+
+    def test_reuses_verdict_for_same_chunk_set(self, tmp_path):
+        """同一组分块（顺序不同）对同一问题只调用一次 LLM。"""
+        from src.database.metadata_store import MetadataStore
+        with patch("src.graph.nodes.sufficiency.clients") as MockClients:
+            mock_instance = MagicMock()
+            mock_instance.with_structured_output.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
+            node = SufficiencyNode(MetadataStore(str(tmp_path / "meta.db")))
+
+            mock_chain = MagicMock()
+            mock_chain.invoke.return_value = GradeResult(score=True)
+            with patch("src.graph.nodes.sufficiency.ChatPromptTemplate") as MockPrompt:
+                MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+                first = node({"question": "q", "documents": ["a", "b"]})
+                second = node({"question": "q", "documents": ["b", "a"]})
+        assert first["sufficiency_status"] is second["sufficiency_status"] is True
+        assert mock_chain.invoke.call_count == 1
+
+
+class TestJudgeNode:
+    """测试单次列表式调用判定相关性与充分性的节点。"""
+
+    def _run(self, node, judgement, states):
+        mock_chain = MagicMock()
+        mock_chain.invoke.return_value = judgement
+        with patch("src.graph.nodes.judge.ChatPromptTemplate") as MockPrompt:
+            MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+            results = [node(state) for state in states]
+        return results, mock_chain
+
+    def _make_node(self, metadata_store=None):
+        with patch("src.graph.nodes.judge.clients"):
+            return JudgeNode(metadata_store)
+
+    def test_one_call_for_all_chunks(self):
+        """所有分块在一次调用中编号判定，保留相关分块及其检索分数。"""
+        state = {
+            "question": "What is my name?",
+            "documents": ["My name is James.", "I like pizza.", "James lives in Paris."],
+            "retrieval_scores": [0.9, 0.2, None],
+        }
+        (result,), chain = self._run(
+            self._make_node(),
+            ListwiseJudgement(relevant_chunks=[3, 1], sufficient=True),
+            [state],
+        )
+        assert chain.invoke.call_count == 1
+        prompt_docs = chain.invoke.call_args.args[0]["documents"]
+        assert "[1] My name is James." in prompt_docs
+        assert "[3] James lives in Paris." in prompt_docs
+        assert result == {
+            "documents": ["My name is James.", "James lives in Paris."],
+            "retrieval_scores": [0.9, None],
+            "sufficiency_status": True,
+        }
+
+    def test_ignores_out_of_range_numbers(self):
+        """无效编号被忽略；无相关分块时不可能充分。"""
+        (result,), _ = self._run(
+            self._make_node(),
+            ListwiseJudgement(relevant_chunks=[0, 5], sufficient=True),
+            [{"question": "q", "documents": ["a", "b"]}],
+        )
+        assert result["documents"] == []
+        assert result["sufficiency_status"] is False
+
+    def test_no_documents_skips_llm(self):
+        """没有文档 → 不调用 LLM。"""
+        (result,), chain = self._run(
+            self._make_node(), None, [{"question": "q", "documents": []}],
+        )
+        assert result["sufficiency_status"] is False
+        chain.invoke.assert_not_called()
+
+    def test_unreadable_judgement_keeps_documents(self):
+        """结构化输出解析失败 → 保留全部文档，判为不充分。"""
+        (result,), _ = self._run(
+            self._make_node(), None, [{"question": "q", "documents": ["a", "b"]}],
+        )
+        assert result["documents"] == ["a", "b"]
+        assert result["sufficiency_status"] is False
+
+    def test_memoized_judgement_skips_llm(self, tmp_path):
+        """同一问题和分块的判定被记忆，第二次不调用 LLM。"""
+        from src.database.metadata_store import MetadataStore
+        node = self._make_node(MetadataStore(str(tmp_path / "meta.db")))
+        state = {"question": "q", "documents": ["a", "b", "c"]}
+        (first, second), chain = self._run(
+            node, ListwiseJudgement(relevant_chunks=[2], sufficient=False),
+            [dict(state), dict(state)],
+        )
+        assert first == second
+        assert first["documents"] == ["b"]
+        assert chain.invoke.call_count == 1
+
+    def test_shares_memo_with_sufficiency_node(self, tmp_path):
+        """列表式判定写入的充分性结论可被 SufficiencyNode 复用。"""
+        from src.database.metadata_store import MetadataStore
+        store = MetadataStore(str(tmp_path / "meta.db"))
+        (result,), _ = self._run(
+            self._make_node(store),
+            ListwiseJudgement(relevant_chunks=[1, 2], sufficient=True),
+            [{"question": "q", "documents": ["a", "b", "c"]}],
+        )
+        with patch("src.graph.nodes.sufficiency.clients"):
+            sufficiency = SufficiencyNode(store)
+        assert sufficiency.memoized({"question": "q", "documents": result["documents"]}) is True
+
+
+class TestSpeculativeSufficiencyNode:
+    """测试充分性检查与本地草稿并行的推测执行节点。"""
+
+    def _make_node(self, sufficient, known=None):
+        """创建使用 mock 充分性节点和生成节点的推测节点。"""
+        import asyncio
+        sufficiency = MagicMock()
+        sufficiency.memoized.return_value = known
+        sufficiency.return_value = {"sufficiency_status": sufficient}
+
+        async def verdict(state):
+            await asyncio.sleep(0.01)
+            return {"sufficiency_status": sufficient}
+
+        sufficiency.acall.side_effect = verdict
+        generate = MagicMock()
+        draft = {"generation": "draft", "generation_tier": "local+gemini", "retry_count": 1}
+        generate.return_value = draft
+
+        async def slow_draft(state):
+            await asyncio.sleep(1)
+            return draft
+
+        generate.acall.side_effect = slow_draft
+        return SpeculativeSufficiencyNode(sufficiency, generate)
+
+    def test_sufficient_uses_draft(self):
+        """充分时直接返回并行生成的草稿。"""
+        node = self._make_node(sufficient=True)
+        result = node({"question": "q", "documents": ["d"]})
+        assert result["sufficiency_status"] is True
+        assert result["generation"] == "draft"
+        assert node.stats()["used"] == 1
+
+    def test_insufficient_discards_draft(self):
+        """不充分时丢弃草稿并计入浪费统计。"""
+        node = self._make_node(sufficient=False)
+        result = node({"question": "q", "documents": ["d"]})
+        assert result == {"sufficiency_status": False, "speculation_discarded": True}
+        node.executor.shutdown(wait=True)
+        stats = node.stats()
+        assert stats["discarded"] == 1 and stats["used"] == 0
+
+    def test_async_insufficient_cancels_draft(self):
+        """异步路径在判定不充分时取消草稿任务，不等待其完成。"""
+        import asyncio
+        import time as _time
+        node = self._make_node(sufficient=False)
+        started = _time.perf_counter()
+        result = asyncio.run(node.acall({"question": "q", "documents": ["d"]}))
+        assert result["speculation_discarded"] is True
+        assert _time.perf_counter() - started < 0.5
+        assert node.stats()["discarded"] == 1
+
+    def test_known_verdict_skips_speculation(self):
+        """已有记忆的不充分判定不会启动草稿。"""
+        node = self._make_node(sufficient=True, known=False)
+        result = node({"question": "q", "documents": ["d"]})
+        assert result == {"sufficiency_status": False}
+        node.generate_node.assert_not_called()
+        assert node.stats()["speculated"] == 0
+
+
 # ========== Hallucination Node 测试 ==========
 
 class TestHallucinationNode:
-    """测试幻觉检查节点。"""
+    """测试幻觉检查节点（默认的逐项检查模式）。"""
 
     def test_grounded_and_addresses_question(self):
         """两项检查均通过 → hallucination_status=True。"""
-        with patch("src.graph.nodes.hallucination.ChatOllama") as MockLLM:
+        with patch("src.graph.nodes.hallucination.clients") as MockClients:
             mock_instance = MagicMock()
             mock_instance.with_structured_output.return_value = mock_instance
-            MockLLM.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
             node = HallucinationNode()
 
             mock_chain = MagicMock()
@@ -155,10 +583,10 @@ class TestHallucinationNode:
 
     def test_not_grounded(self):
         """接地检查失败 → hallucination_status=False。"""
-        with patch("src.graph.nodes.hallucination.ChatOllama") as MockLLM:
+        with patch("src.graph.nodes.hallucination.clients") as MockClients:
             mock_instance = MagicMock()
             mock_instance.with_structured_output.return_value = mock_instance
-            MockLLM.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
             node = HallucinationNode()
 
             mock_chain = MagicMock()
@@ -173,3 +601,183 @@ class TestHallucinationNode:
                 }
                 result = node(state)
                 assert result["hallucination_status"] is False
+
+    def test_checks_against_generation_budget(self):
+        """事实上下文使用生成该答案时的同一上下文预算。"""
+        with patch("src.graph.nodes.hallucination.clients"):
+            node = HallucinationNode()
+        mock_chain = MagicMock()
+        mock_chain.invoke.return_value = HallucinationResult(score=False)
+        with patch("src.graph.nodes.hallucination.ChatPromptTemplate") as MockPrompt, \
+                patch("src.graph.nodes.hallucination.build_context", return_value="facts") as build:
+            MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+            for tier in ("local+gemini", "gemini"):
+                node({"question": "q", "documents": ["d"], "generation": "a",
+                      "generation_tier": tier})
+                assert build.call_args.args[1] == settings.gemini_context_tokens
+
+
+class TestCombinedHallucinationCheck:
+    """测试单次调用的接地与解决判定，以及重试时传递不支持的论断。"""
+
+    STATE = {
+        "question": "What is my name?",
+        "documents": ["My name is James Yuan."],
+        "generation": "Your name is James Yuan and you live in Paris.",
+    }
+
+    def _run(self, verdict):
+        with patch("src.graph.nodes.hallucination.clients") as MockClients, \
+                patch.object(settings, "hallucination_mode", "combined"):
+            MockClients.ollama.return_value = MagicMock()
+            node = HallucinationNode()
+            mock_chain = MagicMock()
+            mock_chain.invoke.return_value = verdict
+            with patch("src.graph.nodes.hallucination.ChatPromptTemplate") as MockPrompt:
+                MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+                result = node(dict(self.STATE))
+        return result, mock_chain
+
+    def test_single_call_when_verified(self):
+        """接地且解决问题 → 只调用一次 LLM，status=True。"""
+        result, chain = self._run(
+            GroundingVerdict(grounded=True, resolves_question=True)
+        )
+        assert result == {"hallucination_status": True, "unsupported_claims": []}
+        assert chain.invoke.call_count == 1
+
+    def test_returns_unsupported_claims(self):
+        """未接地 → status=False 并返回不支持的论断。"""
+        result, _ = self._run(GroundingVerdict(
+            grounded=False, resolves_question=True,
+            unsupported_claims=["You live in Paris."],
+        ))
+        assert result["hallucination_status"] is False
+        assert result["unsupported_claims"] == ["You live in Paris."]
+
+    def test_not_resolving_question(self):
+        """接地但未回答问题 → status=False，无论断。"""
+        result, _ = self._run(
+            GroundingVerdict(grounded=True, resolves_question=False)
+        )
+        assert result == {"hallucination_status": False, "unsupported_claims": []}
+
+    def test_unreadable_verdict_fails_check(self):
+        """结构化输出解析失败 (None) → 视为未通过。"""
+        result, _ = self._run(None)
+        assert result["hallucination_status"] is False
+
+    def test_regeneration_receives_claims(self):
+        """重试生成时，不支持的论断出现在本地和增强两个提示的输入中。"""
+        with patch("src.graph.nodes.generate.clients"), \
+                patch("src.graph.nodes.generate.clients"):
+            node = GenerateNode()
+        mock_chain = MagicMock()
+        mock_chain.__or__ = lambda self, other: mock_chain
+        mock_chain.invoke.side_effect = ["local", "enriched"]
+        with patch("src.graph.nodes.generate.ChatPromptTemplate") as MockPrompt:
+            MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+            result = node({
+                **self.STATE, "retry_count": 1,
+                "unsupported_claims": ["You live in Paris."],
+            })
+        assert result["generation"] == "enriched"
+        for call in mock_chain.invoke.call_args_list:
+            assert "You live in Paris." in call.args[0]["feedback"]
+
+    def test_first_generation_has_no_feedback(self):
+        """首次生成没有论断 → feedback 为空。"""
+        with patch("src.graph.nodes.generate.clients"), \
+                patch("src.graph.nodes.generate.clients"):
+            node = GenerateNode()
+        mock_chain = MagicMock()
+        mock_chain.__or__ = lambda self, other: mock_chain
+        mock_chain.invoke.side_effect = ["local", "enriched"]
+        with patch("src.graph.nodes.generate.ChatPromptTemplate") as MockPrompt:
+            MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+            node(dict(self.STATE))
+        assert all(call.args[0]["feedback"] == ""
+                   for call in mock_chain.invoke.call_args_list)
+
+
+# ========== Table Query Node 测试 ==========
+
+class TestTableQueryNode:
+    """测试表格查询节点。"""
+
+    def _make_node(self, tmp_path, sample_csv_file=None):
+        """创建一个使用临时 TableStore 和 mock LLM 的 TableQueryNode。"""
+        store = TableStore(str(tmp_path / "tables.db"))
+        if sample_csv_file:
+            store.load_csv("user1", sample_csv_file)
+        with patch("src.graph.nodes.table_query.clients") as MockClients:
+            mock_instance = MagicMock()
+            mock_instance.with_structured_output.return_value = mock_instance
+            MockClients.ollama.return_value = mock_instance
+            node = TableQueryNode(store)
+        return node, store
+
+    def test_no_tables_falls_through(self, tmp_path):
+        """用户没有表 → 不调用 LLM，直接进入检索。"""
+        node, _ = self._make_node(tmp_path)
+        result = node({"question": "How old is Bob?", "user_id": "user1"})
+        assert result == {"table_status": False}
+        node.structured_llm.invoke.assert_not_called()
+
+    def test_question_without_table_terms_skips_routing(self, tmp_path, sample_csv_file):
+        """问题与列名、文件名无共同词 → 不调用路由 LLM，也不读取样本行。"""
+        node, store = self._make_node(tmp_path, sample_csv_file)
+        with patch.object(store, "describe") as describe:
+            result = node({"question": "What did I study at university?", "user_id": "user1"})
+        assert result == {"table_status": False}
+        describe.assert_not_called()
+        node.structured_llm.invoke.assert_not_called()
+
+    def test_mentions_tables(self):
+        """列名和文件名按词匹配，忽略大小写、下划线和复数。"""
+        tables = [{"filename": "monthly_expenses.csv", "columns": [["Vendor_Name", "TEXT"]]}]
+        assert mentions_tables("Which vendors did I pay?", tables)
+        assert mentions_tables("Total monthly expense?", tables)
+        assert not mentions_tables("Where was I born?", tables)
+
+    def test_answers_from_sql(self, tmp_path, sample_csv_file):
+        """表格问题 → 执行 SQL 并返回 table 层级的答案。"""
+        node, store = self._make_node(tmp_path, sample_csv_file)
+        name = store.table_name("user1", sample_csv_file)
+
+        mock_chain = MagicMock()
+        mock_chain.__or__ = lambda self, other: mock_chain
+        mock_chain.invoke.side_effect = [
+            TableQueryResult(is_tabular=True, sql=f'SELECT AVG("Age") FROM "{name}"'),
+            "The average age is 27.5.",
+        ]
+        with patch("src.graph.nodes.table_query.ChatPromptTemplate") as MockPrompt:
+            MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+            result = node({"question": "Average age?", "user_id": "user1"})
+
+        assert result["table_status"] is True
+        assert result["generation_tier"] == "table"
+        assert "27.5" in result["documents"][0]
+        assert result["sources"] == ["test_data.csv"]
+
+    def test_failed_query_falls_through(self, tmp_path, sample_csv_file):
+        """SQL 执行失败 → 回退到检索。"""
+        node, _ = self._make_node(tmp_path, sample_csv_file)
+        mock_chain = MagicMock()
+        mock_chain.invoke.return_value = TableQueryResult(
+            is_tabular=True, sql="SELECT * FROM missing_table"
+        )
+        with patch("src.graph.nodes.table_query.ChatPromptTemplate") as MockPrompt:
+            MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+            result = node({"question": "Average age?", "user_id": "user1"})
+        assert result == {"table_status": False}
+
+    def test_routing_error_falls_through(self, tmp_path, sample_csv_file):
+        """结构化输出失败或返回 None → 回退到检索。"""
+        node, _ = self._make_node(tmp_path, sample_csv_file)
+        mock_chain = MagicMock()
+        mock_chain.invoke.side_effect = [ValueError("bad json"), None]
+        with patch("src.graph.nodes.table_query.ChatPromptTemplate") as MockPrompt:
+            MockPrompt.from_messages.return_value.__or__ = lambda self, other: mock_chain
+            assert node({"question": "Average age?", "user_id": "user1"}) == {"table_status": False}
+            assert node({"question": "Average age?", "user_id": "user1"}) == {"table_status": False}
@@ -0,0 +1,174 @@
+"""
+并行摄入流水线测试 — 验证多进程解析、批量嵌入和单写入者的统计结果。
+"""
+import os
+from concurrent.futures import Future
+from unittest.mock import MagicMock
+from src.database.vector_store import ChunkDiff
+from src.database.metadata_store import MetadataStore
+from src.ingestion.directory_scanner import DirectoryScanner
+from src.ingestion.pipeline import IngestionPipeline
+
+
+def _all_new(user_id, file_path, texts, metadatas, existing=None):
+    """模拟首次摄入: 所有分块都是新的。"""
+    return ChunkDiff(new_ids=[f"{file_path}:{i}" for i in range(len(texts))],
+                     new_texts=list(texts), new_metadatas=list(metadatas))
+
+
+def _stored_as_current(paths):
+    """模拟所有文件都已以当前内容摄入过。"""
+    return {p: MetadataStore.compute_file_hash(p) for p in paths}
+
+
+class TestIngestionPipeline:
+    """测试 DirectoryScanner 的流水线模式 (workers > 1)。"""
+
+    def _make_scanner(self):
+        """创建一个使用 mock 依赖的 DirectoryScanner。"""
+        mock_vector_store = MagicMock()
+        mock_vector_store.cache_stats.return_value = {"hits": 0, "misses": 0}
+        mock_vector_store.diff_chunks.side_effect = _all_new
+        mock_vector_store.embed_texts.side_effect = lambda texts: [[0.0, 1.0] for _ in texts]
+        mock_metadata_store = MagicMock()
+        mock_metadata_store.get_live_paths.return_value = []
+        mock_metadata_store.get_hashes.return_value = {}
+        mock_metadata_store.get_file_states.return_value = {}
+        mock_metadata_store.hash_for_stat.return_value = None
+        mock_metadata_store.get_chunk_ids.return_value = {}
+        return DirectoryScanner(mock_vector_store, mock_metadata_store)
+
+    def test_pipeline_ingests_supported_files(self, sample_data_dir):
+        """验证流水线模式与顺序模式给出相同的统计结果。"""
+        scanner = self._make_scanner()
+        stats = scanner.scan(sample_data_dir, user_id="test_user", workers=2)
+        assert stats == {
+            "ingested": 2, "skipped": 0, "errors": 0, "removed": 0,
+            "cache_hits": 0, "cache_misses": 0,
+        }
+        assert scanner.vector_store.write_chunk_diff.call_count == 2
+        assert scanner.metadata_store.add_files.call_count == 2
+
+    def test_pipeline_batches_embeddings_across_files(self, sample_data_dir):
+        """验证多个文件的分块合并为一次嵌入调用。"""
+        scanner = self._make_scanner()
+        scanner.scan(sample_data_dir, user_id="test_user", workers=2)
+        assert scanner.vector_store.embed_texts.call_count == 1
+
+    def test_pipeline_skips_unchanged_files(self, sample_data_dir):
+        """验证未变更的文件在解析之前被跳过。"""
+        scanner = self._make_scanner()
+        scanner.metadata_store.get_hashes.side_effect = _stored_as_current
+        stats = scanner.scan(sample_data_dir, user_id="test_user", workers=2)
+        assert stats == {
+            "ingested": 0, "skipped": 2, "errors": 0, "removed": 0,
+            "cache_hits": 0, "cache_misses": 0,
+        }
+        scanner.vector_store.embed_texts.assert_not_called()
+
+    def test_pipeline_loads_missing_table_for_unchanged_csv(self, sample_data_dir):
+        """验证未变更但缺少表的 CSV 在流水线模式下也会被加载。"""
+        scanner = self._make_scanner()
+        scanner.metadata_store.get_hashes.side_effect = _stored_as_current
+        scanner.table_store = MagicMock()
+        scanner.table_store.has_table.return_value = False
+        scanner.scan(sample_data_dir, user_id="test_user", workers=2)
+        scanner.table_store.load_csv.assert_called_once_with(
+            "test_user", os.path.join(sample_data_dir, "test_data.csv")
+        )
+
+    def test_pipeline_counts_embedding_errors(self, sample_data_dir):
+        """验证嵌入失败被计为错误，且不会写入元数据。"""
+        scanner = self._make_scanner()
+        scanner.vector_store.embed_texts.side_effect = RuntimeError("ollama down")
+        stats = scanner.scan(sample_data_dir, user_id="test_user", workers=2)
+        assert stats["errors"] == 2
+        assert stats["ingested"] == 0
+        scanner.metadata_store.add_files.assert_not_called()
+
+    def test_pipeline_embeds_only_new_chunks(self, sample_data_dir):
+        """验证未变化的分块不会重新嵌入，过期分块被删除。"""
+        scanner = self._make_scanner()
+        scanner.vector_store.diff_chunks.side_effect = (
+            lambda user_id, file_path, texts, metadatas, existing=None: ChunkDiff(
+                kept_ids=[f"k{i}" for i in range(len(texts))],
+                kept_metadatas=list(metadatas),
+                stale_ids=["old"],
+            )
+        )
+        stats = scanner.scan(sample_data_dir, user_id="test_user", workers=2)
+        assert stats["ingested"] == 2
+        scanner.vector_store.embed_texts.assert_not_called()
+        for call in scanner.vector_store.write_chunk_diff.call_args_list:
+            assert call.args[0].stale_ids == ["old"]
+
+    def test_pipeline_diffs_against_chunk_registry(self, sample_data_dir):
+        """验证已注册的分块 ID 被传给 diff_chunks，避免扫描 Chroma。"""
+        scanner = self._make_scanner()
+        txt = os.path.join(sample_data_dir, "test_data.txt")
+        scanner.metadata_store.get_chunk_ids.return_value = {txt: {"v1"}}
+        scanner.scan(sample_data_dir, user_id="test_user", workers=2)
+        existing = {
+            call.args[1]: call.kwargs["existing"]
+            for call in scanner.vector_store.diff_chunks.call_args_list
+        }
+        assert existing[txt] == {"v1"}
+        assert existing[os.path.join(sample_data_dir, "test_data.csv")] is None
+
+    def test_pipeline_emptied_file_removes_old_chunks(self, sample_data_dir):
+        """验证已摄入的文件被编辑为空后，旧分块作为过期分块删除并记录新哈希。"""
+        scanner = self._make_scanner()
+        scanner.vector_store.diff_chunks.side_effect = (
+            lambda user_id, file_path, texts, metadatas, existing=None: ChunkDiff(
+                stale_ids=sorted(existing or []),
+            )
+        )
+        txt = os.path.join(sample_data_dir, "test_data.txt")
+        scanner.metadata_store.get_hashes.side_effect = (
+            lambda paths: {p: "old_hash" for p in paths}
+        )
+        scanner.metadata_store.get_chunk_ids.return_value = {txt: {"v1", "v2"}}
+        open(txt, "w").close()
+        stats = scanner.scan(sample_data_dir, user_id="test_user", workers=2)
+        assert stats["ingested"] == 2 and stats["skipped"] == 0
+        diffs = [call.args[0] for call in scanner.vector_store.write_chunk_diff.call_args_list]
+        assert ["v1", "v2"] in [diff.stale_ids for diff in diffs]
+        recorded = [call.args[1][0][1] for call in scanner.metadata_store.add_files.call_args_list]
+        assert txt in recorded
+        scanner.vector_store.chunk_records.assert_any_call("test_user", txt, [], [])
+
+    def test_pipeline_empty_new_file_is_skipped(self, sample_data_dir):
+        """验证从未摄入过的空文件在流水线模式下仍被跳过。"""
+        scanner = self._make_scanner()
+        open(os.path.join(sample_data_dir, "test_data.txt"), "w").close()
+        stats = scanner.scan(sample_data_dir, user_id="test_user", workers=2)
+        assert stats["skipped"] == 1 and stats["ingested"] == 1
+
+    def test_hash_stage_streams_results(self, tmp_path):
+        """验证哈希阶段以流的方式产出变更文件，而不是等待全部哈希完成。"""
+        paths = []
+        for i in range(5):
+            path = tmp_path / f"f{i}.txt"
+            path.write_text(f"content {i}", encoding="utf-8")
+            paths.append((str(path), path.name, ".txt", None))
+
+        submitted = []
+
+        class FakePool:
+            def submit(self, fn, *args):
+                submitted.append(args[0])
+                future = Future()
+                future.set_result(fn(*args))
+                return future
+
+        metadata_store = MagicMock()
+        metadata_store.get_hashes.return_value = {}
+        metadata_store.get_file_states.return_value = {}
+        metadata_store.hash_for_stat.return_value = None
+        pipeline = IngestionPipeline(MagicMock(), metadata_store, workers=2, queue_size=2)
+
+        stream = pipeline._hash_stage(FakePool(), paths, "test_user", {"errors": 0, "skipped": 0})
+        first = next(stream)
+        assert first[0] == paths[0][0]
+        assert len(submitted) == 2  # 只有有界数量的哈希任务在进行中
+        assert len(list(stream)) == 4
@@ -0,0 +1,57 @@
+"""
+问题嵌入缓存测试 — 验证规范化命中、TTL 过期、LRU 淘汰和统计。
+"""
+from unittest.mock import MagicMock
+from src.database.query_cache import QueryEmbeddingCache
+
+
+class FakeClock:
+    """可手动推进的时钟。"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestQueryEmbeddingCache:
+    """测试 QueryEmbeddingCache 类。"""
+
+    def test_normalized_question_hits(self):
+        """验证仅空白不同的问题命中同一条目，且不同模型不共享。"""
+        cache = QueryEmbeddingCache(max_entries=10, ttl_seconds=60)
+        cache.put("nomic", "How much  rent\n did I pay?", [1.0])
+        assert cache.get("nomic", "  How much rent did I pay? ") == [1.0]
+        assert cache.get("other-model", "How much rent did I pay?") is None
+
+    def test_get_or_embed_skips_embedding_on_hit(self):
+        """验证命中时不再调用嵌入函数。"""
+        cache = QueryEmbeddingCache(max_entries=10, ttl_seconds=60)
+        embed = MagicMock(return_value=[0.5])
+        assert cache.get_or_embed("m", "q", embed) == [0.5]
+        assert cache.get_or_embed("m", "q", embed) == [0.5]
+        embed.assert_called_once_with("q")
+
+    def test_ttl_expiry(self):
+        """验证超过 TTL 的条目失效并计入 expired。"""
+        clock = FakeClock()
+        cache = QueryEmbeddingCache(max_entries=10, ttl_seconds=60, clock=clock)
+        cache.put("m", "q", [1.0])
+        clock.now = 61
+        assert cache.get("m", "q") is None
+        assert cache.stats()["expired"] == 1
+        assert cache.stats()["size"] == 0
+
+    def test_lru_eviction(self):
+        """验证超出容量时淘汰最久未使用的条目。"""
+        cache = QueryEmbeddingCache(max_entries=2, ttl_seconds=0)
+        cache.put("m", "a", [1.0])
+        cache.put("m", "b", [2.0])
+        cache.get("m", "a")  # 触碰 a，使 b 成为最久未使用
+        cache.put("m", "c", [3.0])
+        assert cache.get("m", "b") is None
+        assert cache.get("m", "a") == [1.0]
+        stats = cache.stats()
+        assert stats["evictions"] == 1
+        assert stats["hits"] == 2 and stats["misses"] == 1
@@ -0,0 +1,142 @@
+"""
+HTTP 服务测试 — 验证 /ask、/stream 接口、并发上限和过载拒绝。
+使用假的异步 agent，不加载模型。
+"""
+import json
+import asyncio
+from src.server import AgentServer, Rejected
+
+
+class FakeAgent:
+    """记录并发数的异步 agent。"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def arun(self, question, user_id):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return {"generation": f"{user_id}: {question}", "generation_tier": "local",
+                "hallucination_status": True, "sources": ["a.txt"], "cached": False,
+                "documents": ["private chunk"]}
+
+    async def astream(self, question, user_id):
+        yield {"type": "node", "node": "retrieve"}
+        yield {"type": "token", "text": "hi"}
+        yield {"type": "final", "result": await self.arun(question, user_id)}
+
+
+async def _request(port, method, path, payload=None):
+    """发送一个 HTTP 请求，返回 (状态码, 响应体)。"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, content = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), content
+
+
+async def _with_server(server, scenario):
+    """在随机端口上启动服务并运行测试场景。"""
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        return await scenario(port)
+
+
+class TestAgentServer:
+    """测试 AgentServer。"""
+
+    def test_ask_returns_public_fields(self):
+        """/ask 返回答案字段，不泄露检索到的原文。"""
+        server = AgentServer(FakeAgent(), 4, 2, 10, 4)
+
+        async def scenario(port):
+            return await _request(port, "POST", "/ask", {"question": "q", "user_id": "u1"})
+
+        status, body = asyncio.run(_with_server(server, scenario))
+        result = json.loads(body)
+        assert status == 200
+        assert result["generation"] == "u1: q"
+        assert "documents" not in result
+
+    def test_stream_emits_ndjson_events(self):
+        """/stream 以分块 NDJSON 逐行发出事件。"""
+        server = AgentServer(FakeAgent(), 4, 2, 10, 4)
+
+        async def scenario(port):
+            return await _request(port, "POST", "/stream", {"question": "q", "user_id": "u1"})
+
+        status, body = asyncio.run(_with_server(server, scenario))
+        lines = [json.loads(line) for line in body.split(b"\r\n") if line.startswith(b"{")]
+        assert status == 200
+        assert [e["type"] for e in lines] == ["node", "token", "final"]
+
+    def test_bad_requests(self):
+        """缺少字段或路径未知时返回 4xx。"""
+        server = AgentServer(FakeAgent(), 4, 2, 10, 4)
+
+        async def scenario(port):
+            return [
+                (await _request(port, "POST", "/ask", {"question": "q"}))[0],
+                (await _request(port, "GET", "/ask"))[0],
+                (await _request(port, "GET", "/nope"))[0],
+                (await _request(port, "GET", "/health"))[0],
+            ]
+
+        assert asyncio.run(_with_server(server, scenario)) == [400, 405, 404, 200]
+
+    def test_concurrency_limits(self):
+        """全局与单用户并发上限生效，超出的请求排队等待而不是失败。"""
+        agent = FakeAgent(delay=0.05)
+        server = AgentServer(agent, max_concurrency=3, max_per_user=1,
+                             max_pending=100, max_pending_per_user=100)
+
+        async def one(user_id):
+            async with server.admit(user_id):
+                return await agent.arun("q", user_id)
+
+        async def scenario():
+            await asyncio.gather(*(one(f"u{i % 2}") for i in range(6)))
+            return agent.peak
+
+        # 两个用户、每人最多 1 个并发 → 峰值为 2
+        assert asyncio.run(scenario()) == 2
+
+    def test_overload_rejected(self):
+        """排队数超过上限时拒绝：单用户 429，全局 503。"""
+        server = AgentServer(FakeAgent(), max_concurrency=1, max_per_user=1,
+                             max_pending=2, max_pending_per_user=1)
+
+        async def scenario():
+            statuses = []
+            release = asyncio.Event()
+
+            async def hold(user_id):
+                async with server.admit(user_id):
+                    await release.wait()
+
+            async def try_admit(user_id):
+                try:
+                    async with server.admit(user_id):
+                        pass
+                except Rejected as e:
+                    statuses.append(e.status)
+
+            holders = [asyncio.create_task(hold("u1"))]
+            await asyncio.sleep(0)
+            await try_admit("u1")  # u1 已有 1 个排队 → 429
+            holders.append(asyncio.create_task(hold("u2")))
+            await asyncio.sleep(0)
+            await try_admit("u3")  # 全局已有 2 个排队 → 503
+            release.set()
+            await asyncio.gather(*holders)
+            return statuses, server.pending
+
+        assert asyncio.run(scenario()) == ([429, 503], 0)
@@ -0,0 +1,82 @@
+"""
+流式输出测试 — 验证 RagAgent.stream/astream 的事件顺序、回答 token 过滤和撤回事件。
+不构建真实的图和模型，LangGraph 的流式输出被 mock。
+"""
+import asyncio
+from unittest.mock import MagicMock
+from langchain_core.messages import AIMessageChunk
+from src.database.answer_cache import AnswerCache
+from src.graph.state import ANSWER_TAG
+from src.graph.workflow import RagAgent
+
+# 一次需要重试的运行：第一次回答未通过幻觉检查，第二次通过
+RETRIED_RUN = [
+    ("updates", {"retrieve": {"documents": ["rent is 1200"]}}),
+    ("messages", (AIMessageChunk(content='{"score": true}'), {"tags": []})),
+    ("updates", {"grade_documents": {"documents": ["rent is 1200"]}}),
+    ("messages", (AIMessageChunk(content="Rent is "), {"tags": [ANSWER_TAG]})),
+    ("messages", (AIMessageChunk(content="1000"), {"tags": [ANSWER_TAG]})),
+    ("updates", {"generate_local": {"generation": "Rent is 1000", "retry_count": 1}}),
+    ("updates", {"hallucination_check": {"hallucination_status": False}}),
+    ("messages", (AIMessageChunk(content="Rent is 1200"), {"tags": [ANSWER_TAG]})),
+    ("updates", {"generate_local": {"generation": "Rent is 1200", "retry_count": 2}}),
+    ("updates", {"hallucination_check": {"hallucination_status": True}}),
+]
+
+
+def _make_agent(items):
+    """创建一个 LangGraph 应用被 mock 的 RagAgent。"""
+    agent = RagAgent.__new__(RagAgent)
+    agent.vector_store = MagicMock()
+    agent.vector_store.embed_query.return_value = [1.0, 0.0]
+    agent.metadata_store = MagicMock()
+    agent.metadata_store.get_corpus_version.return_value = 1
+    agent.answer_cache = AnswerCache(threshold=0.9, max_entries=10, ttl_seconds=0)
+    agent.app = MagicMock()
+    agent.app.stream.side_effect = lambda *args, **kwargs: iter(items)
+
+    async def astream(*args, **kwargs):
+        for item in items:
+            yield item
+
+    agent.app.astream.side_effect = astream
+    return agent
+
+
+class TestRagAgentStream:
+    """测试 RagAgent 的流式接口。"""
+
+    def test_streams_answer_tokens_and_retracts(self):
+        """只转发回答 token；幻觉检查失败时发出撤回事件，最终结果为通过验证的回答。"""
+        events = list(_make_agent(RETRIED_RUN).stream("rent?", "u1"))
+        tokens = [e["text"] for e in events if e["type"] == "token"]
+        assert tokens == ["Rent is ", "1000", "Rent is 1200"]
+        retract = [e for e in events if e["type"] == "retract"]
+        assert retract == [{"type": "retract", "retrying": True}]
+        assert events[-1]["type"] == "final"
+        result = events[-1]["result"]
+        assert result["generation"] == "Rent is 1200"
+        assert result["hallucination_status"] is True
+        assert result["cached"] is False
+
+    def test_node_events_in_order(self):
+        """节点完成事件按执行顺序发出。"""
+        events = list(_make_agent(RETRIED_RUN).stream("rent?", "u1"))
+        nodes = [e["node"] for e in events if e["type"] == "node"]
+        assert nodes[:3] == ["retrieve", "grade_documents", "generate_local"]
+
+    def test_cache_hit_yields_only_final(self):
+        """命中答案缓存时只发出 final 事件。"""
+        agent = _make_agent(RETRIED_RUN)
+        list(agent.stream("rent?", "u1"))
+        events = list(agent.stream("rent?", "u1"))
+        assert [e["type"] for e in events] == ["final"]
+        assert events[0]["result"]["cached"] is True
+        assert agent.app.stream.call_count == 1
+
+    def test_astream_matches_stream(self):
+        """astream 发出与 stream 相同的事件。"""
+        async def collect():
+            return [e async for e in _make_agent(RETRIED_RUN).astream("rent?", "u1")]
+
+        assert asyncio.run(collect()) == list(_make_agent(RETRIED_RUN).stream("rent?", "u1"))
@@ -0,0 +1,113 @@
+"""
+表格存储测试 — 验证 CSV 入库、只读查询和用户隔离。
+"""
+import csv
+import sqlite3
+import pytest
+from unittest.mock import patch
+from src.database.table_store import TableStore
+
+
+@pytest.fixture
+def spending_csv(tmp_path):
+    """创建一个消费记录 CSV。"""
+    file_path = tmp_path / "spending.csv"
+    with open(file_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Category", "Amount"])
+        writer.writerow(["2024-03-01", "Groceries", "40.5"])
+        writer.writerow(["2024-03-15", "Groceries", "59.5"])
+        writer.writerow(["2024-04-02", "Rent", "1200"])
+    return str(file_path)
+
+
+class TestTableStore:
+    """测试 TableStore 类。"""
+
+    def _make_store(self, tmp_path):
+        """创建使用临时数据库路径的 TableStore。"""
+        return TableStore(str(tmp_path / "tables.db"))
+
+    def test_load_and_aggregate(self, tmp_path, spending_csv):
+        """验证 CSV 入库后可用 SQL 聚合。"""
+        store = self._make_store(tmp_path)
+        assert store.load_csv("user1", spending_csv) == 3
+        name = store.table_name("user1", spending_csv)
+        columns, rows = store.query(
+            "user1",
+            f'SELECT SUM("Amount") AS total FROM "{name}" '
+            f'WHERE "Category" = \'Groceries\' AND "Date" LIKE \'2024-03%\'',
+        )
+        assert columns == ["total"]
+        assert rows == [(100.0,)]
+
+    def test_reload_replaces_rows(self, tmp_path, spending_csv):
+        """验证重新加载同一文件不会重复行。"""
+        store = self._make_store(tmp_path)
+        store.load_csv("user1", spending_csv)
+        store.load_csv("user1", spending_csv)
+        assert store.list_tables("user1")[0]["row_count"] == 3
+
+    def test_describe_lists_schema(self, tmp_path, spending_csv):
+        """验证 describe 输出包含列名和来源文件。"""
+        store = self._make_store(tmp_path)
+        store.load_csv("user1", spending_csv)
+        text = store.describe("user1")
+        assert '"Category"' in text
+        assert "spending.csv" in text
+        assert store.describe("user2") == ""
+
+    def test_query_rejects_writes(self, tmp_path, spending_csv):
+        """验证查询连接为只读。"""
+        store = self._make_store(tmp_path)
+        store.load_csv("user1", spending_csv)
+        name = store.table_name("user1", spending_csv)
+        with pytest.raises(sqlite3.DatabaseError):
+            store.query("user1", f'DELETE FROM "{name}"')
+
+    def test_query_scoped_to_user(self, tmp_path, spending_csv):
+        """验证用户无法读取其他用户的表。"""
+        store = self._make_store(tmp_path)
+        store.load_csv("user1", spending_csv)
+        name = store.table_name("user1", spending_csv)
+        with pytest.raises(sqlite3.DatabaseError):
+            store.query("user2", f'SELECT * FROM "{name}"')
+
+    def test_drop_tables(self, tmp_path, spending_csv):
+        """验证删除文件后表从注册表中移除。"""
+        store = self._make_store(tmp_path)
+        store.load_csv("user1", spending_csv)
+        store.drop_tables("user1", [spending_csv])
+        assert store.list_tables("user1") == []
+
+    def test_failed_reload_keeps_previous_table(self, tmp_path, spending_csv):
+        """验证重新加载失败时保留原有的表和注册信息。"""
+        store = self._make_store(tmp_path)
+        store.load_csv("user1", spending_csv)
+        with patch("src.database.table_store.pd.read_csv", side_effect=ValueError("bad csv")):
+            with pytest.raises(ValueError):
+                store.load_csv("user1", spending_csv)
+        assert store.has_table("user1", spending_csv)
+        name = store.table_name("user1", spending_csv)
+        _, rows = store.query("user1", f'SELECT COUNT(*) FROM "{name}"')
+        assert rows == [(3,)]
+
+    def test_has_table(self, tmp_path, spending_csv):
+        """验证 has_table 只对成功加载的文件返回 True。"""
+        store = self._make_store(tmp_path)
+        assert not store.has_table("user1", spending_csv)
+        store.load_csv("user1", spending_csv)
+        assert store.has_table("user1", spending_csv)
+        assert not store.has_table("user2", spending_csv)
+
+    def test_query_interrupted_over_budget(self, tmp_path, spending_csv):
+        """验证超出指令预算的查询被中断。"""
+        store = self._make_store(tmp_path)
+        store.load_csv("user1", spending_csv)
+        name = store.table_name("user1", spending_csv)
+        # 3^12 行的笛卡尔积
+        runaway = "SELECT COUNT(*) FROM " + ", ".join(f'"{name}" t{i}' for i in range(12))
+        with patch("src.database.table_store.settings") as mock_settings:
+            mock_settings.table_query_max_steps = 100_000
+            with pytest.raises(sqlite3.OperationalError):
+                store.query("user1", runaway)
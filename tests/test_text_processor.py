@@ -2,7 +2,12 @@
 数据摄入层测试 — 文本处理器
 验证 .txt 文件的分块、元数据生成和边界情况处理。
 """
-from src.ingestion.text_processor import process_text_file, _chunk_and_prepare
+from unittest.mock import patch
+from src.database.text_cache import ExtractedTextCache
+from src.ingestion import text_processor
+from src.ingestion.text_processor import (
+    process_text_file, process_pdf_file, _chunk_and_prepare, _stream_chunks, _iter_pdf_pages,
+)
 
 
 class TestProcessTextFile:
@@ -58,3 +63,114 @@ class TestChunkAndPrepare:
         )
         indices = [m["chunk_index"] for m in metas]
         assert indices == sorted(indices)
+
+    def test_char_offsets(self):
+        """分块的字符偏移应指向被切分文本中的位置。"""
+        text = "Résumé line. " * 100
+        docs, metas = _chunk_and_prepare(text, "/fake/long.txt", "user1", "text")
+        for doc, meta in zip(docs, metas):
+            assert text[meta["start_char"]:meta["end_char"]] == doc
+
+    def test_offsets_index_text_without_comments(self, tmp_path):
+        """文本文件的偏移指向去除注释行后的文本，而不是文件字节。"""
+        file_path = tmp_path / "notes.txt"
+        body = "Café opening hours are nine to five. " * 30
+        file_path.write_text("# ignored comment\n" + body, encoding="utf-8")
+        docs, metas = process_text_file(str(file_path), "user1")
+        for doc, meta in zip(docs, metas):
+            assert body[meta["start_char"]:meta["end_char"]] == doc
+
+
+class TestStreamChunks:
+    """测试流式分块函数。"""
+
+    def test_content_and_size_preserved(self):
+        """验证跨页流式分块保留全部内容且分块不超过上限。"""
+        pages = [f"Page {i} says something important. " * 30 for i in range(50)]
+        chunks = [chunk for chunk, _start, _end in _stream_chunks(pages)]
+        combined = " ".join(chunks)
+        for i in range(50):
+            assert f"Page {i} says" in combined
+        assert all(len(c) <= text_processor.CHUNK_SIZE for c in chunks)
+
+    def test_char_offsets_point_into_joined_text(self):
+        """验证流式分块的字符偏移指向按空行拼接后的全文。"""
+        pages = [f"Café {i} — naïve résumé text. " * 40 for i in range(30)]
+        joined = "\n\n".join(pages)
+        for chunk, start, end in _stream_chunks(pages):
+            assert joined[start:end] == chunk
+
+    def test_empty_pages_skipped(self):
+        """验证空页不会产生分块。"""
+        assert list(_stream_chunks(["", "", ""])) == []
+
+
+class TestProcessPdfFile:
+    """测试 PDF 处理器的提取文本缓存。"""
+
+    def _make_pdf(self, tmp_path):
+        """创建一个 .pdf 路径 (内容只用于计算哈希，提取过程被 mock)。"""
+        file_path = tmp_path / "statement.pdf"
+        file_path.write_bytes(b"%PDF-1.4 fake")
+        return str(file_path)
+
+    def test_extraction_cached_by_hash(self, tmp_path):
+        """验证同一文件第二次处理时不再解析 PDF。"""
+        pdf = self._make_pdf(tmp_path)
+        cache = ExtractedTextCache(str(tmp_path / "text_cache.db"))
+        pages = ["Deposit of 500 dollars.", "Withdrawal of 20 dollars."]
+        with patch.object(text_processor, "_iter_pdf_pages", return_value=iter(pages)) as extract:
+            first = process_pdf_file(pdf, "user1", cache=cache)
+            second = process_pdf_file(pdf, "user1", cache=cache)
+        extract.assert_called_once()
+        assert first == second
+        assert "Deposit of 500 dollars." in first[0][0]
+        assert first[1][0]["source_type"] == "pdf"
+
+    def test_rechunk_without_reparse(self, tmp_path):
+        """验证修改 CHUNK_SIZE 后只重新分块，不重新解析。"""
+        pdf = self._make_pdf(tmp_path)
+        cache = ExtractedTextCache(str(tmp_path / "text_cache.db"))
+        pages = ["word " * 400]
+        with patch.object(text_processor, "_iter_pdf_pages", return_value=iter(pages)) as extract:
+            docs_large, _ = process_pdf_file(pdf, "user1", cache=cache)
+            with patch.object(text_processor, "CHUNK_SIZE", 100), \
+                    patch.object(text_processor, "CHUNK_OVERLAP", 10):
+                docs_small, _ = process_pdf_file(pdf, "user1", cache=cache)
+        extract.assert_called_once()
+        assert len(docs_small) > len(docs_large)
+
+    def test_textless_pdf_cached_as_empty(self, tmp_path):
+        """验证无文本的 PDF 返回空结果，且不会被重复解析。"""
+        pdf = self._make_pdf(tmp_path)
+        cache = ExtractedTextCache(str(tmp_path / "text_cache.db"))
+        with patch.object(text_processor, "_iter_pdf_pages", return_value=iter(["", ""])) as extract:
+            assert process_pdf_file(pdf, "user1", cache=cache) == ([], [])
+            assert process_pdf_file(pdf, "user1", cache=cache) == ([], [])
+        extract.assert_called_once()
+
+    def test_known_hash_not_recomputed(self, tmp_path):
+        """验证调用方传入已计算的哈希时不再重新读取文件计算哈希。"""
+        pdf = self._make_pdf(tmp_path)
+        cache = ExtractedTextCache(str(tmp_path / "text_cache.db"))
+        with patch.object(text_processor, "_iter_pdf_pages", return_value=iter(["Rent paid."])), \
+                patch.object(text_processor.MetadataStore, "compute_file_hash") as compute, \
+                patch.object(cache, "put", wraps=cache.put) as put:
+            docs, _ = process_pdf_file(pdf, "user1", cache=cache, file_hash="known")
+        compute.assert_not_called()
+        assert docs == ["Rent paid."]
+        assert put.call_args.args[0] == "known"
+
+    def test_parallel_extraction_keeps_page_order(self, tmp_path):
+        """验证多进程按页范围提取时返回所有页面。"""
+        from PyPDF2 import PdfWriter
+
+        pdf = tmp_path / "blank.pdf"
+        writer = PdfWriter()
+        for _ in range(5):
+            writer.add_blank_page(width=72, height=72)
+        with open(pdf, "wb") as f:
+            writer.write(f)
+        with patch.object(text_processor.settings, "pdf_workers", 2), \
+                patch.object(text_processor.settings, "pdf_pages_per_task", 2):
+            assert list(_iter_pdf_pages(str(pdf))) == [""] * 5
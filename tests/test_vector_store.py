@@ -0,0 +1,111 @@
+"""
+向量存储测试 — 验证确定性分块 ID 和分块差异计算。
+"""
+from unittest.mock import MagicMock
+from src.database.vector_store import VectorStore, chunk_ids, chunk_records
+
+
+class TestChunkIds:
+    """测试 chunk_ids 函数。"""
+
+    def test_ids_are_deterministic(self):
+        """验证相同路径和内容得到相同 ID。"""
+        assert chunk_ids("u1", "/a.txt", ["x", "y"]) == chunk_ids("u1", "/a.txt", ["x", "y"])
+
+    def test_ids_depend_on_path(self):
+        """验证不同文件中的相同内容得到不同 ID。"""
+        assert chunk_ids("u1", "/a.txt", ["x"]) != chunk_ids("u1", "/b.txt", ["x"])
+
+    def test_duplicate_chunks_get_distinct_ids(self):
+        """验证同一文件内重复的分块不会冲突。"""
+        ids = chunk_ids("u1", "/a.txt", ["x", "x"])
+        assert len(set(ids)) == 2
+
+    def test_ids_depend_on_user(self):
+        """验证不同用户摄入同一文件得到不同 ID。"""
+        assert chunk_ids("u1", "/a.txt", ["x"]) != chunk_ids("u2", "/a.txt", ["x"])
+
+
+class TestDiffChunks:
+    """测试 VectorStore.diff_chunks (使用 mock 集合)。"""
+
+    def _make_store(self, existing_ids):
+        """创建一个跳过 __init__ 的 VectorStore，集合返回给定的已有 ID。"""
+        store = VectorStore.__new__(VectorStore)
+        store.collection = MagicMock()
+        store.collection.get.return_value = {"ids": list(existing_ids)}
+        return store
+
+    def test_diff_embeds_only_new_and_removes_stale(self):
+        """验证只有新分块需要嵌入，已删除的分块被标记为过期。"""
+        old_ids = chunk_ids("u1", "/a.txt", ["keep", "gone"])
+        store = self._make_store(old_ids)
+        diff = store.diff_chunks("u1", "/a.txt", ["keep", "added"], [{}, {}])
+        assert diff.new_texts == ["added"]
+        assert diff.kept == 1
+        assert diff.stale_ids == [old_ids[1]]
+
+    def test_diff_scoped_to_user(self):
+        """验证已有分块的查询按用户和文件路径过滤。"""
+        store = self._make_store([])
+        store.diff_chunks("u1", "/a.txt", ["text"], [{}])
+        where = store.collection.get.call_args.kwargs["where"]
+        assert where == {"$and": [{"user_id": "u1"}, {"file_path": "/a.txt"}]}
+
+    def test_kept_chunks_get_fresh_metadata(self):
+        """验证保留的分块会刷新元数据，但保留原始摄入时间。"""
+        old_ids = chunk_ids("u1", "/a.txt", ["keep"])
+        store = self._make_store(old_ids)
+        meta = {"chunk_index": 3, "ingested_at": "now"}
+        diff = store.diff_chunks("u1", "/a.txt", ["keep"], [meta])
+        assert diff.kept_ids == old_ids
+        assert diff.kept_metadatas == [{"chunk_index": 3}]
+
+    def test_registry_ids_skip_chroma_lookup(self):
+        """验证提供注册表中的 ID 时不查询 Chroma。"""
+        old_ids = chunk_ids("u1", "/a.txt", ["keep"])
+        store = self._make_store([])
+        diff = store.diff_chunks("u1", "/a.txt", ["keep"], [{}], existing=set(old_ids))
+        assert diff.kept_ids == old_ids
+        store.collection.get.assert_not_called()
+
+    def test_legacy_random_ids_are_stale(self):
+        """验证旧版随机 ID 的分块在重新摄入时被清除。"""
+        store = self._make_store(["legacy-uuid"])
+        diff = store.diff_chunks("u1", "/a.txt", ["text"], [{}])
+        assert diff.new_texts == ["text"]
+        assert diff.stale_ids == ["legacy-uuid"]
+
+    def test_clear_file_buffers_all_chunks_as_stale(self):
+        """验证不再产生分块的文件，其全部向量被缓冲删除。"""
+        store = self._make_store(["v1", "v2"])
+        store.batcher = MagicMock()
+        assert store.clear_file("u1", "/a.txt", flush=False) == 2
+        store.batcher.delete.assert_called_once_with(["v1", "v2"])
+        store.batcher.flush.assert_not_called()
+
+
+class TestChunkRecords:
+    """测试 chunk_records 函数。"""
+
+    def test_records_match_ids_and_metadata(self):
+        """验证注册记录的向量 ID、偏移和 token 数。"""
+        metas = [{"chunk_index": 0, "start_char": 0, "end_char": 8}, {"chunk_index": 2}]
+        records = chunk_records("u1", "/a.txt", ["abcdefgh", "xyz"], metas)
+        assert [r.vector_id for r in records] == chunk_ids("u1", "/a.txt", ["abcdefgh", "xyz"])
+        assert (records[0].start_char, records[0].end_char, records[0].token_count) == (0, 8, 2)
+        assert (records[1].chunk_index, records[1].start_char) == (2, None)
+
+
+class TestDeleteFiles:
+    """测试 VectorStore.delete_files。"""
+
+    def test_delete_scoped_to_user(self):
+        """验证删除只作用于该用户的向量。"""
+        store = VectorStore.__new__(VectorStore)
+        store.collection = MagicMock()
+        store.delete_files("u1", ["/a.txt"])
+        store.collection.delete.assert_called_once_with(where={"$and": [
+            {"user_id": "u1"},
+            {"file_path": {"$in": ["/a.txt"]}},
+        ]})
@@ -0,0 +1,120 @@
+"""
+监视模式测试 — 验证事件合并、去抖动刷新和轮询回退。
+"""
+import os
+import time
+import threading
+from unittest.mock import MagicMock
+from src.ingestion.watcher import DirectoryWatcher, diff_snapshots
+
+
+def _stats(**kwargs):
+    """构造扫描器返回的统计字典。"""
+    stats = {"ingested": 0, "skipped": 0, "errors": 0, "removed": 0,
+             "cache_hits": 0, "cache_misses": 0}
+    stats.update(kwargs)
+    return stats
+
+
+class TestDirectoryWatcher:
+    """测试 DirectoryWatcher 类。"""
+
+    def _make_watcher(self, directory, **kwargs):
+        """创建一个使用 mock 扫描器的 DirectoryWatcher。"""
+        scanner = MagicMock()
+        scanner.ingest_paths.return_value = _stats()
+        scanner.metadata_store.get_live_paths.return_value = []
+        return DirectoryWatcher(scanner, directory, "test_user", **kwargs)
+
+    def test_burst_coalesced_per_path(self, sample_data_dir):
+        """验证同一文件的多次写入只触发一次摄入。"""
+        watcher = self._make_watcher(sample_data_dir)
+        txt = os.path.join(sample_data_dir, "test_data.txt")
+        watcher.record([(txt, False), (txt, False), (txt, False)])
+        watcher.flush()
+        watcher.scanner.ingest_paths.assert_called_once_with([txt], [], "test_user")
+
+    def test_unsupported_and_deleted_paths(self, sample_data_dir):
+        """验证不支持的扩展名被忽略，删除的文件被报告为 removed。"""
+        watcher = self._make_watcher(sample_data_dir)
+        gone = os.path.join(sample_data_dir, "gone.txt")
+        jpg = os.path.join(sample_data_dir, "photo.jpg")
+        watcher.record([(gone, True), (jpg, False)])
+        watcher.flush()
+        watcher.scanner.ingest_paths.assert_called_once_with([], [gone], "test_user")
+
+    def test_vanished_directory_removes_recorded_files(self, sample_data_dir):
+        """验证被删除或移走的目录展开为其下所有已记录的文件。"""
+        watcher = self._make_watcher(sample_data_dir)
+        moved = os.path.join(sample_data_dir, "archive")
+        inside = [os.path.join(moved, "a.txt"), os.path.join(moved, "sub", "b.md")]
+        watcher.scanner.metadata_store.get_live_paths.side_effect = (
+            lambda user_id, directory: inside if directory == moved else []
+        )
+        watcher.record([(moved, True)])
+        watcher.flush()
+        watcher.scanner.ingest_paths.assert_called_once_with([], sorted(inside), "test_user")
+
+    def test_new_directory_is_walked(self, sample_data_dir):
+        """验证新建或移入的目录被遍历，其中支持的文件全部摄入。"""
+        watcher = self._make_watcher(sample_data_dir)
+        added = os.path.join(sample_data_dir, "notes.v2")
+        os.makedirs(os.path.join(added, "sub"))
+        for name in ("a.txt", os.path.join("sub", "b.md"), "c.jpg"):
+            with open(os.path.join(added, name), "w") as f:
+                f.write("x")
+        stale = os.path.join(added, "old.txt")
+        watcher.scanner.metadata_store.get_live_paths.return_value = [stale]
+        watcher.record([(added, False)])
+        watcher.flush()
+        watcher.scanner.ingest_paths.assert_called_once_with(
+            [os.path.join(added, "a.txt"), os.path.join(added, "sub", "b.md")],
+            [stale], "test_user",
+        )
+
+    def test_absolute_paths_normalized(self, sample_data_dir):
+        """验证相对路径被转换为扫描器记录时使用的绝对路径。"""
+        relative_dir = os.path.relpath(sample_data_dir)
+        watcher = self._make_watcher(relative_dir)
+        assert watcher.directory == sample_data_dir
+        watcher.record([(os.path.join(relative_dir, "test_data.txt"), False)])
+        assert list(watcher._pending) == [os.path.join(sample_data_dir, "test_data.txt")]
+
+    def test_flush_when_idle_is_noop(self, sample_data_dir):
+        """验证没有待处理事件时不调用扫描器。"""
+        watcher = self._make_watcher(sample_data_dir)
+        assert watcher.flush() is None
+        watcher.scanner.ingest_paths.assert_not_called()
+
+    def test_polling_detects_new_file(self, tmp_path):
+        """验证轮询回退能发现新文件并在去抖动后摄入。"""
+        watcher = self._make_watcher(str(tmp_path), debounce=0.0,
+                                     poll_interval=0.05, force_polling=True)
+        new_file = tmp_path / "note.md"
+        stop = threading.Event()
+
+        def on_ingest(changed, removed, user_id):
+            stop.set()
+            return _stats(ingested=len(changed))
+
+        watcher.scanner.ingest_paths.side_effect = on_ingest
+        thread = threading.Thread(target=watcher.run, args=(stop, False), daemon=True)
+        thread.start()
+        try:
+            # 等待第一次快照完成后再写入，否则新文件会被计入初始快照
+            time.sleep(0.3)
+            new_file.write_text("hello", encoding="utf-8")
+            thread.join(timeout=5)
+        finally:
+            stop.set()
+
+        assert watcher.scanner.ingest_paths.called
+        changed = watcher.scanner.ingest_paths.call_args.args[0]
+        assert changed == [str(new_file)]
+
+def test_diff_snapshots():
+    """验证快照差异产生新增、修改和删除事件。"""
+    before = {"a": (1, 1, 1), "b": (1, 1, 2)}
+    after = {"a": (2, 2, 1), "c": (1, 1, 3)}
+    events = sorted(diff_snapshots(before, after))
+    assert events == [("a", False), ("b", True), ("c", False)]